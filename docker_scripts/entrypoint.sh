@@ -18,6 +18,10 @@ done
 
 # Run database migrations
 python manage.py migrate
+# Create the table for the shared (database) cache, if needed
+python manage.py createcachetable
+# Build search documents for any items which have none, as after they were first added
+python manage.py rebuild_search_documents --missing
 
 if [ "$DJANGO_RUN_ENV" = "dev" ]; then
   # Create default superuser for dev environment, using django env vars.
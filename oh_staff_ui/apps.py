@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class OhStaffUiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'oh_staff_ui'
+
+    def ready(self):
+        # Connect signal handlers.
+        from oh_staff_ui import signals  # noqa: F401
@@ -1,22 +1,16 @@
 import logging
-from django.conf import settings
-from pathlib import Path
 from eulxml import xmlmap
 from eulxml.xmlmap import mods
 from eulxml.xmlmap.mods import MODSv34
 from eulxml.xmlmap.mods import Common
-from oh_staff_ui.models import (
-    AltTitle,
-    AltId,
-    Date,
-    Description,
-    Format,
-    ItemCopyrightUsage,
-    ItemLanguageUsage,
-    ItemNameUsage,
-    ItemSubjectUsage,
-    MediaFile,
-    ProjectItem,
+from oh_staff_ui.models import MediaFile, ProjectItem
+from oh_staff_ui.mods_utils import (
+    MODS_CONTENT_LABELS,
+    MODS_EXCLUDED_SUBJECTS,
+    MODS_NOTE_LABELS,
+    get_mods_items,
+    has_mods_data,
+    publish_mods_file,
 )
 
 
@@ -26,6 +20,12 @@ logger = logging.getLogger(__name__)
 class OralHistoryMods(MODSv34):
     def __init__(self, project_item):
         super().__init__()
+        # Items from get_mods_items() already have all related data in memory.
+        # Reload any others the same way, instead of querying field by field.
+        if not has_mods_data(project_item):
+            project_item = get_mods_items(
+                ProjectItem.objects.filter(pk=project_item.pk)
+            ).get()
         self._item = project_item
         self.populate_fields()
 
@@ -50,8 +50,7 @@ class OralHistoryMods(MODSv34):
         # container will be created, overwriting previous titles
         self.title_info_list.append(mods.TitleInfo(title=self._item.title))
 
-        alt_titles = AltTitle.objects.filter(item=self._item)
-        for alt_title in alt_titles:
+        for alt_title in self._item.mods_alt_titles:
             self.title_info_list.append(
                 mods.TitleInfo(title=alt_title, type="alternative")
             )
@@ -60,20 +59,19 @@ class OralHistoryMods(MODSv34):
         # Always add Ark as identifier
         self.identifiers.append(mods.Identifier(text=self._item.ark))
         # If we have other AltIds, add with type
-        alt_ids = AltId.objects.filter(item=self._item)
-        for alt_id in alt_ids:
+        for alt_id in self._item.mods_alt_ids:
             self.identifiers.append(
                 mods.Identifier(text=alt_id.value, type=alt_id.type.type)
             )
 
     def _populate_language(self):
-        for ilu in ItemLanguageUsage.objects.filter(item=self._item):
+        for ilu in self._item.mods_languages:
             lang = mods.Language()
             lang.terms.append(mods.LanguageTerm(text=ilu.value))
             self.languages.append(lang)
 
     def _populate_name(self):
-        for inu in ItemNameUsage.objects.filter(item=self._item):
+        for inu in self._item.mods_names:
             name = mods.Name()
             name.name_parts.append(mods.NamePart(text=inu.value.value))
             name.roles.append(mods.Role(type="text", text=inu.type.type))
@@ -85,20 +83,13 @@ class OralHistoryMods(MODSv34):
 
     def _populate_rights(self):
         # Following previous MODS generation process, accessRights is used with no type assignment
-        for copyright in ItemCopyrightUsage.objects.filter(item=self._item):
+        for copyright in self._item.mods_copyrights:
             self.access_conditions.append(mods.AccessCondition(text=copyright.value))
 
     def _populate_subjects(self):
-        subs_to_exclude = [
-            "Arts, Literature, Music, and Film",
-            "Donated Oral Histories",
-            "Latinas and Latinos in Music",
-            "Latinas and Latinos in Politics",
-            "Mexican American Civil Rights",
-        ]
-        for isu in ItemSubjectUsage.objects.filter(item=self._item).exclude(
-            value__value__in=subs_to_exclude
-        ):
+        for isu in self._item.mods_subjects:
+            if isu.value.value in MODS_EXCLUDED_SUBJECTS:
+                continue
             self.subjects.append(
                 mods.Subject(
                     authority=isu.value.source.source.lower(), topic=isu.value.value
@@ -106,26 +97,21 @@ class OralHistoryMods(MODSv34):
             )
 
     def _populate_format(self):
-        format = Format.objects.filter(item=self._item).first()
-        if format:
+        if self._item.mods_formats:
+            format = self._item.mods_formats[0]
             self.create_physical_description()
             self.physical_description.extent = format.value
 
     def _populate_description(self):
-        # Exclude adminnote and tableOfContents types from query entirely
-        descriptions = Description.objects.filter(item=self._item).exclude(
-            type__type__in=["adminnote", "tableOfContents"]
-        )
+        # Exclude adminnote and tableOfContents types entirely
+        descriptions = [
+            desc
+            for desc in self._item.mods_descriptions
+            if desc.type.type not in ["adminnote", "tableOfContents"]
+        ]
 
         # Similar note element behaving qualifiers
-        type_labels = {
-            "biographicalnote": "Biographical Information",
-            "interviewerhistory": "Interviewer Background and Preparation",
-            "personpresent": "Persons Present",
-            "place": "Place Conducted",
-            "processinterview": "Processing of Interview",
-            "supportingdocuments": "Supporting Documents",
-        }
+        type_labels = MODS_NOTE_LABELS
 
         for desc in descriptions:
             desc_type = desc.type.type.lower()
@@ -149,7 +135,7 @@ class OralHistoryMods(MODSv34):
                 self.notes.append(mods.Note(text=desc.value))
 
     def _populate_create_date(self):
-        dates = Date.objects.filter(item=self._item, type__type__exact="creation")
+        dates = [date for date in self._item.mods_dates if date.type.type == "creation"]
 
         for date in dates:
             self.create_origin_info()
@@ -157,14 +143,10 @@ class OralHistoryMods(MODSv34):
 
     def _populate_constituent_audio(self):
         # For each Completed child of the item, get submaster audio MediaFile
-        for child in ProjectItem.objects.filter(
-            parent=self._item,
-            status__status__in=["Completed", "Completed with minimal metadata"],
-        ).order_by("sequence"):
-            for audiofile in MediaFile.objects.filter(
-                item=child, file_type__file_code="audio_submaster"
-            ):
-                self.related_items.append(self._create_relateditem_audio(audiofile))
+        for child in self._item.mods_children:
+            for audiofile in child.mods_media_files:
+                if audiofile.file_type.file_code == "audio_submaster":
+                    self.related_items.append(self._create_relateditem_audio(audiofile))
 
     def _create_relateditem_audio(self, mi: MediaFile) -> MODSv34:
         pi = mi.item
@@ -173,12 +155,13 @@ class OralHistoryMods(MODSv34):
         ri.identifiers.append(mods.Identifier(text=pi.ark))
         ri.parts.append(PartOH(order=pi.sequence, type="session_audio"))
 
-        for toc in Description.objects.filter(item=pi, type__type="tableOfContents"):
-            ri.toc = TableOfContents(text=toc.value)
+        for toc in pi.mods_descriptions:
+            if toc.type.type == "tableOfContents":
+                ri.toc = TableOfContents(text=toc.value)
 
-        for ts in MediaFile.objects.filter(
-            item=pi, file_type__file_code="text_master_transcript"
-        ):
+        for ts in pi.mods_media_files:
+            if ts.file_type.file_code != "text_master_transcript":
+                continue
             # Add only for submasters, the public-access copy
             if ts.file_url.endswith("submaster.xml"):
                 # Due to legacy design the text_master_transcript can have 2 file types
@@ -188,27 +171,19 @@ class OralHistoryMods(MODSv34):
         return ri
 
     def _populate_interviewee_image(self):
-        for img in MediaFile.objects.filter(
-            item=self._item, file_type__file_code="image_submaster"
-        ).order_by("sequence"):
+        for img in self._item.mods_media_files:
+            if img.file_type.file_code != "image_submaster":
+                continue
             self.locations.append(
                 LocationOH(url=img.file_url, label="Image of Interviewee")
             )
 
     def _populate_interview_content(self):
-        fc_to_label = {
-            "pdf_master": "Interview Full Transcript (PDF)",
-            "text_master_transcript": "Interview Full Transcript",
-            "text_master_biography": "Interviewee Biography",
-            "text_master_interview_history": "Interview History",
-            "pdf_master_appendix": "Appendix to Interview",
-            "text_master_appendix": "Appendix to Interview",
-            "pdf_master_resume": "Narrator's Resume",
-        }
-
-        for f in MediaFile.objects.filter(
-            item=self._item, file_type__file_code__in=fc_to_label.keys()
-        ).order_by("sequence"):
+        fc_to_label = MODS_CONTENT_LABELS
+
+        for f in self._item.mods_media_files:
+            if f.file_type.file_code not in fc_to_label:
+                continue
             # Add only for submasters, the public-access copy
             if "submaster" in f.file_url:
                 label = fc_to_label[f.file_type.file_code]
@@ -237,21 +212,19 @@ class OralHistoryMods(MODSv34):
             ri.title = p.title
             ri.identifiers.append(mods.Identifier(text=p.ark))
 
-            for d in Description.objects.filter(item=p, type__type="abstract"):
+            for d in p.mods_abstracts:
                 ri.create_abstract()
                 ri.abstract.text = d.value
 
             self.related_items.append(ri)
 
-    def write_mods_record(self):
-        p = Path(f"{settings.MEDIA_ROOT}/{settings.OH_STATIC}/mods")
-        p.mkdir(exist_ok=True, parents=True)
-
-        with open(f"{p}/{self._item.ark_ns}-mods.xml", "wb") as mods_file:
-            mods_file.write(self.serializeDocument(pretty=True))
-            logger.info(
-                f"Wrote MODS for item id: {self._item.id} to file: {self._item.ark_ns}-mods.xml"
-            )
+    def write_mods_record(self, published_hash: str | None = None) -> bool:
+        """Write this record to its file in OH_STATIC/mods, unless published_hash
+        shows the file already has the same content.  Returns whether it was written.
+        """
+        return publish_mods_file(
+            self._item, self.serializeDocument(pretty=True), published_hash
+        )
 
 
 # Extended classes to supply some additional attributes not in stock library that we use
@@ -0,0 +1,257 @@
+import logging
+from lxml import etree
+from oh_staff_ui.models import MediaFile, ProjectItem
+from oh_staff_ui.mods_utils import (
+    MODS_CONTENT_LABELS,
+    MODS_EXCLUDED_SUBJECTS,
+    MODS_NOTE_LABELS,
+    get_mods_items,
+    has_mods_data,
+    publish_mods_file,
+)
+
+logger = logging.getLogger(__name__)
+
+MODS_NS = "http://www.loc.gov/mods/v3"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+
+
+def mods_tag(name: str) -> str:
+    return f"{{{MODS_NS}}}{name}"
+
+
+def add_element(
+    parent: etree.Element, name: str, text: str = None, **attrib
+) -> etree.Element:
+    """Add a MODS element to parent, after any existing elements of the same name
+    (or at the end, if there are none), as eulxml does when appending to lists.
+    Attributes are set in the order given; None values are left out.
+    """
+    tag = mods_tag(name)
+    siblings = parent.findall(tag)
+    element = etree.Element(tag)
+    if siblings:
+        siblings[-1].addnext(element)
+    else:
+        parent.append(element)
+    for key, value in attrib.items():
+        if value is not None:
+            element.set(key, str(value))
+    if text is not None:
+        element.text = str(text)
+    return element
+
+
+def get_or_add_element(parent: etree.Element, name: str) -> etree.Element:
+    # Like eulxml's create_* methods: reuse the first existing element.
+    element = parent.find(mods_tag(name))
+    if element is None:
+        element = add_element(parent, name)
+    return element
+
+
+class OralHistoryModsLxml:
+    """Builds the same MODS record as OralHistoryMods, writing elements directly
+    into an lxml tree instead of going through eulxml's object mapping.
+
+    The _populate_* methods mirror those in OralHistoryMods; changes to either
+    class must be made in both; tests compare the output of the two.
+    """
+
+    def __init__(self, project_item: ProjectItem):
+        # Items from get_mods_items() already have all related data in memory.
+        if not has_mods_data(project_item):
+            project_item = get_mods_items(
+                ProjectItem.objects.filter(pk=project_item.pk)
+            ).get()
+        self._item = project_item
+        self.node = etree.Element(
+            mods_tag("mods"), nsmap={"mods": MODS_NS, "xlink": XLINK_NS}
+        )
+        self.populate_fields()
+
+    def populate_fields(self):
+        self._populate_titles()
+        self._populate_create_date()
+        self._populate_description()
+        self._populate_format()
+        self._populate_identifier()
+        self._populate_language()
+        self._populate_name()
+        self._populate_relation()
+        self._populate_rights()
+        self._populate_subjects()
+        self._populate_constituent_audio()
+        self._populate_interviewee_image()
+        self._populate_interview_content()
+        self._populate_series_content()
+
+    def _add_title_info(
+        self, parent: etree.Element, title: str, type: str = None
+    ) -> None:
+        title_info = add_element(parent, "titleInfo")
+        add_element(title_info, "title", title)
+        if type is not None:
+            title_info.set("type", type)
+
+    def _populate_titles(self):
+        self._add_title_info(self.node, self._item.title)
+        for alt_title in self._item.mods_alt_titles:
+            self._add_title_info(self.node, alt_title, type="alternative")
+
+    def _populate_identifier(self):
+        add_element(self.node, "identifier", self._item.ark)
+        for alt_id in self._item.mods_alt_ids:
+            add_element(self.node, "identifier", alt_id.value, type=alt_id.type.type)
+
+    def _populate_language(self):
+        for ilu in self._item.mods_languages:
+            language = add_element(self.node, "language")
+            add_element(language, "languageTerm", ilu.value)
+
+    def _populate_name(self):
+        for inu in self._item.mods_names:
+            name = add_element(self.node, "name")
+            add_element(name, "namePart", inu.value.value)
+            role = add_element(name, "role")
+            add_element(role, "roleTerm", inu.type.type, type="text")
+
+    def _populate_relation(self):
+        if self._item.relation:
+            related_item = add_element(self.node, "relatedItem")
+            self._add_title_info(related_item, self._item.relation)
+
+    def _populate_rights(self):
+        for copyright in self._item.mods_copyrights:
+            add_element(self.node, "accessCondition", copyright.value)
+
+    def _populate_subjects(self):
+        for isu in self._item.mods_subjects:
+            if isu.value.value in MODS_EXCLUDED_SUBJECTS:
+                continue
+            subject = add_element(
+                self.node, "subject", authority=isu.value.source.source.lower()
+            )
+            add_element(subject, "topic", isu.value.value)
+
+    def _populate_format(self):
+        if self._item.mods_formats:
+            physical_description = get_or_add_element(self.node, "physicalDescription")
+            extent = get_or_add_element(physical_description, "extent")
+            extent.text = self._item.mods_formats[0].value
+
+    def _populate_description(self):
+        for desc in self._item.mods_descriptions:
+            if desc.type.type in ["adminnote", "tableOfContents"]:
+                continue
+            desc_type = desc.type.type.lower()
+
+            if desc_type == "abstract":
+                # Only one abstract; the last one wins.
+                get_or_add_element(self.node, "abstract").text = desc.value
+
+            elif desc_type in MODS_NOTE_LABELS:
+                type_value = (
+                    "biographical" if desc_type == "biographicalnote" else desc_type
+                )
+                add_element(
+                    self.node,
+                    "note",
+                    desc.value,
+                    type=type_value,
+                    displayLabel=MODS_NOTE_LABELS[desc_type],
+                )
+
+            else:
+                add_element(self.node, "note", desc.value)
+
+    def _populate_create_date(self):
+        for date in self._item.mods_dates:
+            if date.type.type == "creation":
+                origin_info = get_or_add_element(self.node, "originInfo")
+                add_element(origin_info, "dateCreated", date)
+
+    def _populate_constituent_audio(self):
+        for child in self._item.mods_children:
+            for audiofile in child.mods_media_files:
+                if audiofile.file_type.file_code == "audio_submaster":
+                    self._add_relateditem_audio(audiofile)
+
+    def _add_relateditem_audio(self, mi: MediaFile) -> None:
+        pi = mi.item
+        ri = add_element(self.node, "relatedItem")
+        ri.set(f"{{{XLINK_NS}}}href", mi.file_url)
+        ri.set("type", "constituent")
+        self._add_title_info(ri, pi.title)
+        add_element(ri, "identifier", pi.ark)
+        add_element(ri, "part", order=pi.sequence, type="session_audio")
+
+        for toc in pi.mods_descriptions:
+            if toc.type.type == "tableOfContents":
+                # Only one tableOfContents; the last one wins.
+                get_or_add_element(ri, "tableOfContents").text = toc.value
+
+        for ts in pi.mods_media_files:
+            if ts.file_type.file_code != "text_master_transcript":
+                continue
+            # Only the TEI submaster, not html or master files.
+            if ts.file_url.endswith("submaster.xml"):
+                location = add_element(ri, "location")
+                add_element(location, "url", ts.file_url, usage="timed log")
+
+    def _populate_interviewee_image(self):
+        for img in self._item.mods_media_files:
+            if img.file_type.file_code != "image_submaster":
+                continue
+            location = add_element(self.node, "location")
+            add_element(location, "url", img.file_url)
+            location.set("displayLabel", "Image of Interviewee")
+
+    def _populate_interview_content(self):
+        for f in self._item.mods_media_files:
+            if f.file_type.file_code not in MODS_CONTENT_LABELS:
+                continue
+            # Add only for submasters, the public-access copy
+            if "submaster" in f.file_url:
+                label = MODS_CONTENT_LABELS[f.file_type.file_code]
+                usage = None
+
+                if f.file_type.file_code == "text_master_transcript":
+                    if f.file_name_only.endswith(".html"):
+                        label = f"{label} (Printable Version)"
+                    else:
+                        label = f"{label} (TEI/P5 XML)"
+                        usage = "timed log"
+
+                location = add_element(self.node, "location")
+                add_element(location, "url", f.file_url)
+                location.set("displayLabel", label)
+                if usage:
+                    location.find(mods_tag("url")).set("usage", usage)
+
+    def _populate_series_content(self):
+        p = self._item.parent
+        if p and p.type.type.lower() == "series":
+            ri = add_element(self.node, "relatedItem", type="series")
+            self._add_title_info(ri, p.title)
+            add_element(ri, "identifier", p.ark)
+
+            for d in p.mods_abstracts:
+                get_or_add_element(ri, "abstract").text = d.value
+
+    def serializeDocument(self, pretty: bool = False) -> bytes:
+        # Same output as eulxml's XmlObject.serializeDocument().
+        return etree.tostring(
+            self.node.getroottree(),
+            encoding="UTF-8",
+            pretty_print=pretty,
+            xml_declaration=True,
+        )
+
+    def write_mods_record(self, published_hash: str | None = None) -> bool:
+        """Write this record to its file in OH_STATIC/mods, unless published_hash
+        shows the file already has the same content.  Returns whether it was written.
+        """
+        return publish_mods_file(
+            self._item, self.serializeDocument(pretty=True), published_hash
+        )
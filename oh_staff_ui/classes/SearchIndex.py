@@ -0,0 +1,263 @@
+import logging
+import pickle
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from collections.abc import Iterable
+from pathlib import Path
+from django.utils import timezone
+from oh_staff_ui.models import MediaFile, ProjectItem, ProjectItemChange
+from oh_staff_ui.mods_utils import atomic_write_path
+from oh_staff_ui.search_utils import get_search_documents
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Terms on either side of this, in a query, are alternatives.
+OR_PATTERN = re.compile(r"\s+OR\s+")
+
+
+def get_tokens(text: str) -> list[str]:
+    """Split text into lower-case words, for indexing and for queries."""
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+class SearchIndex:
+    """In-process inverted index of ProjectItem search documents, so keyword
+    searches can be answered without querying the database.
+
+    Each token maps to a posting list: the sorted ids of the items whose
+    search document contains it, stored compactly in an array('I').  For
+    filtering and sorting results, the index also keeps each item's title
+    (lower-cased), type, status and the types of its media files.
+
+    Queries match items containing every term of the query, as a prefix of
+    any word; terms separated by OR are alternatives.
+    """
+
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self) -> None:
+        self.postings: dict[str, array] = {}
+        # All tokens, sorted, for finding the tokens with a given prefix.
+        self.vocabulary: list[str] = []
+        self.item_tokens: dict[int, tuple[str, ...]] = {}
+        # Item id: (sort title, type, status, media file types).
+        self.items: dict[int, tuple[str, str, str, frozenset[str]]] = {}
+        # When the index was last brought up to date with the database.
+        self.synced_at = None
+        # Signal handlers may update the index from other threads.
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, chunk_size: int = 500) -> "SearchIndex":
+        """Build the index of all items from the database."""
+        index = cls()
+        index.synced_at = timezone.now()
+        item_ids = list(ProjectItem.objects.order_by("id").values_list("id", flat=True))
+        postings = defaultdict(lambda: array("I"))
+        for i in range(0, len(item_ids), chunk_size):
+            loaded = index._load_items(item_ids[i : i + chunk_size])
+            # Items are loaded in id order, so posting lists are built sorted.
+            for item_id in sorted(loaded):
+                item, tokens = loaded[item_id]
+                index.items[item_id] = item
+                index.item_tokens[item_id] = tokens
+                for token in tokens:
+                    postings[token].append(item_id)
+        index.postings = dict(postings)
+        index.vocabulary = sorted(index.postings)
+        logger.info(
+            f"Built search index of {len(index.items)} items, "
+            f"{len(index.vocabulary)} tokens"
+        )
+        return index
+
+    @classmethod
+    def load(cls, path: Path) -> "SearchIndex":
+        """Load an index saved by save(), then bring it up to date with any
+        changes made since.  Raises ValueError if the file is not a snapshot of
+        this version of the index.
+        """
+        with open(path, "rb") as snapshot_file:
+            # Snapshots are only written by save(), on the same server.
+            snapshot = pickle.load(snapshot_file)
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get("version") != cls.SNAPSHOT_VERSION
+        ):
+            raise ValueError(f"Not a search index snapshot: {path}")
+        index = cls()
+        index.postings = snapshot["postings"]
+        index.vocabulary = sorted(index.postings)
+        index.item_tokens = snapshot["item_tokens"]
+        index.items = snapshot["items"]
+        index.synced_at = snapshot["synced_at"]
+        index.sync()
+        return index
+
+    def save(self, path: Path) -> None:
+        """Write a snapshot of the index, replacing any previous one atomically."""
+        with self.lock:
+            snapshot = {
+                "version": self.SNAPSHOT_VERSION,
+                "postings": self.postings,
+                "item_tokens": self.item_tokens,
+                "items": self.items,
+                "synced_at": self.synced_at,
+            }
+            with atomic_write_path(path) as temp_path:
+                with open(temp_path, "wb") as snapshot_file:
+                    pickle.dump(snapshot, snapshot_file, pickle.HIGHEST_PROTOCOL)
+
+    def sync(self) -> None:
+        """Update the index with items created, changed or deleted since it was
+        last synced, possibly by other processes, as recorded in the
+        ProjectItemChange journal.
+        """
+        synced_at = timezone.now()
+        changed_ids = set(
+            ProjectItemChange.objects.filter(
+                change_date__gte=self.synced_at
+            ).values_list("item_id", flat=True)
+        )
+        self.update_items(changed_ids)
+        self.synced_at = synced_at
+
+    def update_items(self, item_ids: Iterable[int]) -> None:
+        """Re-index the given items from the database; items which no longer
+        exist are removed.
+        """
+        item_ids = set(item_ids)
+        if not item_ids:
+            return
+        loaded = self._load_items(item_ids)
+        with self.lock:
+            for item_id in item_ids:
+                self._remove_item(item_id)
+                if item_id in loaded:
+                    self._add_item(item_id, *loaded[item_id])
+
+    def match(self, query: str) -> set[int]:
+        """Return the ids of items matching the query."""
+        with self.lock:
+            return self._match(query)
+
+    def get_page(
+        self,
+        query: str,
+        item_type_filter: str,
+        media_file_type_filter: str,
+        status_filter: str,
+        page_size: int,
+        after: list | None = None,
+    ) -> dict:
+        """Return the ids of one page of the items matching the query and
+        filters, sorted by title, starting after the sort values in after (if
+        any); the sort values of the last item, if there is a next page; and
+        the total number of items matching.
+        """
+        if after is not None:
+            try:
+                after = (str(after[0]), int(after[1]))
+            except (IndexError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid search index cursor: {after}") from e
+        sort_keys = []
+        # Other threads may update the index meanwhile, so items matched must
+        # be read before the lock is released.
+        with self.lock:
+            for item_id in self._match(query):
+                sort_title, item_type, status, media_file_types = self.items[item_id]
+                if item_type_filter != "all" and item_type != item_type_filter:
+                    continue
+                if status_filter != "all" and status != status_filter:
+                    continue
+                if (
+                    media_file_type_filter != "all"
+                    and media_file_type_filter not in media_file_types
+                ):
+                    continue
+                sort_keys.append((sort_title, item_id))
+        sort_keys.sort()
+        start = bisect_right(sort_keys, after) if after else 0
+        page_keys = sort_keys[start : start + page_size]
+        next_values = None
+        if start + page_size < len(sort_keys):
+            next_values = list(page_keys[-1])
+        return {
+            "item_ids": [item_id for _, item_id in page_keys],
+            "next_values": next_values,
+            "total": len(sort_keys),
+        }
+
+    def _load_items(self, item_ids: Iterable[int]) -> dict[int, tuple]:
+        # Three queries, whatever the number of items.
+        item_ids = list(item_ids)
+        media_file_types = defaultdict(set)
+        for item_id, file_type in MediaFile.objects.filter(
+            item_id__in=item_ids
+        ).values_list("item_id", "file_type__file_type"):
+            media_file_types[item_id].add(file_type)
+        documents = get_search_documents(item_ids)
+        loaded = {}
+        for item_id, title, item_type, status in ProjectItem.objects.filter(
+            id__in=item_ids
+        ).values_list("id", "title", "type__type", "status__status"):
+            item = (
+                title.casefold(),
+                item_type,
+                status,
+                frozenset(media_file_types[item_id]),
+            )
+            tokens = tuple(sorted(set(get_tokens(documents.get(item_id, "")))))
+            loaded[item_id] = (item, tokens)
+        return loaded
+
+    def _match(self, query: str) -> set[int]:
+        # As match(), for callers already holding the lock.
+        matches = set()
+        for alternative in OR_PATTERN.split(query.strip()):
+            alternative_ids = None
+            for term in get_tokens(alternative):
+                term_ids = self._match_prefix(term)
+                if alternative_ids is None:
+                    alternative_ids = term_ids
+                else:
+                    alternative_ids &= term_ids
+                if not alternative_ids:
+                    break
+            matches |= alternative_ids or set()
+        return matches
+
+    def _match_prefix(self, prefix: str) -> set[int]:
+        # Tokens starting with the prefix are together in the sorted vocabulary.
+        item_ids = set()
+        i = bisect_left(self.vocabulary, prefix)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(prefix):
+            item_ids.update(self.postings[self.vocabulary[i]])
+            i += 1
+        return item_ids
+
+    def _add_item(self, item_id: int, item: tuple, tokens: tuple[str, ...]) -> None:
+        self.items[item_id] = item
+        self.item_tokens[item_id] = tokens
+        for token in tokens:
+            posting_list = self.postings.get(token)
+            if posting_list is None:
+                self.postings[token] = array("I", [item_id])
+                insort(self.vocabulary, token)
+            else:
+                posting_list.insert(bisect_left(posting_list, item_id), item_id)
+
+    def _remove_item(self, item_id: int) -> None:
+        self.items.pop(item_id, None)
+        for token in self.item_tokens.pop(item_id, ()):
+            posting_list = self.postings[token]
+            i = bisect_left(posting_list, item_id)
+            if i < len(posting_list) and posting_list[i] == item_id:
+                del posting_list[i]
+            if not posting_list:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
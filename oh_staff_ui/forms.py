@@ -128,6 +128,8 @@ class ItemSearchForm(forms.Form):
     search_types = [
         ("title", "Title"),
         ("keyword", "Keyword"),
+        ("fulltext", "Full text"),
+        ("fuzzy", "Fuzzy"),
         ("ark", "ARK"),
     ]
     search_type = forms.ChoiceField(choices=search_types, initial="title")
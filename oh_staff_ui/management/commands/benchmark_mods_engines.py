@@ -0,0 +1,58 @@
+import timeit
+from django.core.management.base import BaseCommand, CommandParser, CommandError
+from lxml import etree
+from oh_staff_ui.models import ProjectItem
+from oh_staff_ui.mods_utils import get_mods_engine, get_mods_items
+
+MODS_ENGINES = ["eulxml", "lxml"]
+
+
+class Command(BaseCommand):
+    help = "Django management command to compare the speed of the MODS engines."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "-l",
+            "--limit",
+            type=int,
+            default=100,
+            help="Number of Completed items to build MODS records for (default: 100)",
+        )
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of times to build the records with each engine; "
+            "the best time is reported (default: 5)",
+        )
+
+    def handle(self, *args, **options) -> None:
+        # Items and their related data are loaded once, so only building and
+        # serializing the records is timed, not database access.
+        pi_set = ProjectItem.objects.filter(status__status__iexact="completed")
+        items = list(get_mods_items(pi_set.order_by("id")[: options["limit"]]))
+        if not items:
+            raise CommandError("No Completed items to build MODS records for")
+
+        timings = {}
+        for engine in MODS_ENGINES:
+            mods_class = get_mods_engine(engine)
+            timings[engine] = min(
+                timeit.repeat(
+                    lambda: [etree.tostring(mods_class(item).node) for item in items],
+                    number=1,
+                    repeat=options["repeat"],
+                )
+            )
+            self.stdout.write(
+                f"{engine}: {timings[engine]:.3f}s for {len(items)} records, "
+                f"{timings[engine] / len(items) * 1000:.2f}ms per record"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"lxml is {timings['eulxml'] / timings['lxml']:.1f}x "
+                "as fast as eulxml"
+            )
+        )
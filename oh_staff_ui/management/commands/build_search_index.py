@@ -0,0 +1,45 @@
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from oh_staff_ui.classes.SearchIndex import SearchIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Django management command to build the in-memory search index and "
+        "save a snapshot, which workers load instead of building their own"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "-o",
+            "--output",
+            type=str,
+            default=settings.SEARCH_INDEX_SNAPSHOT,
+            help="File to write the snapshot to (default: SEARCH_INDEX_SNAPSHOT)",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if not options["output"]:
+            raise CommandError(
+                "No --output given, and SEARCH_INDEX_SNAPSHOT is not set"
+            )
+        path = Path(options["output"])
+
+        start_time = time.perf_counter()
+        index = SearchIndex.build()
+        index.save(path)
+        elapsed = time.perf_counter() - start_time
+
+        posting_bytes = sum(
+            len(posting_list) * posting_list.itemsize
+            for posting_list in index.postings.values()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{path.name}: {len(index.items)} items, {len(index.vocabulary)} "
+                f"tokens, {posting_bytes} bytes of postings, "
+                f"{path.stat().st_size} bytes, in {elapsed:.2f}s"
+            )
+        )
@@ -1,12 +1,73 @@
 import logging
+import time
 from django.core.management.base import BaseCommand
 from django.core.management.base import CommandError
-from oh_staff_ui.classes.OralHistoryMods import OralHistoryMods
 from oh_staff_ui.models import ProjectItem
+from oh_staff_ui.mods_utils import (
+    get_mods_engine,
+    get_mods_file_name,
+    get_mods_items,
+    get_published_hashes,
+    remove_unpublished_mods_files,
+    run_chunks,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def write_mods_chunk(item_ids: list[int], incremental: bool = False) -> dict:
+    """Write MODS records for one chunk of items, returning a summary of the
+    results.  Runs in worker processes, so it must be a module-level function.
+
+    In incremental mode, records whose content matches the PublishedModsFile
+    manifest are not rewritten.
+    """
+    start_time = time.perf_counter()
+    errors = []
+    written = 0
+    unchanged = 0
+    pi_set = list(
+        get_mods_items(ProjectItem.objects.filter(id__in=item_ids).order_by("id"))
+    )
+    published_hashes = get_published_hashes(pi_set) if incremental else {}
+    for pi in pi_set:
+        published_hash = published_hashes.get(get_mods_file_name(pi))
+        try:
+            if get_mods_engine()(pi).write_mods_record(published_hash):
+                written += 1
+                logger.debug(f"Item: {pi.id} with ark {pi.ark} MODS record written")
+            else:
+                unchanged += 1
+        except Exception as e:
+            # One bad item shouldn't stop the rest of the export.
+            logger.error(f"Item {pi.id}: {e}")
+            errors.append(f"Item {pi.id}: {e}")
+    return {
+        "first_id": item_ids[0],
+        "last_id": item_ids[-1],
+        "count": len(item_ids),
+        "written": written,
+        "unchanged": unchanged,
+        "errors": errors,
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+def get_failed_chunk(item_ids: list[int], error: Exception) -> dict:
+    """Summarize a chunk which failed as a whole, as write_mods_chunk() would,
+    with none of its items written.
+    """
+    return {
+        "first_id": item_ids[0],
+        "last_id": item_ids[-1],
+        "count": len(item_ids),
+        "written": 0,
+        "unchanged": 0,
+        "errors": [f"Chunk failed: {error}"],
+        "seconds": 0.0,
+    }
+
+
 class Command(BaseCommand):
     help = "Django management command to generate Oral History MODS records, and must be run with 1 argument"
 
@@ -26,6 +87,25 @@ class Command(BaseCommand):
             choices=["series", "interview", "audio", "all"],
             help="The type of items to bulk export MODS records, choices are: series, interview, assets and all",
         )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of worker processes to use for bulk export (default: 1)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of items each worker handles at a time for bulk export (default: 100)",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="For bulk export, only write changed records, and remove records "
+            "of items which are no longer Completed",
+        )
 
     def handle(self, *args, **options):
 
@@ -35,7 +115,14 @@ class Command(BaseCommand):
                 self._create_mods_record(options["item_id"])
 
             if options["bulk"]:
-                self._create_bulk_mods_records(options["bulk"])
+                if options["jobs"] < 1 or options["chunk_size"] < 1:
+                    raise CommandError("--jobs and --chunk-size must be at least 1")
+                self._create_bulk_mods_records(
+                    options["bulk"],
+                    options["jobs"],
+                    options["chunk_size"],
+                    options["incremental"],
+                )
 
         else:
             raise CommandError("This command must be executed with 1 argument")
@@ -44,29 +131,55 @@ class Command(BaseCommand):
         """Given an item_id write the related MODS record to public location"""
         try:
             pi = ProjectItem.objects.get(id=item_id)
-            OralHistoryMods(pi).write_mods_record()
+            get_mods_engine()(pi).write_mods_record()
             logger.debug(f"Item: {pi.id} with ark {pi.ark} MODS record written")
 
-        except (ProjectItem.DoesNotExist) as e:
+        except ProjectItem.DoesNotExist as e:
             logger.error(e)
             raise CommandError(f"ProjectItem with id {item_id} does not exist")
 
-    def _create_bulk_mods_records(self, category: str) -> None:
+    def _create_bulk_mods_records(
+        self,
+        category: str,
+        jobs: int = 1,
+        chunk_size: int = 100,
+        incremental: bool = False,
+    ) -> None:
         """Only items of status 'Completed' are allowed for bulk operations"""
-        err_items = ()
         pi_set = ProjectItem.objects.filter(status__status__iexact="completed")
         if category != "all":
             pi_set = pi_set.filter(type__type__iexact=category)
+        item_ids = list(pi_set.order_by("id").values_list("id", flat=True))
+        pi_count = len(item_ids)
+        # Each chunk loads its related metadata in a fixed number of queries,
+        # and can be handled by a separate worker process.
+        chunks = [item_ids[i : i + chunk_size] for i in range(0, pi_count, chunk_size)]
+
+        start_time = time.perf_counter()
+        results = run_chunks(
+            write_mods_chunk, chunks, jobs, incremental, on_error=get_failed_chunk
+        )
+        removed = remove_unpublished_mods_files() if incremental else []
+        elapsed = time.perf_counter() - start_time
 
-        for pi in pi_set:
-            try:
-                self._create_mods_record(pi.id)
-            except (CommandError) as e:
-                logger.error(e)
-                err_items.append(pi)
+        written = 0
+        unchanged = 0
+        for result in results:
+            written += result["written"]
+            unchanged += result["unchanged"]
+            self.stdout.write(
+                f"Items {result['first_id']}-{result['last_id']}: "
+                f"{result['written']} of {result['count']} written, "
+                f"{result['unchanged']} unchanged, in {result['seconds']:.2f}s"
+            )
+            for error in result["errors"]:
+                self.stdout.write(self.style.ERROR(f"  {error}"))
+        for file_name in removed:
+            self.stdout.write(f"Removed {file_name}")
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"{pi_set.count() - len(err_items)} of {pi_set.count()} MODS records written"
+                f"{written} of {pi_count} MODS records written, {unchanged} unchanged, "
+                f"{len(removed)} removed, in {elapsed:.2f}s using {jobs} job(s)"
             )
         )
@@ -0,0 +1,100 @@
+import gzip
+import logging
+import tarfile
+import time
+from collections.abc import Callable
+from io import BytesIO
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from oh_staff_ui.mods_utils import (
+    MODS_DUMP_FILE_NAME,
+    OAI_DUMP_FILE_NAME,
+    atomic_write_paths,
+    get_checksum_file_path,
+    get_dump_file_dir,
+    get_file_checksum,
+    get_mods_document,
+    get_mods_file_name,
+    iter_mods_xml,
+)
+from oh_staff_ui.views_utils import get_oai_items, iter_all_records_oai
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Django management command to write gzip-compressed dumps of all OAI "
+        "records and MODS files to OH_STATIC/dumps"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--base-url",
+            type=str,
+            default="",
+            help="URL of the OAI endpoint, for the request element of the "
+            "ListRecords dump",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of items to load from the database at a time (default: 100)",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        self.chunk_size = options["chunk_size"]
+        self.base_url = options["base_url"]
+
+        dump_dir = get_dump_file_dir()
+        dump_dir.mkdir(exist_ok=True, parents=True)
+        self._write_dump(dump_dir / OAI_DUMP_FILE_NAME, self._write_oai_dump)
+        self._write_dump(dump_dir / MODS_DUMP_FILE_NAME, self._write_mods_dump)
+
+    def _write_dump(self, path: Path, write_content: Callable[[Path], int]) -> None:
+        """Write a dump and its checksum file to temporary files, the dump with
+        write_content(), then rename both into place.  Until then, the previous
+        dump and checksum (if any) are still served, and are kept if either
+        can't be replaced, so the two always match.
+        """
+        start_time = time.perf_counter()
+        with atomic_write_paths([path, get_checksum_file_path(path)]) as (
+            temp_path,
+            temp_checksum_path,
+        ):
+            count = write_content(temp_path)
+            checksum = get_file_checksum(temp_path)
+            temp_checksum_path.write_bytes(f"{checksum}  {path.name}\n".encode())
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Wrote {count} records to {path}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{path.name}: {count} records, {path.stat().st_size} bytes, "
+                f"sha256 {checksum}, in {elapsed:.2f}s"
+            )
+        )
+
+    def _write_oai_dump(self, temp_path: Path) -> int:
+        count = 0
+        with gzip.open(temp_path, "wb") as dump_file:
+            for xml_chunk in iter_all_records_oai(self.base_url, self.chunk_size):
+                dump_file.write(xml_chunk)
+                count += 1
+        # Chunks are the opening envelope, one per record, then the closing tags.
+        return count - 2
+
+    def _write_mods_dump(self, temp_path: Path) -> int:
+        count = 0
+        pi_set = get_oai_items().order_by("id").iterator(chunk_size=self.chunk_size)
+        with tarfile.open(temp_path, "w:gz") as dump_file:
+            for pi, mods_xml in iter_mods_xml(pi_set, self.chunk_size):
+                content = get_mods_document(mods_xml)
+                member = tarfile.TarInfo(f"mods/{get_mods_file_name(pi)}")
+                member.size = len(content)
+                member.mtime = int(pi.last_modified_date.timestamp())
+                dump_file.addfile(member, BytesIO(content))
+                count += 1
+        return count
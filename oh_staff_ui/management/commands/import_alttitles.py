@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from oh_staff_ui.models import ProjectItem, AltTitleType, AltTitle
+from oh_staff_ui.signals import keep_last_modified_dates
 from ._import_utils import get_dicts_from_tsv
 
 
@@ -9,6 +10,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("filepath", type=str)
 
+    @keep_last_modified_dates()
     def handle(self, *args, **options):
         dicts_list = get_dicts_from_tsv(options["filepath"])
 
@@ -6,6 +6,7 @@ from oh_staff_ui.models import (
     ItemCopyrightUsage,
     ProjectItem,
 )
+from oh_staff_ui.signals import keep_last_modified_dates
 from ._import_utils import get_dicts_from_tsv, get_or_create_copyright
 
 
@@ -15,6 +16,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("filepath", type=str)
 
+    @keep_last_modified_dates()
     def handle(self, *args, **options):
         dicts_list = get_dicts_from_tsv(options["filepath"])
 
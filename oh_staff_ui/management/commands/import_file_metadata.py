@@ -8,6 +8,7 @@ from oh_staff_ui.classes.OralHistoryFile import (
     OralHistoryFile,
 )  # for TZ in Django's context
 from oh_staff_ui.models import MediaFile, MediaFileType, ProjectItem
+from oh_staff_ui.signals import keep_last_modified_dates
 from ._import_utils import get_dicts_from_tsv
 
 
@@ -17,6 +18,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser) -> None:
         parser.add_argument("filepath", type=str)
 
+    @keep_last_modified_dates()
     def handle(self, *args, **options) -> None:
         dicts_list = get_dicts_from_tsv(options["filepath"])
         print(f"Found {len(dicts_list)} rows of file metadata to import.")
@@ -4,6 +4,7 @@ from django.contrib.auth.models import User
 from csv import DictReader
 from datetime import datetime
 from django.utils import timezone
+from oh_staff_ui.signals import keep_last_modified_dates
 
 
 class Command(BaseCommand):
@@ -12,6 +13,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("filepath", type=str)
 
+    @keep_last_modified_dates()
     def handle(self, *args, **options):
         # to avoid duplication, start by deleting all existing ProjectItems
         print("Deleting all existing ProjectItems.")
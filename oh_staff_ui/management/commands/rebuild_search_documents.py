@@ -0,0 +1,52 @@
+import logging
+import time
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from oh_staff_ui.models import ProjectItem
+from oh_staff_ui.search_utils import bump_catalog_generation, update_search_documents
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Django management command to rebuild the search documents used by "
+        "keyword searches"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only build documents for items which have none, "
+            "instead of rebuilding all of them",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of items to build documents for at a time (default: 500)",
+        )
+
+    def handle(self, *args, **options) -> None:
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        start_time = time.perf_counter()
+        pi_set = ProjectItem.objects.order_by("id")
+        if options["missing"]:
+            pi_set = pi_set.filter(search_document__isnull=True)
+        item_ids = list(pi_set.values_list("id", flat=True))
+        # Each chunk takes one query to read, and one to write.
+        count = 0
+        for i in range(0, len(item_ids), chunk_size):
+            count += update_search_documents(item_ids[i : i + chunk_size])
+        # Documents written in bulk send no signals, so cached search results
+        # must be made obsolete here.
+        bump_catalog_generation()
+        elapsed = time.perf_counter() - start_time
+
+        logger.info(f"Rebuilt {count} search documents")
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {count} search documents in {elapsed:.2f}s")
+        )
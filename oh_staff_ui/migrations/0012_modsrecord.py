@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oh_staff_ui", "0011_mediafileerror"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ModsRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("mods_xml", models.BinaryField()),
+                ("content_hash", models.CharField(max_length=64)),
+                (
+                    "create_date",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mods_record",
+                        to="oh_staff_ui.projectitem",
+                    ),
+                ),
+            ],
+        ),
+    ]
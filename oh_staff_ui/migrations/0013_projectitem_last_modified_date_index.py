@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oh_staff_ui", "0012_modsrecord"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="projectitem",
+            index=models.Index(
+                fields=["last_modified_date"], name="oh_staff_ui_last_mo_c4bbdc_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oh_staff_ui", "0013_projectitem_last_modified_date_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublishedModsFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("file_name", models.CharField(max_length=256, unique=True)),
+                ("content_hash", models.CharField(max_length=64)),
+                ("write_date", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="oh_staff_ui.projectitem",
+                    ),
+                ),
+            ],
+        ),
+    ]
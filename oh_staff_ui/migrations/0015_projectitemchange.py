@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oh_staff_ui", "0014_publishedmodsfile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectItemChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("item_id", models.IntegerField()),
+                ("ark", models.CharField(max_length=40)),
+                ("set_ark", models.CharField(blank=True, default="", max_length=40)),
+                (
+                    "change_type",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("updated", "Updated"),
+                            ("deleted", "Deleted"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("status", models.CharField(max_length=40)),
+                ("was_published", models.BooleanField(default=False)),
+                ("published", models.BooleanField(default=False)),
+                (
+                    "change_date",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["change_date"], name="oh_staff_ui_change__40ea83_idx"
+                    ),
+                    models.Index(
+                        fields=["item_id"], name="oh_staff_ui_item_id_2a8f22_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# GIN indexes for full-text search, which only PostgreSQL supports; on other
+# databases, full-text search falls back to substring matching, with no index.
+# The expressions must match get_full_text_vector() in views_utils exactly,
+# or PostgreSQL will not use the indexes.
+FULL_TEXT_INDEXES = [
+    ("projectitem", "title", "oh_staff_ui_title_fts_idx"),
+    ("alttitle", "value", "oh_staff_ui_alttitle_fts_idx"),
+    ("description", "value", "oh_staff_ui_description_fts_idx"),
+    ("name", "value", "oh_staff_ui_name_fts_idx"),
+    ("subject", "value", "oh_staff_ui_subject_fts_idx"),
+]
+
+
+def get_full_text_indexes(apps) -> list:
+    return [
+        (
+            apps.get_model("oh_staff_ui", model_name),
+            GinIndex(SearchVector(field_name, config="english"), name=index_name),
+        )
+        for model_name, field_name, index_name in FULL_TEXT_INDEXES
+    ]
+
+
+def add_full_text_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for model, index in get_full_text_indexes(apps):
+            schema_editor.add_index(model, index)
+
+
+def remove_full_text_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for model, index in get_full_text_indexes(apps):
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oh_staff_ui", "0015_projectitemchange"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_full_text_indexes, remove_full_text_indexes),
+    ]
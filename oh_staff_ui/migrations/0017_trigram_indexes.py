@@ -0,0 +1,73 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import ProgrammingError, migrations
+from django.db.models.functions import Upper
+
+# GIN trigram indexes, for substring (icontains) and fuzzy searches, which only
+# PostgreSQL supports.  They index UPPER(field), which icontains compares, and
+# get_trigram_expression() in views_utils uses for fuzzy searches; since
+# trigrams ignore case, the same index serves both.
+TRIGRAM_INDEXES = [
+    ("projectitem", "title", "oh_staff_ui_title_trgm_idx"),
+    ("projectitem", "ark", "oh_staff_ui_ark_trgm_idx"),
+    ("alttitle", "value", "oh_staff_ui_alttitle_trgm_idx"),
+    ("name", "value", "oh_staff_ui_name_trgm_idx"),
+    ("subject", "value", "oh_staff_ui_subject_trgm_idx"),
+]
+
+
+class CreateTrigramExtension(TrigramExtension):
+    """Create the pg_trgm extension, unless it is already in pg_extension.
+
+    Before PostgreSQL 13, only superusers can create pg_trgm; if the database
+    role can't, a superuser must run CREATE EXTENSION pg_trgm; first.  The
+    extension is left in place when migrating backwards, since it may have
+    been created that way.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        try:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        except ProgrammingError as e:
+            raise ProgrammingError(
+                "Could not create the pg_trgm extension; as a superuser, run "
+                "CREATE EXTENSION pg_trgm; in this database, then migrate again"
+            ) from e
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        pass
+
+
+def get_trigram_indexes(apps) -> list:
+    return [
+        (
+            apps.get_model("oh_staff_ui", model_name),
+            GinIndex(OpClass(Upper(field_name), name="gin_trgm_ops"), name=index_name),
+        )
+        for model_name, field_name, index_name in TRIGRAM_INDEXES
+    ]
+
+
+def add_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for model, index in get_trigram_indexes(apps):
+            schema_editor.add_index(model, index)
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for model, index in get_trigram_indexes(apps):
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oh_staff_ui", "0016_full_text_search_indexes"),
+    ]
+
+    operations = [
+        # Does nothing on databases other than PostgreSQL.
+        CreateTrigramExtension(),
+        migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+    ]
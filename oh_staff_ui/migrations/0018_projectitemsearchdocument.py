@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:05
+
+import django.db.models.deletion
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations, models
+
+
+# GIN trigram index, so the substring (contains) matches of keyword searches
+# can use an index; like the ones in migration 0017, PostgreSQL only.
+def get_document_index(apps) -> tuple:
+    return (
+        apps.get_model("oh_staff_ui", "projectitemsearchdocument"),
+        GinIndex(
+            fields=["document"],
+            opclasses=["gin_trgm_ops"],
+            name="oh_staff_ui_document_trgm_idx",
+        ),
+    )
+
+
+def add_document_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(*get_document_index(apps))
+
+
+def remove_document_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(*get_document_index(apps))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("oh_staff_ui", "0017_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectItemSearchDocument",
+            fields=[
+                (
+                    "item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="oh_staff_ui.projectitem",
+                    ),
+                ),
+                ("document", models.TextField(blank=True, default="")),
+            ],
+        ),
+        migrations.RunPython(add_document_index, remove_document_index),
+    ]
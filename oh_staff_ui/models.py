@@ -84,6 +84,8 @@ class ProjectItem(models.Model):
         indexes = [
             models.Index(fields=["ark"]),
             models.Index(fields=["title"]),
+            # For OAI selective harvesting (from / until).
+            models.Index(fields=["last_modified_date"]),
         ]
 
 
@@ -578,3 +580,98 @@ class MediaFileError(models.Model):
     item = models.ForeignKey(
         ProjectItem, on_delete=models.PROTECT, blank=False, null=False
     )
+
+
+class ModsRecord(models.Model):
+    """Serialized MODS for a ProjectItem, cached for the OAI feed.
+
+    Records are deleted by the handlers in signals.py whenever any data they
+    contain changes, and are rebuilt the next time they are requested.
+    """
+
+    item = models.OneToOneField(
+        ProjectItem, on_delete=models.CASCADE, related_name="mods_record"
+    )
+    mods_xml = models.BinaryField(blank=False, null=False)
+    # SHA-256 of mods_xml, in hex.
+    content_hash = models.CharField(max_length=64, blank=False, null=False)
+    create_date = models.DateTimeField(blank=False, null=False, default=timezone.now)
+
+
+class ProjectItemSearchDocument(models.Model):
+    """Normalized text of a ProjectItem and all of its descriptive metadata,
+    so keyword searches can look in one table instead of many.
+
+    Kept current by the handlers in signals.py, and rebuilt in bulk by the
+    rebuild_search_documents command.
+    """
+
+    item = models.OneToOneField(
+        ProjectItem,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    # One value per line, lower-cased, with runs of whitespace collapsed.
+    document = models.TextField(blank=True, null=False, default="")
+
+
+class PublishedModsFile(models.Model):
+    """Manifest entry for a MODS file written to OH_STATIC/mods.
+
+    Lets create_mods_records --incremental skip files whose content has not
+    changed, and find files for items which should no longer be published.
+    """
+
+    # Name of the file, relative to the mods directory.
+    file_name = models.CharField(max_length=256, blank=False, null=False, unique=True)
+    # Null once the item has been deleted, so its file can still be removed.
+    item = models.ForeignKey(
+        ProjectItem, on_delete=models.SET_NULL, blank=True, null=True
+    )
+    # SHA-256 of the file content, in hex.
+    content_hash = models.CharField(max_length=64, blank=False, null=False)
+    write_date = models.DateTimeField(blank=False, null=False, default=timezone.now)
+
+
+# Items with these statuses, other than Series, are published via OAI.
+OAI_PUBLISHED_STATUSES = ["Completed", "Completed with minimal metadata"]
+
+
+class ProjectItemChange(models.Model):
+    """Append-only journal of changes to ProjectItems, written by the handlers
+    in signals.py.
+
+    Entries outlive their items, so the OAI feed can tell harvesters about
+    records which were deleted, or are no longer published.
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    CHANGE_TYPES = [
+        (CREATED, "Created"),
+        (UPDATED, "Updated"),
+        (DELETED, "Deleted"),
+    ]
+
+    # Not a foreign key: the item may no longer exist.
+    item_id = models.IntegerField(blank=False, null=False)
+    ark = models.CharField(max_length=40, blank=False, null=False)
+    # Ark of the item's Series, for OAI sets.
+    set_ark = models.CharField(max_length=40, blank=True, null=False, default="")
+    change_type = models.CharField(
+        max_length=10, choices=CHANGE_TYPES, blank=False, null=False
+    )
+    # Status of the item after the change.
+    status = models.CharField(max_length=40, blank=False, null=False)
+    # Whether the item was in the OAI feed before, and is after, the change.
+    was_published = models.BooleanField(blank=False, null=False, default=False)
+    published = models.BooleanField(blank=False, null=False, default=False)
+    change_date = models.DateTimeField(blank=False, null=False, default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["change_date"]),
+            models.Index(fields=["item_id"]),
+        ]
@@ -0,0 +1,457 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import cache
+from itertools import islice
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from django.db.models import Prefetch, QuerySet, prefetch_related_objects
+from django.utils import timezone
+from lxml import etree
+from oh_staff_ui.models import (
+    OAI_PUBLISHED_STATUSES,
+    AltId,
+    AltTitle,
+    Date,
+    Description,
+    Format,
+    ItemCopyrightUsage,
+    ItemLanguageUsage,
+    ItemNameUsage,
+    ItemSubjectUsage,
+    MediaFile,
+    ModsRecord,
+    ProjectItem,
+    PublishedModsFile,
+)
+
+logger = logging.getLogger(__name__)
+
+# Mappings shared by both MODS engines (OralHistoryMods and OralHistoryModsLxml),
+# so their output stays the same.
+
+# Subjects which are not included in MODS records.
+MODS_EXCLUDED_SUBJECTS = [
+    "Arts, Literature, Music, and Film",
+    "Donated Oral Histories",
+    "Latinas and Latinos in Music",
+    "Latinas and Latinos in Politics",
+    "Mexican American Civil Rights",
+]
+
+# Description types output as typed, labeled note elements.
+MODS_NOTE_LABELS = {
+    "biographicalnote": "Biographical Information",
+    "interviewerhistory": "Interviewer Background and Preparation",
+    "personpresent": "Persons Present",
+    "place": "Place Conducted",
+    "processinterview": "Processing of Interview",
+    "supportingdocuments": "Supporting Documents",
+}
+
+# Media file codes output as interview content locations, with their labels.
+MODS_CONTENT_LABELS = {
+    "pdf_master": "Interview Full Transcript (PDF)",
+    "text_master_transcript": "Interview Full Transcript",
+    "text_master_biography": "Interviewee Biography",
+    "text_master_interview_history": "Interview History",
+    "pdf_master_appendix": "Appendix to Interview",
+    "text_master_appendix": "Appendix to Interview",
+    "pdf_master_resume": "Narrator's Resume",
+}
+
+
+def get_media_files_prefetch() -> Prefetch:
+    return Prefetch(
+        "mediafile_set",
+        queryset=MediaFile.objects.select_related("file_type").order_by(
+            "sequence", "id"
+        ),
+        to_attr="mods_media_files",
+    )
+
+
+def get_descriptions_prefetch() -> Prefetch:
+    return Prefetch(
+        "description_set",
+        queryset=Description.objects.select_related("type").order_by("id"),
+        to_attr="mods_descriptions",
+    )
+
+
+def get_mods_prefetches() -> list[Prefetch]:
+    """Return the prefetches which load everything needed to build MODS records.
+
+    Each one is stored in a mods_* list attribute on the item, and costs one query
+    for the whole batch of items, no matter how many items are in it.
+    """
+    return [
+        Prefetch(
+            "alttitle_set",
+            queryset=AltTitle.objects.order_by("id"),
+            to_attr="mods_alt_titles",
+        ),
+        Prefetch(
+            "altid_set",
+            queryset=AltId.objects.select_related("type").order_by("id"),
+            to_attr="mods_alt_ids",
+        ),
+        Prefetch(
+            "itemlanguageusage_set",
+            queryset=ItemLanguageUsage.objects.select_related("value").order_by("id"),
+            to_attr="mods_languages",
+        ),
+        Prefetch(
+            "itemnameusage_set",
+            queryset=ItemNameUsage.objects.select_related("value", "type").order_by(
+                "id"
+            ),
+            to_attr="mods_names",
+        ),
+        Prefetch(
+            "itemcopyrightusage_set",
+            queryset=ItemCopyrightUsage.objects.select_related("value").order_by("id"),
+            to_attr="mods_copyrights",
+        ),
+        Prefetch(
+            "itemsubjectusage_set",
+            queryset=ItemSubjectUsage.objects.select_related("value__source").order_by(
+                "id"
+            ),
+            to_attr="mods_subjects",
+        ),
+        Prefetch(
+            "format_set", queryset=Format.objects.order_by("id"), to_attr="mods_formats"
+        ),
+        Prefetch(
+            "date_set",
+            queryset=Date.objects.select_related("type").order_by("id"),
+            to_attr="mods_dates",
+        ),
+        get_descriptions_prefetch(),
+        get_media_files_prefetch(),
+        # Parents are loaded once and shared by all of their children in the batch,
+        # so series-level data is not fetched again for every interview.
+        Prefetch(
+            "parent",
+            queryset=ProjectItem.objects.select_related("type").prefetch_related(
+                Prefetch(
+                    "description_set",
+                    queryset=Description.objects.filter(type__type="abstract").order_by(
+                        "id"
+                    ),
+                    to_attr="mods_abstracts",
+                )
+            ),
+        ),
+        # Only children published via OAI are included as constituent parts.
+        Prefetch(
+            "projectitem_set",
+            queryset=ProjectItem.objects.filter(
+                status__status__in=OAI_PUBLISHED_STATUSES
+            )
+            .order_by("sequence", "id")
+            .prefetch_related(get_media_files_prefetch(), get_descriptions_prefetch()),
+            to_attr="mods_children",
+        ),
+    ]
+
+
+def get_mods_items(
+    items: QuerySet | Iterable[ProjectItem],
+) -> QuerySet | list[ProjectItem]:
+    """Prepare a queryset or list of items for building MODS records in bulk.
+
+    Querysets get the MODS prefetches added, and are evaluated lazily as usual
+    (including via iterator(chunk_size=...)); lists are loaded immediately.
+    """
+    if isinstance(items, QuerySet):
+        return items.prefetch_related(*get_mods_prefetches())
+    items = list(items)
+    prefetch_related_objects(items, *get_mods_prefetches())
+    return items
+
+
+def has_mods_data(item: ProjectItem) -> bool:
+    # All MODS prefetches are loaded together, so checking one is enough.
+    return hasattr(item, "mods_descriptions")
+
+
+def get_content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def get_mods_engine(engine: str = None) -> type:
+    """Return the MODS record class for the given engine, by default the one
+    set in settings.MODS_ENGINE.
+    """
+    # Imported here, since the engines themselves use this module; this also
+    # keeps eulxml from being imported unless it is used.
+    engine = engine or settings.MODS_ENGINE
+    if engine == "eulxml":
+        from oh_staff_ui.classes.OralHistoryMods import OralHistoryMods
+
+        return OralHistoryMods
+    if engine == "lxml":
+        from oh_staff_ui.classes.OralHistoryModsLxml import OralHistoryModsLxml
+
+        return OralHistoryModsLxml
+    raise ValueError(f"Unknown MODS engine: {engine}")
+
+
+def build_mods_xml(item: ProjectItem) -> bytes:
+    """Build and serialize the MODS record for an item."""
+    return etree.tostring(get_mods_engine()(item).node)
+
+
+@cache
+def get_mods_schema() -> etree.XMLSchema:
+    """Return the MODS 3.4 schema, compiled on first use and then reused for the
+    life of the process.  It is loaded from the copy in oh_staff_ui/schemas,
+    whose imports are also local, so no network access is needed.
+    """
+    return etree.XMLSchema(
+        etree.parse(Path(__file__).parent / "schemas" / "mods-3-4.xsd")
+    )
+
+
+def get_mods_validation_errors(mods_xml: bytes) -> list[dict]:
+    """Validate a serialized MODS record against the MODS 3.4 schema,
+    returning its errors (empty if the record is valid).
+    """
+    schema = get_mods_schema()
+    if schema.validate(etree.fromstring(mods_xml)):
+        return []
+    return [
+        {"line": error.line, "message": error.message} for error in schema.error_log
+    ]
+
+
+def run_chunks(
+    function: Callable,
+    chunks: list[list[int]],
+    jobs: int,
+    *args,
+    on_error: Callable[[list[int], Exception], object] | None = None,
+) -> list:
+    """Return function(chunk, *args) for each chunk of item ids, in chunk order,
+    using a pool of jobs worker processes if jobs is more than 1.  The function
+    must be module-level, so workers can run it.
+
+    If on_error is given, a chunk which raises an exception gets
+    on_error(chunk, exception) as its result; otherwise the exception is raised.
+    """
+    results = []
+
+    def add_result(chunk: list[int], get_result: Callable) -> None:
+        try:
+            results.append(get_result())
+        except Exception as e:
+            if on_error is None:
+                raise
+            logger.error(e)
+            results.append(on_error(chunk, e))
+
+    if jobs == 1:
+        for chunk in chunks:
+            add_result(chunk, lambda: function(chunk, *args))
+    else:
+        # Workers are forked from this process, so close its database connections
+        # first; each worker then opens its own, rather than sharing this one.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=jobs, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            futures = [executor.submit(function, chunk, *args) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                add_result(chunk, future.result)
+    return results
+
+
+def iter_mods_xml(
+    items: Iterable[ProjectItem], chunk_size: int = 100
+) -> Iterator[tuple[ProjectItem, bytes]]:
+    """Yield each item with its serialized MODS record, using cached ModsRecords
+    where possible.
+
+    Items are handled in chunks: one query gets the cached records for a chunk,
+    and any missing records are built together via get_mods_items() and cached.
+    """
+    items = iter(items)
+    while chunk := list(islice(items, chunk_size)):
+        mods_xml = dict(
+            ModsRecord.objects.filter(item__in=chunk).values_list("item_id", "mods_xml")
+        )
+        missing = [item for item in chunk if item.id not in mods_xml]
+        if missing:
+            new_records = []
+            for item in get_mods_items(missing):
+                content = build_mods_xml(item)
+                mods_xml[item.id] = content
+                new_records.append(
+                    ModsRecord(
+                        item=item,
+                        mods_xml=content,
+                        content_hash=get_content_hash(content),
+                    )
+                )
+            # Another request may have cached some of these in the meantime.
+            ModsRecord.objects.bulk_create(new_records, ignore_conflicts=True)
+        for item in chunk:
+            # BinaryField values can come back as memoryview.
+            yield item, bytes(mods_xml[item.id])
+
+
+def get_mods_file_dir() -> Path:
+    return Path(f"{settings.MEDIA_ROOT}/{settings.OH_STATIC}/mods")
+
+
+def get_mods_file_name(item: ProjectItem) -> str:
+    return f"{item.ark_ns}-mods.xml"
+
+
+def get_mods_document(mods_xml: bytes) -> bytes:
+    """Return a serialized MODS record (as cached in ModsRecord) as a complete,
+    pretty-printed document, the same as the files written to OH_STATIC/mods.
+    """
+    return etree.tostring(
+        etree.fromstring(mods_xml),
+        encoding="UTF-8",
+        pretty_print=True,
+        xml_declaration=True,
+    )
+
+
+@contextmanager
+def atomic_write_path(path: Path) -> Iterator[Path]:
+    """Yield a temporary path next to path to write to; when the block finishes
+    without error, rename the temporary file into place, so readers (web server,
+    rsync) never see a partially written file.
+    """
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+@contextmanager
+def atomic_write_paths(paths: list[Path]) -> Iterator[list[Path]]:
+    """As atomic_write_path(), for files which must be published together, such
+    as a dump and its checksum: none is renamed into place until all have been
+    written, and if a rename fails, the files already replaced are restored.
+    """
+    temp_paths = [path.with_name(f".{path.name}.{os.getpid()}.tmp") for path in paths]
+    backup_paths = [path.with_name(f".{path.name}.{os.getpid()}.bak") for path in paths]
+    try:
+        yield temp_paths
+        replaced = []
+        try:
+            for path, temp_path, backup_path in zip(paths, temp_paths, backup_paths):
+                # A hard link keeps the previous file, without copying it.
+                backup_path.unlink(missing_ok=True)
+                had_backup = path.exists()
+                if had_backup:
+                    os.link(path, backup_path)
+                os.replace(temp_path, path)
+                replaced.append((path, backup_path, had_backup))
+        except BaseException:
+            for path, backup_path, had_backup in reversed(replaced):
+                if had_backup:
+                    os.replace(backup_path, path)
+                else:
+                    path.unlink(missing_ok=True)
+            raise
+    finally:
+        for temp_path in temp_paths + backup_paths:
+            temp_path.unlink(missing_ok=True)
+
+
+def write_file_atomically(path: Path, content: bytes) -> None:
+    with atomic_write_path(path) as temp_path:
+        temp_path.write_bytes(content)
+
+
+def publish_mods_file(
+    item: ProjectItem, content: bytes, published_hash: str | None = None
+) -> bool:
+    """Write an item's MODS file and record it in the PublishedModsFile manifest.
+
+    If published_hash (from the manifest) matches content, and the file is still
+    there, nothing is written.  Returns whether the file was written.
+    """
+    file_dir = get_mods_file_dir()
+    file_name = get_mods_file_name(item)
+    content_hash = get_content_hash(content)
+    if content_hash == published_hash and (file_dir / file_name).is_file():
+        return False
+
+    file_dir.mkdir(exist_ok=True, parents=True)
+    write_file_atomically(file_dir / file_name, content)
+    PublishedModsFile.objects.update_or_create(
+        file_name=file_name,
+        defaults={
+            "item": item,
+            "content_hash": content_hash,
+            "write_date": timezone.now(),
+        },
+    )
+    logger.info(f"Wrote MODS for item id: {item.id} to file: {file_name}")
+    return True
+
+
+def get_published_hashes(items: Iterable[ProjectItem]) -> dict[str, str]:
+    """Return manifest content hashes for the items' MODS files, by file name."""
+    file_names = [get_mods_file_name(item) for item in items]
+    return dict(
+        PublishedModsFile.objects.filter(file_name__in=file_names).values_list(
+            "file_name", "content_hash"
+        )
+    )
+
+
+def remove_unpublished_mods_files() -> list[str]:
+    """Delete MODS files, and their manifest entries, for items which are deleted,
+    no longer Completed, or now have a different file name.
+    Returns the names of the files removed.
+    """
+    file_dir = get_mods_file_dir()
+    removed = []
+    for published in PublishedModsFile.objects.select_related("item__status"):
+        item = published.item
+        if (
+            item
+            and item.status.status.lower() == "completed"
+            and get_mods_file_name(item) == published.file_name
+        ):
+            continue
+        (file_dir / published.file_name).unlink(missing_ok=True)
+        published.delete()
+        logger.info(f"Removed unpublished MODS file: {published.file_name}")
+        removed.append(published.file_name)
+    return removed
+
+
+# Full-collection dumps, written by the create_oai_dump command.
+OAI_DUMP_FILE_NAME = "oai-listrecords.xml.gz"
+MODS_DUMP_FILE_NAME = "mods-records.tar.gz"
+
+
+def get_dump_file_dir() -> Path:
+    return Path(f"{settings.MEDIA_ROOT}/{settings.OH_STATIC}/dumps")
+
+
+def get_checksum_file_path(path: Path) -> Path:
+    # Written in sha256sum format, so downloads can be checked with sha256sum -c.
+    return path.with_name(f"{path.name}.sha256")
+
+
+def get_file_checksum(path: Path) -> str:
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
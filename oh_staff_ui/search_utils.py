@@ -0,0 +1,189 @@
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import caches
+from typing import TYPE_CHECKING
+from django.db.models import Q
+from oh_staff_ui.models import (
+    AltId,
+    AltTitle,
+    Copyright,
+    Date,
+    Description,
+    Format,
+    ItemCopyrightUsage,
+    ItemNameUsage,
+    ItemPublisherUsage,
+    ItemResourceUsage,
+    ItemSubjectUsage,
+    Name,
+    ProjectItem,
+    ProjectItemSearchDocument,
+    Publisher,
+    Resource,
+    Subject,
+)
+
+if TYPE_CHECKING:
+    from oh_staff_ui.classes.SearchIndex import SearchIndex
+
+# Values in an item's search document: model, field with the item id, and
+# field with the value.
+SEARCH_DOCUMENT_VALUES = [
+    (ProjectItem, "id", "title"),
+    (ProjectItem, "id", "ark"),
+    (ProjectItem, "id", "coverage"),
+    (ProjectItem, "id", "relation"),
+    (AltId, "item_id", "value"),
+    (AltTitle, "item_id", "value"),
+    (Date, "item_id", "value"),
+    (Description, "item_id", "value"),
+    (Format, "item_id", "value"),
+    (ItemCopyrightUsage, "item_id", "value__value"),
+    (ItemNameUsage, "item_id", "value__value"),
+    (ItemPublisherUsage, "item_id", "value__value"),
+    (ItemResourceUsage, "item_id", "value__value"),
+    (ItemSubjectUsage, "item_id", "value__value"),
+]
+
+# Models holding metadata which belongs to a single item, in search documents.
+SEARCH_DOCUMENT_ITEM_MODELS = [
+    model for model, id_field, _ in SEARCH_DOCUMENT_VALUES if id_field == "item_id"
+]
+
+# Shared authority values in search documents, with the models linking them to items.
+SEARCH_DOCUMENT_AUTHORITY_MODELS = {
+    Copyright: ItemCopyrightUsage,
+    Name: ItemNameUsage,
+    Publisher: ItemPublisherUsage,
+    Resource: ItemResourceUsage,
+    Subject: ItemSubjectUsage,
+}
+
+# Key in the shared cache of the catalog generation; see get_catalog_generation().
+CATALOG_GENERATION_KEY = "search-catalog-generation"
+
+# This process's in-memory search index, built by get_search_index() when first used.
+_search_index = None
+_search_index_checked_at = 0.0
+
+
+def normalize_search_text(text: str) -> str:
+    """Lower-case text, ignoring differences of case and whitespace, for
+    search documents and the queries matched against them.
+    """
+    return " ".join(text.casefold().split())
+
+
+def get_search_documents(item_ids: Iterable[int]) -> dict[int, str]:
+    """Build the search documents of the given items, in one query whatever
+    the number of items.  Ids of items which no longer exist are ignored.
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return {}
+    querysets = [
+        model.objects.filter(**{f"{id_field}__in": item_ids}).values_list(
+            id_field, value_field
+        )
+        for model, id_field, value_field in SEARCH_DOCUMENT_VALUES
+    ]
+    item_values = defaultdict(list)
+    for item_id, value in querysets[0].union(*querysets[1:], all=True):
+        item_values[item_id].append(normalize_search_text(value))
+    # Every item has a title and ARK, so every item which exists is here.
+    # Values are separate lines, so a search for a phrase can't match the end
+    # of one value and the start of the next.
+    return {
+        item_id: "\n".join(value for value in sorted(values) if value)
+        for item_id, values in item_values.items()
+    }
+
+
+def update_search_documents(item_ids: Iterable[int]) -> int:
+    """Create or replace the search documents of the given items, returning
+    the number written.
+    """
+    documents = [
+        ProjectItemSearchDocument(item_id=item_id, document=document)
+        for item_id, document in get_search_documents(item_ids).items()
+    ]
+    ProjectItemSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=["item"],
+        update_fields=["document"],
+    )
+    return len(documents)
+
+
+def get_search_document_query(query: str) -> Q:
+    """Match search documents containing the whole query, or every word of it,
+    as in construct_keyword_query().
+    """
+    query = normalize_search_text(query)
+    document_q = Q(document__contains=query)
+    keywords = query.split()
+    if len(keywords) > 1:
+        words_q = Q()
+        for word in keywords:
+            words_q = words_q & Q(document__contains=word)
+        document_q = document_q | words_q
+    return document_q
+
+
+def get_search_index() -> "SearchIndex":
+    """Return this process's in-memory search index, loading it from
+    settings.SEARCH_INDEX_SNAPSHOT (if the file exists) or building it from
+    the database the first time.  Changes made by other processes are picked
+    up at most every settings.SEARCH_INDEX_SYNC_SECONDS.
+    """
+    # Imported here, since the index itself uses this module.
+    from oh_staff_ui.classes.SearchIndex import SearchIndex
+
+    global _search_index, _search_index_checked_at
+    if _search_index is None:
+        snapshot = settings.SEARCH_INDEX_SNAPSHOT
+        if snapshot and Path(snapshot).exists():
+            _search_index = SearchIndex.load(snapshot)
+        else:
+            _search_index = SearchIndex.build()
+        _search_index_checked_at = time.monotonic()
+    elif (
+        time.monotonic() - _search_index_checked_at
+        >= settings.SEARCH_INDEX_SYNC_SECONDS
+    ):
+        _search_index.sync()
+        _search_index_checked_at = time.monotonic()
+    return _search_index
+
+
+def update_search_index(item_ids: Iterable[int]) -> None:
+    """Re-index the given items in this process's search index, if it has
+    been built; otherwise, there is nothing to update.
+    """
+    if _search_index is not None:
+        _search_index.update_items(item_ids)
+
+
+def get_catalog_generation() -> int:
+    """Return the catalog generation, a number which changes whenever any item
+    or its metadata changes, kept in the shared cache so all workers see it.
+    """
+    shared_cache = caches["shared"]
+    generation = shared_cache.get(CATALOG_GENERATION_KEY)
+    if generation is None:
+        # Not set yet, or culled from the cache: start a new generation.
+        shared_cache.add(CATALOG_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = shared_cache.get(CATALOG_GENERATION_KEY)
+    return generation
+
+
+def bump_catalog_generation() -> None:
+    """Start a new catalog generation, making cached search results obsolete.
+    Generations are the time they started, so are never reused, even if the
+    current one is lost from the cache.
+    """
+    caches["shared"].set(CATALOG_GENERATION_KEY, time.time_ns(), timeout=None)
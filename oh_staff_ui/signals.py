@@ -0,0 +1,375 @@
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from oh_staff_ui.models import (
+    OAI_PUBLISHED_STATUSES,
+    AltId,
+    AltTitle,
+    Copyright,
+    Date,
+    Description,
+    Format,
+    ItemCopyrightUsage,
+    ItemLanguageUsage,
+    ItemNameUsage,
+    ItemPublisherUsage,
+    ItemResourceUsage,
+    ItemSubjectUsage,
+    Language,
+    MediaFile,
+    ModsRecord,
+    Name,
+    ProjectItem,
+    ProjectItemChange,
+    Subject,
+)
+from oh_staff_ui.search_utils import (
+    SEARCH_DOCUMENT_AUTHORITY_MODELS,
+    SEARCH_DOCUMENT_ITEM_MODELS,
+    bump_catalog_generation,
+    update_search_documents,
+    update_search_index,
+)
+
+# Models holding metadata which belongs to a single item.
+ITEM_METADATA_MODELS = [
+    AltId,
+    AltTitle,
+    Date,
+    Description,
+    Format,
+    ItemCopyrightUsage,
+    ItemLanguageUsage,
+    ItemNameUsage,
+    ItemPublisherUsage,
+    ItemResourceUsage,
+    ItemSubjectUsage,
+    MediaFile,
+]
+
+# Shared authority values used in MODS records, with the models linking them to items.
+AUTHORITY_USAGE_MODELS = {
+    Copyright: ItemCopyrightUsage,
+    Language: ItemLanguageUsage,
+    Name: ItemNameUsage,
+    Subject: ItemSubjectUsage,
+}
+
+
+# Number of item ids per query when applying changes, to stay within the
+# limits some databases have on query parameters.
+ITEM_CHANGES_CHUNK_SIZE = 500
+
+# This thread's changes waiting for the current transaction to commit.
+_pending = threading.local()
+
+
+class ItemChanges:
+    """Items changed in one transaction, whose cached MODS records,
+    last_modified_date and search data are updated together once it commits,
+    by calling this.  Saving many rows in a transaction, as the edit page
+    does, then costs a few queries in all, rather than several for every row.
+    """
+
+    def __init__(self, keep_dates: bool = False) -> None:
+        # Whether to leave last_modified_date alone, for data imports.
+        self.keep_dates = keep_dates
+        # Items whose metadata changed, which affects them and their relatives.
+        self.changed = set()
+        # Items which were saved, and set their own last_modified_date.
+        self.saved = set()
+        # Other items whose MODS records include data which changed.
+        self.relatives = set()
+        # Items whose search documents changed.
+        self.searched = set()
+        # Items whose search documents are unchanged, but whose other data
+        # in the search index changed.
+        self.indexed = set()
+
+    def __call__(self) -> None:
+        if getattr(_pending, "changes", None) is self:
+            _pending.changes = None
+        apply_item_changes(self)
+
+
+def record_item_changes(
+    changed: Iterable[int] = (),
+    saved: Iterable[int] = (),
+    relatives: Iterable[int] = (),
+    searched: Iterable[int] = (),
+    indexed: Iterable[int] = (),
+) -> None:
+    """Record changed items, as for ItemChanges, to be dealt with once the
+    current transaction commits, or at once outside a transaction.
+    """
+    changed, saved, relatives = set(changed), set(saved), set(relatives)
+    searched, indexed = set(searched), set(indexed)
+    if not (changed or saved or relatives or searched or indexed):
+        return
+    changes = getattr(_pending, "changes", None)
+    keep_dates = getattr(_pending, "keep_dates", False)
+    connection = transaction.get_connection()
+    # Only add to changes registered at the same savepoint: Django drops the
+    # callbacks of a savepoint or transaction which was rolled back.
+    savepoint_ids = set(connection.savepoint_ids)
+    is_new = (
+        changes is None
+        or changes.keep_dates != keep_dates
+        or not any(
+            callback is changes and sids == savepoint_ids
+            for sids, callback, _ in connection.run_on_commit
+        )
+    )
+    if is_new:
+        changes = _pending.changes = ItemChanges(keep_dates)
+    changes.changed.update(changed)
+    changes.saved.update(saved)
+    changes.relatives.update(relatives)
+    changes.searched.update(searched)
+    changes.indexed.update(indexed)
+    if is_new:
+        transaction.on_commit(changes)
+
+
+@contextmanager
+def keep_last_modified_dates() -> Iterator[None]:
+    """Run the block in a transaction whose changes leave the items'
+    last_modified_date alone, as data imports need to keep the original
+    dates.  Cached MODS records and search data are still updated.
+    """
+    keep_dates = getattr(_pending, "keep_dates", False)
+    _pending.keep_dates = True
+    try:
+        with transaction.atomic():
+            yield
+    finally:
+        _pending.keep_dates = keep_dates
+
+
+def get_related_item_ids(item_ids: Iterable[int]) -> set[int]:
+    """Return ids of the items, their parents and their children, since the
+    MODS records of each include some of an item's data.
+    """
+    item_ids = list(item_ids)
+    return set(
+        ProjectItem.objects.filter(
+            Q(pk__in=item_ids) | Q(parent_id__in=item_ids) | Q(projectitem__in=item_ids)
+        )
+        .values_list("pk", flat=True)
+        .distinct()
+    )
+
+
+def get_chunks(item_ids: Iterable[int]) -> list[list[int]]:
+    item_ids = sorted(item_ids)
+    return [
+        item_ids[i : i + ITEM_CHANGES_CHUNK_SIZE]
+        for i in range(0, len(item_ids), ITEM_CHANGES_CHUNK_SIZE)
+    ]
+
+
+def apply_item_changes(changes: ItemChanges) -> None:
+    """Delete cached MODS for the changed items and their relatives, and update
+    their last_modified_date so OAI harvesters using from / until pick up the
+    change.  Then update the search documents and index of the items whose
+    search data changed, journal those which were not saved themselves, so
+    other workers' search indexes pick up the change, and start a new catalog
+    generation.
+    """
+    changed_ids = set(changes.relatives)
+    saved_relative_ids = set()
+    for chunk in get_chunks(changes.changed):
+        changed_ids |= get_related_item_ids(chunk)
+    for chunk in get_chunks(changes.saved):
+        saved_relative_ids |= get_related_item_ids(chunk)
+    # Whoever saves an item sets its own last_modified_date.
+    changed_ids |= saved_relative_ids - changes.saved
+    for chunk in get_chunks(changed_ids | changes.saved):
+        ModsRecord.objects.filter(item_id__in=chunk).delete()
+    if not changes.keep_dates:
+        now = timezone.now()
+        for chunk in get_chunks(changed_ids):
+            # update() does not send signals, so this can't trigger itself.
+            ProjectItem.objects.filter(pk__in=chunk).update(last_modified_date=now)
+    for chunk in get_chunks(changes.searched):
+        update_search_documents(chunk)
+    for chunk in get_chunks((changes.searched | changes.indexed) - changes.saved):
+        items = ProjectItem.objects.select_related(
+            "status", "type", "parent__type", "parent__parent__type"
+        ).filter(pk__in=chunk)
+        ProjectItemChange.objects.bulk_create(
+            get_item_change(
+                item,
+                ProjectItemChange.UPDATED,
+                was_published=is_oai_published(item),
+                published=is_oai_published(item),
+            )
+            for item in items
+        )
+    if changes.searched or changes.indexed:
+        update_search_index(changes.searched | changes.indexed)
+        bump_catalog_generation()
+
+
+@receiver(post_save, sender=ProjectItem)
+@receiver(pre_delete, sender=ProjectItem)
+def project_item_changed(sender, instance: ProjectItem, **kwargs) -> None:
+    if kwargs.get("raw"):
+        return
+    if kwargs["signal"] is pre_delete:
+        # Once the item is gone, its parent and children can't be found.
+        relative_ids = get_related_item_ids([instance.pk]) - {instance.pk}
+        record_item_changes(saved=[instance.pk], relatives=relative_ids)
+    else:
+        # The parent the item had before the change, if it has moved, from
+        # record_publication_state().
+        previous_parent_id = getattr(instance, "_previous_parent_id", None)
+        record_item_changes(
+            saved=[instance.pk],
+            relatives=[previous_parent_id] if previous_parent_id else [],
+        )
+
+
+def item_metadata_changed(sender, instance, **kwargs) -> None:
+    if not kwargs.get("raw"):
+        record_item_changes(changed=[instance.item_id])
+
+
+for model in ITEM_METADATA_MODELS:
+    post_save.connect(item_metadata_changed, sender=model)
+    post_delete.connect(item_metadata_changed, sender=model)
+
+
+def authority_changed(sender, instance, **kwargs) -> None:
+    # Authority values can't be deleted while in use, so only changes matter.
+    if not kwargs.get("raw"):
+        usages = AUTHORITY_USAGE_MODELS[sender].objects.filter(value=instance)
+        record_item_changes(relatives=usages.values_list("item_id", flat=True))
+
+
+for model in AUTHORITY_USAGE_MODELS:
+    post_save.connect(authority_changed, sender=model)
+
+
+@receiver(post_save, sender=ProjectItem)
+@receiver(post_delete, sender=ProjectItem)
+def project_item_search_document_changed(
+    sender, instance: ProjectItem, **kwargs
+) -> None:
+    # Deleting an item deletes its search document too; this just removes it
+    # from the search index.
+    if not kwargs.get("raw"):
+        record_item_changes(searched=[instance.pk])
+
+
+def item_search_metadata_changed(sender, instance, **kwargs) -> None:
+    if not kwargs.get("raw"):
+        record_item_changes(searched=[instance.item_id])
+
+
+for model in SEARCH_DOCUMENT_ITEM_MODELS:
+    post_save.connect(item_search_metadata_changed, sender=model)
+    post_delete.connect(item_search_metadata_changed, sender=model)
+
+
+@receiver(post_save, sender=MediaFile)
+@receiver(post_delete, sender=MediaFile)
+def media_file_search_data_changed(sender, instance: MediaFile, **kwargs) -> None:
+    # Media file types are not in search documents, but the search index uses
+    # them to filter results.
+    if not kwargs.get("raw"):
+        record_item_changes(indexed=[instance.item_id])
+
+
+def search_authority_changed(sender, instance, **kwargs) -> None:
+    # As in authority_changed(), only changes to values in use matter.
+    if not kwargs.get("raw"):
+        usages = SEARCH_DOCUMENT_AUTHORITY_MODELS[sender].objects.filter(value=instance)
+        record_item_changes(searched=usages.values_list("item_id", flat=True))
+
+
+for model in SEARCH_DOCUMENT_AUTHORITY_MODELS:
+    post_save.connect(search_authority_changed, sender=model)
+
+
+def is_oai_published(item: ProjectItem) -> bool:
+    # The same rule as get_oai_items().
+    return (
+        item.status.status in OAI_PUBLISHED_STATUSES
+        and item.type.type.lower() != "series"
+    )
+
+
+def get_series_ark(item: ProjectItem) -> str:
+    parent = item.parent
+    while parent:
+        if parent.type.type == "Series":
+            return parent.ark
+        parent = parent.parent
+    return ""
+
+
+def get_item_change(
+    item: ProjectItem, change_type: str, was_published: bool, published: bool
+) -> ProjectItemChange:
+    return ProjectItemChange(
+        item_id=item.pk,
+        ark=item.ark,
+        set_ark=get_series_ark(item),
+        change_type=change_type,
+        status=item.status.status,
+        was_published=was_published,
+        published=published,
+    )
+
+
+def add_item_change(
+    item: ProjectItem, change_type: str, was_published: bool, published: bool
+) -> None:
+    get_item_change(item, change_type, was_published, published).save()
+
+
+@receiver(pre_save, sender=ProjectItem)
+def record_publication_state(sender, instance: ProjectItem, **kwargs) -> None:
+    # Whether the item was published before this save, for journal_item_saved(),
+    # and its parent, for project_item_changed().
+    if kwargs.get("raw"):
+        return
+    previous = (
+        ProjectItem.objects.select_related("status", "type")
+        .filter(pk=instance.pk)
+        .first()
+        if instance.pk
+        else None
+    )
+    instance._was_published = previous is not None and is_oai_published(previous)
+    instance._previous_parent_id = None
+    if previous is not None and previous.parent_id != instance.parent_id:
+        instance._previous_parent_id = previous.parent_id
+
+
+@receiver(post_save, sender=ProjectItem)
+def journal_item_saved(sender, instance: ProjectItem, created: bool, **kwargs) -> None:
+    if kwargs.get("raw"):
+        return
+    add_item_change(
+        instance,
+        ProjectItemChange.CREATED if created else ProjectItemChange.UPDATED,
+        was_published=getattr(instance, "_was_published", False),
+        published=is_oai_published(instance),
+    )
+
+
+@receiver(pre_delete, sender=ProjectItem)
+def journal_item_deleted(sender, instance: ProjectItem, **kwargs) -> None:
+    add_item_change(
+        instance,
+        ProjectItemChange.DELETED,
+        was_published=is_oai_published(instance),
+        published=False,
+    )
@@ -1,14 +1,30 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from contextlib import redirect_stdout
 from http import HTTPStatus
+import json
+import os
+from io import StringIO
+import gzip
+import tarfile
 from shutil import rmtree
+from tempfile import TemporaryDirectory
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
 from lxml import etree
 from pathlib import Path
 from PIL import Image
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files import File
+from django.core.management import call_command
 from django.core.management.base import CommandError
-from django.db import IntegrityError
-from django.http import HttpRequest
+from django.db import IntegrityError, connection
+from django.http import HttpRequest, HttpResponse
 from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from django.contrib.auth.models import User, Group
 from eulxml.xmlmap import load_xmlobject_from_string, mods
 from oh_staff_ui.classes.GeneralFileHandler import GeneralFileHandler
@@ -42,20 +58,41 @@ from oh_staff_ui.models import (
     MediaFile,
     MediaFileError,
     MediaFileType,
+    ModsRecord,
     Name,
     NameType,
     ProjectItem,
+    ProjectItemChange,
+    ProjectItemSearchDocument,
+    PublishedModsFile,
     Publisher,
+    PublisherType,
     Resource,
     Subject,
     SubjectType,
 )
 
+from oh_staff_ui import search_utils
 from oh_staff_ui.classes.OralHistoryFile import OralHistoryFile
 from oh_staff_ui.classes.AudioFileHandler import AudioFileHandler
 from oh_staff_ui.classes.OralHistoryMods import OralHistoryMods
+from oh_staff_ui.classes.SearchIndex import SearchIndex
+from oh_staff_ui.mods_utils import (
+    get_checksum_file_path,
+    get_dump_file_dir,
+    get_file_checksum,
+    get_mods_engine,
+    get_mods_items,
+    get_mods_validation_errors,
+)
+from oh_staff_ui.search_utils import get_search_index
 from oh_staff_ui.views_utils import (
+    decode_resumption_token,
+    encode_search_cursor,
+    get_oai_dc_transform,
     get_records_oai,
+    get_search_results,
+    get_search_suggestions,
     get_bad_arg_error_xml,
     get_bad_verb_error_xml,
     delete_file_and_children,
@@ -1203,6 +1240,8 @@ class ModsTestCase(TestCase):
         # Remove test mods folder and file(s) created by test_writing_single_mods()
         p = Path(f"{settings.MEDIA_ROOT}/{settings.OH_STATIC}/mods/")
         rmtree(p)
+        # And dumps created by test_create_oai_dump()
+        rmtree(get_dump_file_dir(), ignore_errors=True)
         super().tearDownClass()
 
     # Utility methods to pretty print xml
@@ -1246,12 +1285,14 @@ class ModsTestCase(TestCase):
     def save_interview_item_with_status(self, status: str):
         interview = self.interview_item
         interview.status = ItemStatus.objects.get(status=status)
-        interview.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            interview.save()
 
     def save_audio_item_with_status(self, status: str):
         audio = self.audio_item
         audio.status = ItemStatus.objects.get(status=status)
-        audio.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            audio.save()
 
     # Utility methods to get specific data from OAI feed
     def get_oai_record_count(self) -> int:
@@ -1459,6 +1500,165 @@ class ModsTestCase(TestCase):
             file="oh_static/text/submasters/fake-abcdef-2-master-tei.xml",
         )
 
+    def test_mods_engines_match(self):
+        # Include children, and data for the less common parts of the records.
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        self.interview_item.relation = "Related collection"
+        self.interview_item.save()
+        for item, value in [
+            (self.series_item, "Series abstract"),
+            (self.interview_item, "Second abstract"),
+            (self.audio_item, "Second table of contents"),
+        ]:
+            desc_type = "tableOfContents" if item == self.audio_item else "abstract"
+            Description.objects.create(
+                item=item,
+                value=value,
+                type=DescriptionType.objects.get(type=desc_type),
+            )
+        Date.objects.create(
+            item=self.interview_item,
+            value="2001",
+            type=DateType.objects.get(type="creation"),
+        )
+        MediaFile.objects.create(
+            created_by=self.user,
+            file_type=MediaFileType.objects.get(file_code="text_master_transcript"),
+            item=self.audio_item,
+            original_file_name="FAKE_TEI_SUBMASTER",
+            file="oh_static/text/submasters/fake-abcdef-2-submaster.xml",
+        )
+
+        eulxml_engine = get_mods_engine("eulxml")
+        lxml_engine = get_mods_engine("lxml")
+        for item in get_mods_items(ProjectItem.objects.all()):
+            eulxml_mods = eulxml_engine(item)
+            lxml_mods = lxml_engine(item)
+            self.assertEqual(
+                etree.tostring(eulxml_mods.node), etree.tostring(lxml_mods.node)
+            )
+            self.assertEqual(
+                eulxml_mods.serializeDocument(pretty=True),
+                lxml_mods.serializeDocument(pretty=True),
+            )
+
+    def test_benchmark_mods_engines(self):
+        self.save_interview_item_with_status("Completed")
+        out = StringIO()
+        call_command("benchmark_mods_engines", repeat=1, stdout=out)
+        self.assertIn("as fast as eulxml", out.getvalue())
+
+    def test_create_oai_dump(self):
+        rmtree(get_dump_file_dir(), ignore_errors=True)
+        response = self.client.get("/oai/dump/")
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        out = StringIO()
+        call_command("create_oai_dump", base_url="http://testserver/oai/", stdout=out)
+        self.assertIn("oai-listrecords.xml.gz: 2 records", out.getvalue())
+        self.assertIn("mods-records.tar.gz: 2 records", out.getvalue())
+
+        dump_dir = get_dump_file_dir()
+        with gzip.open(dump_dir / "oai-listrecords.xml.gz") as dump_file:
+            root = etree.parse(dump_file).getroot()
+        ns = {"oai": "http://www.openarchives.org/OAI/2.0/"}
+        self.assertEqual(len(root.findall(".//oai:record", ns)), 2)
+        # One complete response, without paging.
+        self.assertIsNone(root.find(".//oai:resumptionToken", ns))
+
+        with tarfile.open(dump_dir / "mods-records.tar.gz") as dump_file:
+            content = dump_file.extractfile("mods/fakeinterview-abcdef-mods.xml").read()
+            self.assertEqual(len(dump_file.getmembers()), 2)
+        self.assertEqual(
+            content,
+            get_mods_engine()(self.interview_item).serializeDocument(pretty=True),
+        )
+        # No temporary files are left behind.
+        self.assertEqual(
+            sorted(path.name for path in dump_dir.iterdir()),
+            [
+                "mods-records.tar.gz",
+                "mods-records.tar.gz.sha256",
+                "oai-listrecords.xml.gz",
+                "oai-listrecords.xml.gz.sha256",
+            ],
+        )
+
+        response = self.client.get("/oai/dump/")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        dumps = {dump["file_name"]: dump for dump in response.json()["dumps"]}
+        for file_name in ["oai-listrecords.xml.gz", "mods-records.tar.gz"]:
+            path = dump_dir / file_name
+            self.assertEqual(dumps[file_name]["size"], path.stat().st_size)
+            self.assertEqual(dumps[file_name]["sha256"], get_file_checksum(path))
+            self.assertEqual(
+                get_checksum_file_path(path).read_text(),
+                f"{get_file_checksum(path)}  {file_name}\n",
+            )
+
+    def test_create_oai_dump_keeps_previous_dump_on_failure(self):
+        rmtree(get_dump_file_dir(), ignore_errors=True)
+        self.save_interview_item_with_status("Completed")
+        call_command("create_oai_dump", stdout=StringIO())
+        dump_dir = get_dump_file_dir()
+        path = dump_dir / "oai-listrecords.xml.gz"
+        previous_dump = path.read_bytes()
+        previous_checksum = get_checksum_file_path(path).read_text()
+
+        self.save_audio_item_with_status("Completed")
+        replace = os.replace
+
+        def failing_replace(src, dst):
+            # Fail once the new dump is in place, before its checksum is.
+            if Path(dst).name == "oai-listrecords.xml.gz.sha256":
+                raise OSError("No space left on device")
+            replace(src, dst)
+
+        with patch("oh_staff_ui.mods_utils.os.replace", failing_replace):
+            with self.assertRaises(OSError):
+                call_command("create_oai_dump", stdout=StringIO())
+        self.assertEqual(path.read_bytes(), previous_dump)
+        self.assertEqual(get_checksum_file_path(path).read_text(), previous_checksum)
+        # No temporary or backup files are left behind.
+        self.assertEqual(
+            sorted(path.name for path in dump_dir.iterdir()),
+            [
+                "mods-records.tar.gz",
+                "mods-records.tar.gz.sha256",
+                "oai-listrecords.xml.gz",
+                "oai-listrecords.xml.gz.sha256",
+            ],
+        )
+
+    def test_validate_mods(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("validate_mods", jobs=1, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual((report["items"], report["valid"]), (2, 1))
+        # The public site relies on url usage="timed log", which MODS 3.4 lacks.
+        [invalid] = report["invalid_items"]
+        self.assertEqual(invalid["ark"], self.audio_item.ark)
+        self.assertIn("'timed log'", invalid["errors"][0]["message"])
+
+    def test_mods_validation_errors(self):
+        mods_xml = self.get_mods_from_interview_item().serializeDocument()
+        self.assertEqual(get_mods_validation_errors(mods_xml), [])
+        errors = get_mods_validation_errors(
+            b'<mods xmlns="http://www.loc.gov/mods/v3"><notMods/></mods>'
+        )
+        self.assertEqual(len(errors), 1)
+        self.assertIn("notMods", errors[0]["message"])
+
+    def test_unknown_mods_engine(self):
+        with self.assertRaises(ValueError):
+            get_mods_engine("unknown")
+
     def test_writing_single_mods(self):
         ohmods = self.get_mods_from_interview_item()
         ohmods.write_mods_record()
@@ -1468,6 +1668,177 @@ class ModsTestCase(TestCase):
         p = Path(f"{settings.MEDIA_ROOT}/{settings.OH_STATIC}/mods/{ark_ns}-mods.xml")
         self.assertTrue(p.is_file())
 
+    def get_mods_query_count(self, items) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            for item in get_mods_items(items):
+                OralHistoryMods(item).serializeDocument()
+        return len(queries)
+
+    def test_batch_mods_query_count_is_constant(self):
+        # Building MODS for a batch of items should take the same number of
+        # queries, whether the batch has one item or many.
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        all_items = ProjectItem.objects.order_by("id")
+        # The interview has both a parent and a child, so uses every prefetch.
+        one_item_count = self.get_mods_query_count(
+            all_items.filter(id=self.interview_item.id)
+        )
+        all_items_count = self.get_mods_query_count(all_items)
+        self.assertEqual(one_item_count, all_items_count)
+
+    def test_batch_mods_matches_single_item_mods(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        batch_mods = {
+            item.id: OralHistoryMods(item).serializeDocument()
+            for item in get_mods_items(ProjectItem.objects.all())
+        }
+        for item in (self.series_item, self.interview_item, self.audio_item):
+            with self.subTest(item=item.title):
+                self.assertEqual(
+                    batch_mods[item.id], OralHistoryMods(item).serializeDocument()
+                )
+
+    def test_writing_bulk_mods(self):
+        self.save_interview_item_with_status("Completed")
+        call_command("create_mods_records", bulk="all", stdout=StringIO())
+        ark_ns = self.interview_item.ark_ns
+        p = Path(f"{settings.MEDIA_ROOT}/{settings.OH_STATIC}/mods/{ark_ns}-mods.xml")
+        self.assertTrue(p.is_file())
+
+    def test_writing_bulk_mods_in_chunks(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        out = StringIO()
+        call_command("create_mods_records", bulk="all", chunk_size=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn(
+            f"Items {self.interview_item.id}-{self.interview_item.id}: 1 of 1 written",
+            output,
+        )
+        self.assertIn("2 of 2 MODS records written", output)
+
+    def test_writing_bulk_mods_continues_after_item_error(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        mods_engine = get_mods_engine()
+
+        def failing_mods_engine(item: ProjectItem):
+            if item.id == self.interview_item.id:
+                raise ValueError("Bad MODS data")
+            return mods_engine(item)
+
+        out = StringIO()
+        with patch(
+            "oh_staff_ui.management.commands.create_mods_records.get_mods_engine",
+            return_value=failing_mods_engine,
+        ):
+            call_command("create_mods_records", bulk="all", stdout=out)
+        output = out.getvalue()
+        self.assertIn(f"Item {self.interview_item.id}: Bad MODS data", output)
+        self.assertIn("1 of 2 MODS records written", output)
+        self.assertTrue(self.get_mods_file_path(self.audio_item).is_file())
+
+    def get_mods_file_path(self, item: ProjectItem) -> Path:
+        return Path(
+            f"{settings.MEDIA_ROOT}/{settings.OH_STATIC}/mods/{item.ark_ns}-mods.xml"
+        )
+
+    def create_incremental_mods(self) -> str:
+        out = StringIO()
+        call_command("create_mods_records", bulk="all", incremental=True, stdout=out)
+        return out.getvalue()
+
+    def test_incremental_mods_skips_unchanged_records(self):
+        self.save_interview_item_with_status("Completed")
+        call_command("create_mods_records", bulk="all", stdout=StringIO())
+        self.assertTrue(
+            PublishedModsFile.objects.filter(item=self.interview_item).exists()
+        )
+        output = self.create_incremental_mods()
+        self.assertIn("0 of 1 MODS records written, 1 unchanged", output)
+
+    def test_incremental_mods_writes_changed_records(self):
+        self.save_interview_item_with_status("Completed")
+        self.create_incremental_mods()
+        self.interview_item.title = "Revised interview title"
+        self.interview_item.save()
+        output = self.create_incremental_mods()
+        self.assertIn("1 of 1 MODS records written, 0 unchanged", output)
+        content = self.get_mods_file_path(self.interview_item).read_bytes()
+        self.assertIn(b"Revised interview title", content)
+
+    def test_incremental_mods_removes_unpublished_records(self):
+        self.save_interview_item_with_status("Completed")
+        self.create_incremental_mods()
+        p = self.get_mods_file_path(self.interview_item)
+        self.assertTrue(p.is_file())
+        self.save_interview_item_with_status("Sealed")
+        output = self.create_incremental_mods()
+        self.assertIn("1 removed", output)
+        self.assertFalse(p.exists())
+        self.assertFalse(PublishedModsFile.objects.exists())
+
+    def test_bulk_mods_requires_positive_jobs(self):
+        with self.assertRaises(CommandError):
+            call_command("create_mods_records", bulk="all", jobs=0, stdout=StringIO())
+
+    def test_oai_caches_mods_records(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        get_records_oai("ListRecords")
+        self.assertTrue(ModsRecord.objects.filter(item=self.interview_item).exists())
+        self.assertTrue(ModsRecord.objects.filter(item=self.audio_item).exists())
+
+    def test_oai_serves_cached_mods_records(self):
+        self.save_interview_item_with_status("Completed")
+        get_records_oai("ListRecords")
+        ModsRecord.objects.filter(item=self.interview_item).update(
+            mods_xml=b"<cached>from cache</cached>"
+        )
+        response = get_records_oai(verb="GetRecord", ark=self.interview_item.ark)
+        self.assertIn(b"<cached>from cache</cached>", response)
+
+    def test_cached_mods_invalidated_by_metadata_change(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        get_records_oai("ListRecords")
+        with self.captureOnCommitCallbacks(execute=True):
+            Date.objects.create(
+                item=self.interview_item,
+                value="2001",
+                type=DateType.objects.get(type="creation"),
+            )
+        self.assertFalse(ModsRecord.objects.filter(item=self.interview_item).exists())
+
+    def test_cached_mods_invalidated_by_child_change(self):
+        # Interview records include data from their audio children.
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        get_records_oai("ListRecords")
+        toc = Description.objects.get(
+            item=self.audio_item, type__type="tableOfContents"
+        )
+        toc.value = "Revised Table of Contents"
+        with self.captureOnCommitCallbacks(execute=True):
+            toc.save()
+        self.assertFalse(ModsRecord.objects.filter(item=self.interview_item).exists())
+        self.assertFalse(ModsRecord.objects.filter(item=self.audio_item).exists())
+        response = get_records_oai(verb="GetRecord", ark=self.interview_item.ark)
+        self.assertIn(b"Revised Table of Contents", response)
+
+    def test_cached_mods_invalidated_by_authority_change(self):
+        self.save_interview_item_with_status("Completed")
+        get_records_oai("ListRecords")
+        name = Name.objects.get(value="Joe Bruin")
+        name.value = "Josephine Bruin"
+        with self.captureOnCommitCallbacks(execute=True):
+            name.save()
+        self.assertFalse(ModsRecord.objects.filter(item=self.interview_item).exists())
+        response = get_records_oai(verb="GetRecord", ark=self.interview_item.ark)
+        self.assertIn(b"<mods:namePart>Josephine Bruin</mods:namePart>", response)
+
     def test_bad_getrecord_request(self):
         bad_response = get_bad_arg_error_xml("GetRecordWithoutIdentifier")
         self.assertTrue(b'<error code="badArgument"/>' in bad_response)
@@ -1489,6 +1860,515 @@ class ModsTestCase(TestCase):
             b'<request metadataPrefix="mods" verb="ListRecords">' in response
         )
 
+    def get_resumption_token(self, response: bytes) -> etree.Element:
+        root = etree.fromstring(response)
+        return root.find(".//resumptionToken", namespaces=root.nsmap)
+
+    def test_listrecords_single_page_has_no_resumption_token(self):
+        # Both test records fit on the default page, so the list is complete.
+        response = get_records_oai("ListRecords")
+        self.assertIsNone(self.get_resumption_token(response))
+
+    @override_settings(OAI_PAGE_SIZE=1)
+    def test_listrecords_pages_with_resumption_token(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        first_page = get_records_oai("ListRecords")
+        token = self.get_resumption_token(first_page)
+        self.assertTrue(token.text)
+        self.assertIn(b"fakeinterview/abcdef", first_page)
+        self.assertNotIn(b"<identifier>fakeaudio/abcdef", first_page)
+
+        # Last page has an empty resumptionToken.
+        second_page = get_records_oai("ListRecords", resumption_token=token.text)
+        self.assertIsNone(self.get_resumption_token(second_page).text)
+        self.assertIn(b"<identifier>fakeaudio/abcdef", second_page)
+
+    def test_list_metadata_formats(self):
+        response = self.client.get("/oai/", {"verb": "ListMetadataFormats"})
+        root = etree.fromstring(response.content)
+        prefixes = root.xpath(
+            "//oai:metadataPrefix/text()",
+            namespaces={"oai": "http://www.openarchives.org/OAI/2.0/"},
+        )
+        self.assertEqual(prefixes, ["mods", "oai_dc"])
+
+    def test_getrecord_oai_dc(self):
+        self.save_interview_item_with_status("Completed")
+        response = self.client.get(
+            "/oai/",
+            {
+                "verb": "GetRecord",
+                "identifier": self.interview_item.ark,
+                "metadataPrefix": "oai_dc",
+            },
+        )
+        self.assertIn(b'<request metadataPrefix="oai_dc"', response.content)
+        root = etree.fromstring(response.content)
+        ns = {
+            "dc": "http://purl.org/dc/elements/1.1/",
+            "oai_dc": "http://www.openarchives.org/OAI/2.0/oai_dc/",
+        }
+        dc = root.find(".//oai_dc:dc", ns)
+        self.assertEqual(dc.findtext("dc:title", namespaces=ns), "Fake interview")
+        self.assertEqual(dc.findtext("dc:contributor", namespaces=ns), "Joe Bruin")
+        self.assertIn(
+            "fakeinterview/abcdef",
+            [el.text for el in dc.findall("dc:identifier", ns)],
+        )
+        self.assertEqual(
+            [el.text for el in dc.findall("dc:subject", ns)], ["Sample Subject"]
+        )
+        self.assertIn("Fake series", [el.text for el in dc.findall("dc:relation", ns)])
+
+    def test_oai_dc_reuses_cached_mods(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        # Cache the MODS records.
+        get_records_oai("ListRecords")
+        with CaptureQueriesContext(connection) as mods_queries:
+            get_records_oai("ListRecords")
+        with CaptureQueriesContext(connection) as dc_queries:
+            response = get_records_oai("ListRecords", metadata_prefix="oai_dc")
+        self.assertEqual(len(dc_queries), len(mods_queries))
+        self.assertIn(b"<oai_dc:dc", response)
+        self.assertNotIn(b"<mods:mods", response)
+        # The XSLT is compiled only once.
+        self.assertIs(get_oai_dc_transform(), get_oai_dc_transform())
+
+    @override_settings(OAI_PAGE_SIZE=1)
+    def test_resumption_token_keeps_metadata_prefix(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        first_page = get_records_oai("ListRecords", metadata_prefix="oai_dc")
+        token = self.get_resumption_token(first_page).text
+        self.assertEqual(decode_resumption_token(token)["metadataPrefix"], "oai_dc")
+        second_page = get_records_oai("ListRecords", resumption_token=token)
+        self.assertIn(b"<oai_dc:dc", second_page)
+
+    def test_unknown_metadata_prefix(self):
+        response = self.client.get(
+            "/oai/", {"verb": "ListRecords", "metadataPrefix": "marc21"}
+        )
+        self.assertIn(b'<error code="cannotDisseminateFormat"/>', response.content)
+
+    def test_bad_resumption_token_raises_error(self):
+        with self.assertRaises(ValueError):
+            get_records_oai("ListRecords", resumption_token="not-a-real-token")
+
+    def test_bad_resumption_token_request(self):
+        response = self.client.get(
+            "/oai/", {"verb": "ListRecords", "resumptionToken": "not-a-real-token"}
+        )
+        self.assertIn(b'<error code="badResumptionToken"/>', response.content)
+
+    def test_listrecords_view_is_streamed(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        response = self.client.get("/oai/", {"verb": "ListRecords"})
+        self.assertTrue(response.streaming)
+        # Streamed output must still be one well-formed document.
+        root = etree.fromstring(b"".join(response.streaming_content))
+        records = root.findall(".//record", namespaces=root.nsmap)
+        self.assertEqual(len(records), 2)
+
+    @override_settings(OAI_STREAM_RESPONSES=False)
+    def test_listrecords_view_is_not_streamed(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        response = self.client.get("/oai/", {"verb": "ListRecords"})
+        self.assertFalse(response.streaming)
+        root = etree.fromstring(response.content)
+        records = root.findall(".//record", namespaces=root.nsmap)
+        self.assertEqual(len(records), 2)
+
+    def set_last_modified_date(self, item: ProjectItem, date: str) -> None:
+        # update() bypasses the signals which set last_modified_date.
+        ProjectItem.objects.filter(pk=item.pk).update(
+            last_modified_date=datetime.fromisoformat(date)
+        )
+
+    def test_datestamp_is_last_modified_date(self):
+        self.save_interview_item_with_status("Completed")
+        self.set_last_modified_date(self.interview_item, "2024-03-05T17:30:00+00:00")
+        response = get_records_oai(verb="GetRecord", ark=self.interview_item.ark)
+        self.assertIn(b"<datestamp>2024-03-05T17:30:00Z</datestamp>", response)
+
+    @override_settings(TIME_ZONE="America/Los_Angeles")
+    def test_response_date_agrees_with_datestamps(self):
+        # Harvesters use responseDate as the from of their next request, so
+        # it must be UTC, like datestamps, whatever the server's time zone.
+        self.save_interview_item_with_status("Completed")
+        root = etree.fromstring(
+            get_records_oai(verb="GetRecord", ark=self.interview_item.ark)
+        )
+        response_date = root.find("responseDate", namespaces=root.nsmap).text
+        datestamp = root.find(".//header/datestamp", namespaces=root.nsmap).text
+        response_date = datetime.fromisoformat(response_date.replace("Z", "+00:00"))
+        datestamp = datetime.fromisoformat(datestamp.replace("Z", "+00:00"))
+        self.assertLessEqual(datestamp, response_date)
+        self.assertLess(response_date - datestamp, timedelta(minutes=1))
+
+    def test_import_keeps_last_modified_date(self):
+        self.save_interview_item_with_status("Completed")
+        self.set_last_modified_date(self.interview_item, "2024-01-01T00:00:00+00:00")
+        get_records_oai("ListRecords")
+        with TemporaryDirectory() as tmp_dir:
+            tsv_path = Path(tmp_dir) / "descriptions.tsv"
+            tsv_path.write_text(
+                "ARK\tTYPE\tVALUE\n"
+                f"{self.interview_item.ark}\tabstract\tImported abstract\n"
+            )
+            with redirect_stdout(StringIO()):
+                with self.captureOnCommitCallbacks(execute=True):
+                    call_command("import_descriptions", tsv_path)
+        self.interview_item.refresh_from_db()
+        self.assertEqual(self.interview_item.last_modified_date.year, 2024)
+        # The cached record is still rebuilt with the imported data.
+        self.assertFalse(ModsRecord.objects.filter(item=self.interview_item).exists())
+        response = get_records_oai(verb="GetRecord", ark=self.interview_item.ark)
+        self.assertIn(b"Imported abstract", response)
+
+    def test_item_changes_are_applied_once_per_transaction(self):
+        self.save_interview_item_with_status("Completed")
+        get_records_oai("ListRecords")
+        descriptions = Description.objects.filter(item=self.interview_item)
+        with self.captureOnCommitCallbacks() as callbacks:
+            for description in descriptions:
+                description.value = f"Revised {description.value}"
+                description.save()
+            self.interview_item.save()
+        self.assertGreater(len(descriptions), 1)
+        # Nothing is invalidated until the transaction commits.
+        self.assertTrue(ModsRecord.objects.filter(item=self.interview_item).exists())
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertFalse(ModsRecord.objects.filter(item=self.interview_item).exists())
+
+    def test_metadata_change_updates_last_modified_date(self):
+        self.set_last_modified_date(self.interview_item, "2024-01-01T00:00:00+00:00")
+        self.set_last_modified_date(self.audio_item, "2024-01-01T00:00:00+00:00")
+        toc = Description.objects.get(
+            item=self.audio_item, type__type="tableOfContents"
+        )
+        toc.value = "Revised Table of Contents"
+        with self.captureOnCommitCallbacks(execute=True):
+            toc.save()
+        # The parent interview's record includes the audio item's data.
+        for item in [self.interview_item, self.audio_item]:
+            item.refresh_from_db()
+            self.assertGreater(item.last_modified_date.year, 2024)
+
+    def test_listrecords_from_until(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        self.set_last_modified_date(self.interview_item, "2024-01-01T12:00:00+00:00")
+        self.set_last_modified_date(self.audio_item, "2024-02-01T12:00:00+00:00")
+
+        response = get_records_oai("ListRecords", from_date="2024-01-15")
+        self.assertNotIn(b"<identifier>fakeinterview/abcdef", response)
+        self.assertIn(b"<identifier>fakeaudio/abcdef", response)
+
+        # until includes the whole day given.
+        response = get_records_oai("ListRecords", until_date="2024-01-01")
+        self.assertIn(b"<identifier>fakeinterview/abcdef", response)
+        self.assertNotIn(b"<identifier>fakeaudio/abcdef", response)
+
+        response = get_records_oai(
+            "ListRecords",
+            from_date="2024-02-01T12:00:00Z",
+            until_date="2024-02-01T12:00:00Z",
+        )
+        self.assertNotIn(b"<identifier>fakeinterview/abcdef", response)
+        self.assertIn(b"<identifier>fakeaudio/abcdef", response)
+
+    @override_settings(OAI_PAGE_SIZE=1)
+    def test_resumption_token_keeps_from_until(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        self.set_last_modified_date(self.interview_item, "2024-01-01T12:00:00+00:00")
+        first_page = get_records_oai("ListRecords", from_date="2023-01-01")
+        token = self.get_resumption_token(first_page)
+        self.assertEqual(decode_resumption_token(token.text)["from"], "2023-01-01")
+
+    def test_listrecords_no_records_match(self):
+        self.save_interview_item_with_status("Completed")
+        self.set_last_modified_date(self.interview_item, "2024-01-01T12:00:00+00:00")
+        response = get_records_oai("ListRecords", from_date="2024-01-02")
+        self.assertIn(b'<error code="noRecordsMatch"/>', response)
+
+    def test_bad_from_until_request(self):
+        for params in [
+            {"from": "yesterday"},
+            {"from": "2024-02-01", "until": "2024-01-01"},
+            {"from": "2024-01-01", "until": "2024-02-01T00:00:00Z"},
+        ]:
+            response = self.client.get("/oai/", {"verb": "ListRecords", **params})
+            self.assertIn(b'<error code="badArgument"/>', response.content)
+
+    def test_listidentifiers_request(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        response = get_records_oai("ListIdentifiers")
+        root = etree.fromstring(response)
+        headers = root.findall(".//ListIdentifiers/header", namespaces=root.nsmap)
+        identifiers = [
+            header.find("identifier", namespaces=root.nsmap).text for header in headers
+        ]
+        self.assertEqual(identifiers, [self.interview_item.ark, self.audio_item.ark])
+        self.assertNotIn(b"<metadata>", response)
+        # Headers don't need MODS records, so none are built.
+        self.assertFalse(ModsRecord.objects.exists())
+
+    def get_headers(self, response: bytes) -> dict:
+        # Header status ("deleted" or None) by identifier.
+        root = etree.fromstring(response)
+        return {
+            header.findtext("identifier", namespaces=root.nsmap): header.get("status")
+            for header in root.iterfind(".//header", namespaces=root.nsmap)
+        }
+
+    def create_item_with_status(self, status: str) -> ProjectItem:
+        # An item with no related data, so it can be deleted.
+        return ProjectItem.objects.create(
+            ark="fakedeleted/abcdef",
+            created_by=self.user,
+            last_modified_by=self.user,
+            parent=self.interview_item,
+            status=ItemStatus.objects.get(status=status),
+            title="Fake deleted audio",
+            type=ItemType.objects.get(type="Audio"),
+        )
+
+    def test_item_changes_are_journaled(self):
+        item = self.create_item_with_status("In progress")
+        item.status = ItemStatus.objects.get(status="Completed")
+        item.save()
+        item.status = ItemStatus.objects.get(status="In progress")
+        item.save()
+        item.status = ItemStatus.objects.get(status="Completed")
+        item.save()
+        item_id = item.id
+        item.delete()
+        changes = ProjectItemChange.objects.filter(item_id=item_id).order_by("id")
+        self.assertEqual(
+            list(
+                changes.values_list(
+                    "change_type", "status", "was_published", "published", "set_ark"
+                )
+            ),
+            [
+                ("created", "In progress", False, False, "fakeseries/abcdef"),
+                ("updated", "Completed", False, True, "fakeseries/abcdef"),
+                ("updated", "In progress", True, False, "fakeseries/abcdef"),
+                ("updated", "Completed", False, True, "fakeseries/abcdef"),
+                ("deleted", "Completed", True, False, "fakeseries/abcdef"),
+            ],
+        )
+
+    def test_unpublished_item_is_reported_deleted(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        self.save_interview_item_with_status("In progress")
+        response = get_records_oai("ListIdentifiers")
+        self.assertEqual(
+            self.get_headers(response),
+            {self.interview_item.ark: "deleted", self.audio_item.ark: None},
+        )
+        response = get_records_oai("GetRecord", ark=self.interview_item.ark)
+        self.assertIn(b'<header status="deleted">', response)
+        self.assertNotIn(b"<metadata>", response)
+
+        # Published again, it is no longer deleted.
+        self.save_interview_item_with_status("Completed")
+        response = get_records_oai("ListIdentifiers")
+        self.assertEqual(self.get_headers(response)[self.interview_item.ark], None)
+
+    def test_deleted_item_is_reported_deleted(self):
+        self.save_interview_item_with_status("Completed")
+        item = self.create_item_with_status("Completed")
+        item.delete()
+        response = get_records_oai("ListRecords", set_spec="fakeseries-abcdef")
+        self.assertEqual(self.get_headers(response)[item.ark], "deleted")
+        # Deletions are dated when they happened.
+        response = get_records_oai("ListRecords", from_date="2000-01-01")
+        self.assertIn(item.ark, self.get_headers(response))
+        response = get_records_oai("ListRecords", until_date="2000-01-01")
+        self.assertIn(b'<error code="noRecordsMatch"/>', response)
+
+    def test_never_published_item_is_not_reported_deleted(self):
+        self.create_item_with_status("In progress").delete()
+        response = get_records_oai("ListIdentifiers")
+        self.assertIn(b'<error code="noRecordsMatch"/>', response)
+
+    @override_settings(OAI_PAGE_SIZE=1)
+    def test_deleted_records_are_paged_in_id_order(self):
+        self.save_interview_item_with_status("In progress")
+        self.save_audio_item_with_status("Completed")
+        self.save_interview_item_with_status("Completed")
+        self.save_interview_item_with_status("In progress")
+        first_page = get_records_oai("ListIdentifiers")
+        self.assertEqual(
+            self.get_headers(first_page), {self.interview_item.ark: "deleted"}
+        )
+        token = self.get_resumption_token(first_page).text
+        second_page = get_records_oai("ListIdentifiers", resumption_token=token)
+        self.assertEqual(self.get_headers(second_page), {self.audio_item.ark: None})
+        self.assertIsNone(self.get_resumption_token(second_page).text)
+
+    def test_identify(self):
+        self.save_interview_item_with_status("Completed")
+        response = self.client.get("/oai/", {"verb": "Identify"})
+        root = etree.fromstring(response.content)
+        identify = root.find("{http://www.openarchives.org/OAI/2.0/}Identify")
+        ns = root.nsmap
+        self.assertEqual(
+            identify.findtext("deletedRecord", namespaces=ns), "persistent"
+        )
+        self.interview_item.refresh_from_db()
+        self.assertEqual(
+            identify.findtext("earliestDatestamp", namespaces=ns),
+            self.interview_item.last_modified_date.astimezone(dt_timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+        )
+
+    @override_settings(OAI_PAGE_SIZE=1)
+    def test_listidentifiers_pages_with_resumption_token(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        first_page = get_records_oai("ListIdentifiers")
+        token = self.get_resumption_token(first_page)
+        self.assertIn(b"<identifier>fakeinterview/abcdef", first_page)
+        second_page = get_records_oai("ListIdentifiers", resumption_token=token.text)
+        self.assertIn(b"<identifier>fakeaudio/abcdef", second_page)
+        self.assertIsNone(self.get_resumption_token(second_page).text)
+
+    def test_listidentifiers_view_from_until(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        self.set_last_modified_date(self.interview_item, "2024-01-01T12:00:00+00:00")
+        response = self.client.get(
+            "/oai/", {"verb": "ListIdentifiers", "until": "2024-01-01"}
+        )
+        content = b"".join(response.streaming_content)
+        self.assertIn(b"<identifier>fakeinterview/abcdef", content)
+        self.assertNotIn(b"<identifier>fakeaudio/abcdef", content)
+
+    def test_listsets_request(self):
+        response = self.client.get("/oai/", {"verb": "ListSets"})
+        self.assertIn(
+            b"<set><setSpec>fakeseries-abcdef</setSpec>"
+            b"<setName>Fake series</setName></set>",
+            response.content,
+        )
+
+    def test_headers_include_set_spec(self):
+        # Both the interview and its audio child belong to the series' set.
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        response = get_records_oai("ListIdentifiers")
+        self.assertEqual(response.count(b"<setSpec>fakeseries-abcdef</setSpec>"), 2)
+
+    def test_listrecords_set(self):
+        self.save_interview_item_with_status("Completed")
+        self.save_audio_item_with_status("Completed")
+        other_series = ProjectItem.objects.create(
+            ark="otherseries/abcdef",
+            created_by=self.user,
+            last_modified_by=self.user,
+            title="Other series",
+            type=ItemType.objects.get(type="Series"),
+        )
+        ProjectItem.objects.create(
+            ark="otherinterview/abcdef",
+            created_by=self.user,
+            last_modified_by=self.user,
+            title="Other interview",
+            type=ItemType.objects.get(type="Interview"),
+            parent=other_series,
+            status=ItemStatus.objects.get(status="Completed"),
+        )
+        response = get_records_oai("ListRecords", set_spec="fakeseries-abcdef")
+        self.assertIn(b"<identifier>fakeinterview/abcdef", response)
+        self.assertIn(b"<identifier>fakeaudio/abcdef", response)
+        self.assertNotIn(b"<identifier>otherinterview/abcdef", response)
+
+        response = get_records_oai("ListIdentifiers", set_spec="otherseries-abcdef")
+        self.assertNotIn(b"<identifier>fakeinterview/abcdef", response)
+        self.assertIn(b"<identifier>otherinterview/abcdef", response)
+
+    def test_listrecords_unknown_set(self):
+        self.save_interview_item_with_status("Completed")
+        response = get_records_oai("ListRecords", set_spec="no-such-set")
+        self.assertIn(b'<error code="noRecordsMatch"/>', response)
+
+    def get_oai_record_response(
+        self, metadata_prefix: str = "mods", **headers
+    ) -> HttpResponse:
+        return self.client.get(
+            "/oai/",
+            {
+                "verb": "GetRecord",
+                "identifier": self.interview_item.ark,
+                "metadataPrefix": metadata_prefix,
+            },
+            headers=headers,
+        )
+
+    def test_getrecord_has_etag_and_last_modified(self):
+        self.save_interview_item_with_status("Completed")
+        response = self.get_oai_record_response()
+        self.assertRegex(response.headers["ETag"], r'^"[0-9a-f]{64}-mods"$')
+        self.interview_item.refresh_from_db()
+        self.assertEqual(
+            response.headers["Last-Modified"],
+            http_date(self.interview_item.last_modified_date.timestamp()),
+        )
+
+    def test_getrecord_if_none_match(self):
+        self.save_interview_item_with_status("Completed")
+        etag = self.get_oai_record_response().headers["ETag"]
+        # Apart from rate limiting, only the indexed item lookup is needed.
+        with override_settings(OAI_RATE_LIMIT_BURST=None), self.assertNumQueries(1):
+            response = self.get_oai_record_response(if_none_match=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.get_oai_record_response(if_none_match='"outdated"')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_getrecord_etag_depends_on_header(self):
+        self.save_interview_item_with_status("Completed")
+        etag = self.get_oai_record_response().headers["ETag"]
+        # The datestamp in the record's header changes, but its MODS doesn't.
+        self.set_last_modified_date(self.interview_item, "2024-01-01T12:00:00+00:00")
+        response = self.get_oai_record_response(if_none_match=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(b"<datestamp>2024-01-01T12:00:00Z</datestamp>", response.content)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_getrecord_etag_depends_on_metadata_prefix(self):
+        self.save_interview_item_with_status("Completed")
+        mods_etag = self.get_oai_record_response().headers["ETag"]
+        response = self.get_oai_record_response("oai_dc", if_none_match=mods_etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response.headers["ETag"], mods_etag)
+        response = self.get_oai_record_response(
+            "oai_dc", if_none_match=response.headers["ETag"]
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_getrecord_if_modified_since(self):
+        self.save_interview_item_with_status("Completed")
+        self.set_last_modified_date(self.interview_item, "2024-01-01T12:00:00+00:00")
+        response = self.get_oai_record_response(
+            if_modified_since="Mon, 01 Jan 2024 12:00:00 GMT"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.get_oai_record_response(
+            if_modified_since="Sun, 31 Dec 2023 12:00:00 GMT"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
     def test_completed_interviews_are_included(self):
         # Confirm the OAI feed includes Completed interview item.
         # This is the only item, so feed contains 1 record.
@@ -1550,6 +2430,54 @@ class ModsTestCase(TestCase):
         self.assertFalse(b"/oh_masters/" in ohmods.serializeDocument())
 
 
+class OaiThrottlingTestCase(TestCase):
+    def get_list_sets_response(self, **extra) -> HttpResponse:
+        return self.client.get("/oai/", {"verb": "ListSets"}, **extra)
+
+    @override_settings(OAI_RATE_LIMIT_BURST=2, OAI_RATE_LIMIT_PER_SECOND=1)
+    def test_rate_limit_per_client(self):
+        for _ in range(2):
+            self.assertEqual(self.get_list_sets_response().status_code, HTTPStatus.OK)
+        response = self.get_list_sets_response()
+        self.assertEqual(response.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        # Other clients are not affected.
+        response = self.get_list_sets_response(REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(OAI_RATE_LIMIT_BURST=1, OAI_CLIENT_IP_FROM_X_FORWARDED_FOR=True)
+    def test_rate_limit_uses_proxy_client_ip(self):
+        # Only the last X-Forwarded-For entry, added by the proxy, is used.
+        for spoofed_ip in ["10.0.0.3", "10.0.0.4"]:
+            response = self.get_list_sets_response(
+                HTTP_X_FORWARDED_FOR=f"{spoofed_ip}, 10.0.0.5"
+            )
+        self.assertEqual(response.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+
+    @override_settings(OAI_RATE_LIMIT_BURST=1)
+    def test_rate_limit_ignores_x_forwarded_for_by_default(self):
+        # Without a proxy, clients could otherwise choose their own bucket.
+        for spoofed_ip in ["10.0.0.3", "10.0.0.4"]:
+            response = self.get_list_sets_response(HTTP_X_FORWARDED_FOR=spoofed_ip)
+        self.assertEqual(response.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+
+    @override_settings(OAI_MAX_CONCURRENT_LIST_RECORDS=1)
+    def test_concurrent_list_records_limit(self):
+        first_response = self.client.get("/oai/", {"verb": "ListRecords"})
+        self.assertEqual(first_response.status_code, HTTPStatus.OK)
+        # The first response holds the only slot until it has been sent.
+        response = self.client.get("/oai/", {"verb": "ListRecords"})
+        self.assertEqual(response.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertEqual(response.headers["Retry-After"], "30")
+        # Other verbs are not limited.
+        response = self.client.get("/oai/", {"verb": "ListIdentifiers"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        b"".join(first_response.streaming_content)
+        response = self.client.get("/oai/", {"verb": "ListRecords"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
 class FileMetadataMigrationTestCase(SimpleTestCase):
     # Test logic not already covered by OralHistoryFile tests.
 
@@ -1966,3 +2894,524 @@ class ItemDeletionTestCase(TestCase):
         self.assertRedirects(response, expected_url=expected_url)
         # Check that the item still exists
         self.assertTrue(ProjectItem.objects.filter(id=item.id).exists())
+
+
+class ItemSearchTestCase(TestCase):
+    fixtures = [
+        "item-status-data.json",
+        "item-type-data.json",
+        "authority-source-data.json",
+        "description-type-data.json",
+        "alttitle-type-data.json",
+        "altid-type-data.json",
+        "name-type-data.json",
+        "subject-type-data.json",
+        "media-file-type-data.json",
+        "publisher-type-data.json",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        # Search data is updated once the changes are committed.
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.user = User.objects.create_user("tester")
+            series_item = ProjectItem.objects.create(
+                ark="fake/series",
+                created_by=cls.user,
+                last_modified_by=cls.user,
+                title="Fake series",
+                type=ItemType.objects.get(type="Series"),
+            )
+            cls.items = {}
+            for title in ["Beta interview", "alpha interview", "Gamma interview"]:
+                cls.items[title] = ProjectItem.objects.create(
+                    ark=f"fake/{title.split()[0].lower()}",
+                    created_by=cls.user,
+                    last_modified_by=cls.user,
+                    title=title,
+                    type=ItemType.objects.get(type="Interview"),
+                    parent=series_item,
+                )
+            cls.items["Beta interview"].status = ItemStatus.objects.get(
+                status="Completed"
+            )
+            cls.items["Beta interview"].save()
+            MediaFile.objects.create(
+                item=cls.items["alpha interview"],
+                file_type=MediaFileType.objects.get(file_code="audio_master"),
+                file="fake_audio_name.wav",
+                created_by=cls.user,
+            )
+            name = Name.objects.create(value="Smith, Jane", source_id=1)
+            subject = Subject.objects.create(value="Los Angeles (Calif.)", source_id=1)
+            # Jane Smith is named twice in the same item, which should only be
+            # returned once.
+            for name_type in ["interviewee", "subject"]:
+                ItemNameUsage.objects.create(
+                    item=cls.items["Beta interview"],
+                    value=name,
+                    type=NameType.objects.get(type=name_type),
+                )
+            for title in ["alpha interview", "Gamma interview"]:
+                ItemSubjectUsage.objects.create(
+                    item=cls.items[title],
+                    value=subject,
+                    type=SubjectType.objects.get(type="geographicPlace"),
+                )
+            AltTitle.objects.create(
+                item=cls.items["Gamma interview"],
+                value="Conversation with Jane Smith",
+                type=AltTitleType.objects.get(type="descriptive"),
+            )
+            Description.objects.create(
+                item=cls.items["alpha interview"],
+                value="Mentions the Smith family",
+                type=DescriptionType.objects.get(type="abstract"),
+            )
+
+    def search(self, *args, **kwargs) -> list[ProjectItem]:
+        return get_search_results(*args, **kwargs)["results"]
+
+    def get_titles(self, results: list[ProjectItem]) -> list[str]:
+        return [item.title for item in results]
+
+    def test_keyword_search_matches_related_records(self):
+        results = self.search("keyword", "Jane Smith", "all", "all", "all")
+        # Sorted by title, ignoring case.
+        self.assertEqual(
+            self.get_titles(results), ["Beta interview", "Gamma interview"]
+        )
+        results = self.search("keyword", "smith", "all", "all", "all")
+        self.assertEqual(
+            self.get_titles(results),
+            ["alpha interview", "Beta interview", "Gamma interview"],
+        )
+        results = self.search("keyword", "Los Angeles", "all", "all", "all")
+        self.assertEqual(
+            self.get_titles(results), ["alpha interview", "Gamma interview"]
+        )
+
+    @override_settings(SEARCH_RESULTS_CACHE_TIMEOUT=None)
+    def test_keyword_search_uses_one_query(self):
+        with self.assertNumQueries(1):
+            self.search("keyword", "interview", "all", "all", "all")
+
+    def test_search_filters(self):
+        results = self.search("title", "a", "Interview", "all", "all")
+        self.assertEqual(len(results), 3)
+        results = self.search("title", "a", "all", "all", "Completed")
+        self.assertEqual(self.get_titles(results), ["Beta interview"])
+        results = self.search("title", "a", "all", "MasterAudio1", "all")
+        self.assertEqual(self.get_titles(results), ["alpha interview"])
+        results = self.search("keyword", "Smith", "all", "MasterAudio1", "all")
+        self.assertEqual(self.get_titles(results), ["alpha interview"])
+
+    @override_settings(SEARCH_RESULTS_CACHE_TIMEOUT=None)
+    def test_search_results_page_query_count(self):
+        self.client.force_login(self.user)
+        # One query each for the session and the user, then one for the results,
+        # with their types and parents.
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                "/search_results/title/all/all/Interview/interview"
+            )
+        self.assertContains(response, "Your search returned 3 results.")
+        self.assertContains(response, "Fake series", count=3)
+
+    @skipIf(connection.vendor == "postgresql", "Full-text search is used instead")
+    def test_full_text_search_falls_back_to_keyword_search(self):
+        self.assertEqual(
+            self.search("fulltext", "Smith", "all", "all", "all"),
+            self.search("keyword", "Smith", "all", "all", "all"),
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "Full-text search needs PostgreSQL")
+    def test_full_text_search_ranks_results(self):
+        # Words are stemmed, so "interviews" finds "interview", which a
+        # substring search would not.
+        results = self.search("fulltext", "interviews", "all", "all", "all")
+        self.assertEqual(len(results), 3)
+        results = self.search(
+            "fulltext", "Jane Smith conversation", "all", "all", "all"
+        )
+        self.assertEqual(self.get_titles(results), ["Gamma interview"])
+        # Gamma matches in both its alternate title and its description, so is
+        # ranked above the items with one match.
+        Description.objects.create(
+            item=self.items["Gamma interview"],
+            value="Jane Smith talks about her family",
+            type=DescriptionType.objects.get(type="abstract"),
+        )
+        results = self.search("fulltext", "Smith", "all", "all", "all")
+        self.assertEqual(results[0].title, "Gamma interview")
+        self.assertCountEqual(
+            self.get_titles(results[1:]), ["alpha interview", "Beta interview"]
+        )
+
+    @skipIf(connection.vendor == "postgresql", "Fuzzy search is used instead")
+    def test_fuzzy_search_falls_back_to_keyword_search(self):
+        self.assertEqual(
+            self.search("fuzzy", "Smith", "all", "all", "all"),
+            self.search("keyword", "Smith", "all", "all", "all"),
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "Fuzzy search needs PostgreSQL")
+    def test_fuzzy_search_finds_misspelled_names(self):
+        results = self.search("fuzzy", "Smiht, Jane", "all", "all", "all")
+        self.assertEqual(results[0].title, "Beta interview")
+        results = self.search("fuzzy", "Gama intervew", "all", "all", "all")
+        self.assertEqual(results[0].title, "Gamma interview")
+
+    def test_search_results_pages(self):
+        for search_type, query in [
+            ("title", "interview"),
+            ("keyword", "interview"),
+            ("fulltext", "interview"),
+            ("fuzzy", "interview"),
+        ]:
+            with self.subTest(search_type=search_type):
+                all_titles = self.get_titles(
+                    self.search(search_type, query, "all", "all", "all")
+                )
+                titles = []
+                cursor = ""
+                while True:
+                    page = get_search_results(
+                        search_type, query, "all", "all", "all", 2, cursor
+                    )
+                    titles += self.get_titles(page["results"])
+                    if page["next_cursor"] is None:
+                        break
+                    cursor = page["next_cursor"]
+                self.assertEqual(titles, all_titles)
+
+    def test_search_results_total(self):
+        # Counted for title searches, even if there is more than one page.
+        first_page = get_search_results("title", "interview", "all", "all", "all", 2)
+        self.assertEqual(first_page["total"], 3)
+        # Not counted for keyword searches, unless there is only one page.
+        page = get_search_results("keyword", "interview", "all", "all", "all", 2)
+        self.assertIsNone(page["total"])
+        page = get_search_results("keyword", "interview", "all", "all", "all", 3)
+        self.assertEqual(page["total"], 3)
+        # Never counted after the first page.
+        page = get_search_results(
+            "title", "interview", "all", "all", "all", 2, first_page["next_cursor"]
+        )
+        self.assertIsNone(page["total"])
+
+    def test_search_results_page_links(self):
+        self.client.force_login(self.user)
+        url = "/search_results/keyword/all/all/all/interview"
+        response = self.client.get(url, {"page_size": 2})
+        self.assertContains(response, "more than 2 results")
+        self.assertEqual(
+            self.get_titles(response.context["results"]),
+            ["alpha interview", "Beta interview"],
+        )
+        response = self.client.get(response.context["next_page_url"])
+        self.assertEqual(
+            self.get_titles(response.context["results"]), ["Gamma interview"]
+        )
+        self.assertIsNone(response.context["next_page_url"])
+        self.assertContains(response, "First page")
+
+        response = self.client.get(url, {"after": "not a cursor"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_search_results_page_links_keep_query(self):
+        for number in [1, 2]:
+            ProjectItem.objects.create(
+                ark=f"fake/punctuation{number}",
+                created_by=self.user,
+                last_modified_by=self.user,
+                title=f"100% interview? #{number}",
+                type=ItemType.objects.get(type="Interview"),
+            )
+        self.client.force_login(self.user)
+        # "%", "?" and "#" in the query must stay encoded in the page links.
+        url = reverse(
+            "search_results", args=["title", "all", "all", "all", "100% interview? #"]
+        )
+        response = self.client.get(url, {"page_size": 1})
+        self.assertEqual(
+            self.get_titles(response.context["results"]), ["100% interview? #1"]
+        )
+        next_page_url = response.context["next_page_url"]
+        self.assertTrue(next_page_url.startswith(f"{url}?"))
+        response = self.client.get(next_page_url)
+        self.assertEqual(
+            self.get_titles(response.context["results"]), ["100% interview? #2"]
+        )
+        self.assertTrue(response.context["first_page_url"].startswith(f"{url}?"))
+
+    def test_search_cursor_with_wrong_types(self):
+        self.client.force_login(self.user)
+        # Well-formed cursors, with the right number of values of the wrong types.
+        for search_type, values in [
+            ("title", ["a", [1]]),
+            ("title", [1, 2]),
+            ("title", ["a", True]),
+            ("keyword", [None, 1]),
+        ]:
+            with self.subTest(search_type=search_type, values=values):
+                response = self.client.get(
+                    f"/search_results/{search_type}/all/all/all/interview",
+                    {"after": encode_search_cursor(values)},
+                )
+                self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_keyword_search_matches_all_metadata(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemPublisherUsage.objects.create(
+                item=self.items["Gamma interview"],
+                value=Publisher.objects.create(value="UCLA Library", source_id=1),
+                type=PublisherType.objects.first(),
+            )
+        results = self.search("keyword", "ucla   LIBRARY", "all", "all", "all")
+        self.assertEqual(self.get_titles(results), ["Gamma interview"])
+
+    def test_search_documents_follow_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            name = Name.objects.get(value="Smith, Jane")
+            name.value = "Doe, Jane"
+            name.save()
+            Description.objects.filter(item=self.items["alpha interview"]).delete()
+        results = self.search("keyword", "Smith", "all", "all", "all")
+        self.assertEqual(self.get_titles(results), ["Gamma interview"])
+        results = self.search("keyword", "doe, jane", "all", "all", "all")
+        self.assertEqual(self.get_titles(results), ["Beta interview"])
+
+    def test_rebuild_search_documents(self):
+        documents = {
+            document.item_id: document.document
+            for document in ProjectItemSearchDocument.objects.all()
+        }
+        ProjectItemSearchDocument.objects.filter(
+            item=self.items["Beta interview"]
+        ).delete()
+        self.assertEqual(self.search("keyword", "Smith, Jane", "all", "all", "all"), [])
+        out = StringIO()
+        call_command("rebuild_search_documents", "--missing", stdout=out)
+        self.assertIn("Rebuilt 1 search documents", out.getvalue())
+        call_command("rebuild_search_documents", stdout=out)
+        self.assertEqual(
+            {
+                document.item_id: document.document
+                for document in ProjectItemSearchDocument.objects.all()
+            },
+            documents,
+        )
+        self.assertEqual(
+            self.get_titles(self.search("keyword", "Smith, Jane", "all", "all", "all")),
+            ["Beta interview"],
+        )
+
+    def reset_search_index(self) -> None:
+        search_utils._search_index = None
+
+    @override_settings(SEARCH_BACKEND="memory", SEARCH_RESULTS_CACHE_TIMEOUT=None)
+    def test_search_index_matches_database_search(self):
+        self.reset_search_index()
+        self.addCleanup(self.reset_search_index)
+        for query in ["Smith", "jane smith", "Los Angeles", "interview"]:
+            with self.subTest(query=query):
+                with self.settings(SEARCH_BACKEND="database"):
+                    expected = self.search("keyword", query, "all", "all", "all")
+                self.assertEqual(
+                    self.search("keyword", query, "all", "all", "all"), expected
+                )
+        # Terms match the start of words, and OR separates alternatives.
+        results = self.search("keyword", "interv alph", "all", "all", "all")
+        self.assertEqual(self.get_titles(results), ["alpha interview"])
+        results = self.search("keyword", "alpha OR gam", "all", "all", "all")
+        self.assertEqual(
+            self.get_titles(results), ["alpha interview", "Gamma interview"]
+        )
+        results = self.search("keyword", "interview", "all", "MasterAudio1", "all")
+        self.assertEqual(self.get_titles(results), ["alpha interview"])
+        results = self.search("keyword", "interview", "all", "all", "Completed")
+        self.assertEqual(self.get_titles(results), ["Beta interview"])
+        # Only the page of results is read from the database.
+        with self.assertNumQueries(1):
+            page = get_search_results("keyword", "interview", "all", "all", "all", 2)
+        self.assertEqual(page["total"], 3)
+        page = get_search_results(
+            "keyword", "interview", "all", "all", "all", 2, page["next_cursor"]
+        )
+        self.assertEqual(self.get_titles(page["results"]), ["Gamma interview"])
+        self.assertIsNone(page["next_cursor"])
+
+    @override_settings(SEARCH_BACKEND="memory")
+    def get_item_changes_query_count(self, titles: list[str]) -> int:
+        # Save an abstract for each item in one transaction, returning the
+        # number of queries needed once it commits.
+        abstract = DescriptionType.objects.get(type="abstract")
+        with self.captureOnCommitCallbacks() as callbacks:
+            for title in titles:
+                with self.assertNumQueries(1):
+                    Description.objects.create(
+                        item=self.items[title],
+                        value=f"Abstract of {title}",
+                        type=abstract,
+                    )
+        self.assertEqual(len(callbacks), 1)
+        with CaptureQueriesContext(connection) as queries:
+            callbacks[0]()
+        return len(queries)
+
+    def test_item_changes_are_applied_together(self):
+        self.assertEqual(
+            self.get_item_changes_query_count(["Beta interview"]),
+            self.get_item_changes_query_count(
+                ["alpha interview", "Beta interview", "Gamma interview"]
+            ),
+        )
+        results = self.search("keyword", "abstract of gamma", "all", "all", "all")
+        self.assertEqual(self.get_titles(results), ["Gamma interview"])
+
+    def test_search_index_follows_changes(self):
+        self.reset_search_index()
+        self.addCleanup(self.reset_search_index)
+        search_index = get_search_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            name = Name.objects.get(value="Smith, Jane")
+            name.value = "Doe, Jane"
+            name.save()
+            MediaFile.objects.create(
+                item=self.items["Gamma interview"],
+                file_type=MediaFileType.objects.get(file_code="audio_master"),
+                file="fake_audio_name_2.wav",
+                created_by=self.user,
+            )
+            item = ProjectItem.objects.create(
+                ark="fake/delta",
+                created_by=self.user,
+                last_modified_by=self.user,
+                title="Delta interview",
+                type=ItemType.objects.get(type="Interview"),
+            )
+        self.assertEqual(search_index.match("doe"), {self.items["Beta interview"].id})
+        self.assertEqual(
+            search_index.match("smith"),
+            {self.items["alpha interview"].id, self.items["Gamma interview"].id},
+        )
+        results = self.search("keyword", "interview", "all", "MasterAudio1", "all")
+        self.assertEqual(
+            self.get_titles(results), ["alpha interview", "Gamma interview"]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(search_index.match("delta"), set())
+        self.assertNotIn("delta", search_index.vocabulary)
+
+    def test_search_index_sync_follows_authority_changes(self):
+        # Another worker's index, which signal handlers here don't update.
+        search_index = SearchIndex.build()
+        item = self.items["Gamma interview"]
+        publisher = Publisher.objects.create(value="UCLA Library", source_id=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemPublisherUsage.objects.create(
+                item=item, value=publisher, type=PublisherType.objects.first()
+            )
+        search_index.sync()
+        self.assertEqual(search_index.match("ucla"), {item.id})
+        # Publishers are not in MODS records, but renaming one must still
+        # journal the items using it, for sync() to see.
+        publisher.value = "Powell Library"
+        with self.captureOnCommitCallbacks(execute=True):
+            publisher.save()
+        search_index.sync()
+        self.assertEqual(search_index.match("ucla"), set())
+        self.assertEqual(search_index.match("powell"), {item.id})
+
+    def test_search_index_snapshot(self):
+        self.reset_search_index()
+        self.addCleanup(self.reset_search_index)
+        snapshot = Path(settings.MEDIA_ROOT) / "search-index-test.pickle"
+        snapshot.parent.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(snapshot.unlink, missing_ok=True)
+        out = StringIO()
+        call_command("build_search_index", "--output", snapshot, stdout=out)
+        self.assertIn("4 items", out.getvalue())
+        # Changes made while no index is loaded are picked up from the database.
+        item = self.items["Gamma interview"]
+        item.title = "Epsilon interview"
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        with self.settings(SEARCH_BACKEND="memory", SEARCH_INDEX_SNAPSHOT=snapshot):
+            search_index = get_search_index()
+            self.assertEqual(search_index.match("epsilon"), {item.id})
+            self.assertEqual(search_index.items[item.id][0], "epsilon interview")
+            self.assertEqual(
+                search_index.postings,
+                SearchIndex.build().postings,
+            )
+
+    def test_search_results_cache(self):
+        page = get_search_results("keyword", "Smith", "all", "all", "all")
+        # The same search, typed differently, is answered from the cache:
+        # one query to read the catalog generation, one to read the cached page,
+        # and one for its items.
+        with self.assertNumQueries(3):
+            cached_page = get_search_results("keyword", " smith", "all", "all", "all")
+        self.assertEqual(cached_page, page)
+        # Any change to an item's metadata makes cached results obsolete.
+        with self.captureOnCommitCallbacks(execute=True):
+            Description.objects.filter(item=self.items["alpha interview"]).delete()
+        results = self.search("keyword", "Smith", "all", "all", "all")
+        self.assertEqual(
+            self.get_titles(results), ["Beta interview", "Gamma interview"]
+        )
+
+    def test_search_suggestions(self):
+        self.addCleanup(cache.clear)
+        # Values starting with the query come first, then those containing it.
+        suggestions = get_search_suggestions("smi")
+        self.assertEqual(suggestions, [{"type": "name", "value": "Smith, Jane"}])
+        suggestions = get_search_suggestions("INTERVIEW")
+        self.assertEqual(
+            [suggestion["value"] for suggestion in suggestions],
+            ["alpha interview", "Beta interview", "Gamma interview"],
+        )
+        self.assertEqual(suggestions[0]["item_id"], self.items["alpha interview"].id)
+        suggestions = get_search_suggestions("fake/", limit=2)
+        self.assertEqual(
+            suggestions,
+            [
+                {
+                    "type": "ark",
+                    "value": "fake/alpha",
+                    "item_id": self.items["alpha interview"].id,
+                },
+                {
+                    "type": "ark",
+                    "value": "fake/beta",
+                    "item_id": self.items["Beta interview"].id,
+                },
+            ],
+        )
+        # Short queries get no suggestions, without querying the database.
+        with self.assertNumQueries(0):
+            self.assertEqual(get_search_suggestions(" lo "), [])
+
+    def test_search_suggestions_view(self):
+        self.addCleanup(cache.clear)
+        url = "/search_suggestions/?q=los"
+        response = self.client.get(url)
+        # Login is required, so request is redirected
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertTrue(response.url.startswith("/accounts/login/"))
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(
+            response.json(),
+            {"suggestions": [{"type": "subject", "value": "Los Angeles (Calif.)"}]},
+        )
+        # Repeated queries are answered from the cache: only the session and
+        # user are read from the database.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()["suggestions"]), 1)
+        response = self.client.get("/search_suggestions/?q=interview&limit=x")
+        self.assertEqual(len(response.json()["suggestions"]), 3)
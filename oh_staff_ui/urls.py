@@ -14,6 +14,7 @@ urlpatterns = [
         views.search_results,
         name="search_results",
     ),
+    path("search_suggestions/", views.search_suggestions, name="search_suggestions"),
     path("logs/", views.show_log, name="show_log"),
     path("logs/<int:line_count>", views.show_log, name="show_log"),
     path("upload_file/<int:item_id>", views.upload_file, name="upload_file"),
@@ -24,7 +25,9 @@ urlpatterns = [
     re_path(r"^media/(?P<path>.*)$", views.serve_media_file, name="serve_media_file"),
     # To follow OAI practice, a query parameter combination is requred of either:
     # verb=GetRecord and identifier={ark_value}
-    # verb=ListRecords
+    # verb=ListRecords, optionally with resumptionToken={token from previous page}
     path("oai/", views.oai, name="oai"),
+    # Size, checksum and URL of the latest full-collection dumps; see create_oai_dump
+    path("oai/dump/", views.oai_dump, name="oai_dump"),
     path("release_notes/", views.release_notes, name="release_notes"),
 ]
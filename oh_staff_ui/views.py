@@ -6,10 +6,18 @@ from django.contrib import messages
 from django.core.exceptions import PermissionDenied
 from django.core.management.base import CommandError
 from django.shortcuts import redirect, render
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import never_cache
+from django.views.decorators.cache import cache_control, never_cache
 from django.http.request import HttpRequest  # for code completion
 from django.http.response import HttpResponse  # for code completion
+from django.http.response import (
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, urlencode
 from django.views.static import serve
 from oh_staff_ui.forms import (
     FileUploadForm,
@@ -23,13 +31,32 @@ from oh_staff_ui.views_utils import (
     get_ark,
     get_edit_item_context,
     get_all_series_and_interviews,
+    get_search_page_size,
     get_search_results,
+    get_search_suggestions,
     get_sequence_formset,
+    get_suggestion_limit,
     run_process_file_command,
     save_all_item_data,
     save_sequence_data,
+    OAI_METADATA_FORMATS,
+    ClosingIterator,
+    acquire_oai_list_slot,
+    get_client_ip,
+    get_identify_oai,
+    get_metadata_formats_oai,
+    get_oai_dumps,
+    get_oai_rate_limit_delay,
+    get_oai_unavailable_response,
+    get_oai_record_validators,
     get_records_oai,
+    get_sets_oai,
+    is_valid_datestamp_range,
+    iter_records_oai,
+    release_oai_list_slot,
     get_bad_arg_error_xml,
+    get_bad_resumption_token_error_xml,
+    get_cannot_disseminate_format_error_xml,
     get_bad_verb_error_xml,
     user_in_oh_staff_group,
 )
@@ -140,16 +167,66 @@ def search_results(
     media_file_type_filter: str = "",
     status_filter: str = "",
 ) -> HttpResponse:
-    results = get_search_results(
-        search_type, query, item_type_filter, media_file_type_filter, status_filter
+    # Page size and cursor are query parameters, so the path stays the search.
+    page_size = get_search_page_size(request.GET.get("page_size"))
+    cursor = request.GET.get("after", "")
+    try:
+        page = get_search_results(
+            search_type,
+            query,
+            item_type_filter,
+            media_file_type_filter,
+            status_filter,
+            page_size=page_size,
+            cursor=cursor,
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Invalid search results page")
+
+    # Not request.path, which is decoded, so could have "?", "#" or "%" from
+    # the query in it; reverse() encodes them again.
+    search_url = reverse(
+        "search_results",
+        kwargs={
+            "search_type": search_type,
+            "status_filter": status_filter,
+            "media_file_type_filter": media_file_type_filter,
+            "item_type_filter": item_type_filter,
+            "query": query,
+        },
     )
+    next_page_url = None
+    if page["next_cursor"]:
+        next_page_url = (
+            f"{search_url}?"
+            f"{urlencode({'page_size': page_size, 'after': page['next_cursor']})}"
+        )
+    first_page_url = None
+    if cursor:
+        first_page_url = f"{search_url}?{urlencode({'page_size': page_size})}"
     return render(
         request,
         "oh_staff_ui/search_results.html",
-        {"results": results},
+        {
+            "results": page["results"],
+            "total": page["total"],
+            "next_page_url": next_page_url,
+            "first_page_url": first_page_url,
+        },
     )
 
 
+@login_required
+@cache_control(private=True, max_age=60)
+def search_suggestions(request: HttpRequest) -> JsonResponse:
+    # Typeahead for the search form: titles, ARKs, names and subjects
+    # matching q, as JSON.
+    suggestions = get_search_suggestions(
+        request.GET.get("q", ""), get_suggestion_limit(request.GET.get("limit"))
+    )
+    return JsonResponse({"suggestions": suggestions})
+
+
 @login_required
 def show_log(request, line_count: int = 200) -> HttpResponse:
     log_file = "logs/application.log"
@@ -297,24 +374,127 @@ def browse(request: HttpRequest) -> HttpResponse:
 
 
 def oai(request: HttpRequest) -> HttpResponse:
+    # Harvesters can make many expensive requests; limit each client, so staff
+    # still get a worker.
+    client_ip = get_client_ip(request)
+    retry_after = get_oai_rate_limit_delay(client_ip)
+    if retry_after:
+        logger.warning(f"OAI rate limit reached for {client_ip}")
+        return get_oai_unavailable_response(retry_after)
+
     # Verb is required, ark is optional
     verb = request.GET["verb"]
     ark = request.GET.get("identifier")
     req_url = request.build_absolute_uri("?")
-
-    if verb not in ("GetRecord", "ListRecords"):
+    # Optional selective harvesting by datestamp
+    from_date = request.GET.get("from")
+    until_date = request.GET.get("until")
+    # Required by OAI, but MODS was once the only format, so harvesters may omit it.
+    metadata_prefix = request.GET.get("metadataPrefix", "mods")
+
+    # ETag and Last-Modified of the record, for GetRecord.
+    validators = None
+
+    if verb not in (
+        "GetRecord",
+        "ListRecords",
+        "ListIdentifiers",
+        "ListSets",
+        "ListMetadataFormats",
+        "Identify",
+    ):
         xml_content = get_bad_verb_error_xml(verb, req_url)
 
-    if verb == "GetRecord":
+    if (
+        verb in ("GetRecord", "ListRecords", "ListIdentifiers")
+        and metadata_prefix not in OAI_METADATA_FORMATS
+    ):
+        xml_content = get_cannot_disseminate_format_error_xml(verb, req_url)
+
+    elif verb == "GetRecord":
         if ark:
-            xml_content = get_records_oai(verb, ark, req_url)
+            # Harvesters re-poll the same records often; answer with 304 Not Modified
+            # when possible, before doing any work to build the record.
+            validators = get_oai_record_validators(ark, metadata_prefix)
+            etag, last_modified = validators
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if not_modified:
+                return not_modified
+            xml_content = get_records_oai(
+                verb, ark, req_url, metadata_prefix=metadata_prefix
+            )
         else:
             xml_content = get_bad_arg_error_xml(verb, req_url)
 
-    elif verb == "ListRecords":
-        xml_content = get_records_oai("ListRecords", req_url=req_url)
-
-    return HttpResponse(xml_content, content_type="text/xml")
+    elif verb == "ListSets":
+        xml_content = get_sets_oai(req_url)
+
+    elif verb == "Identify":
+        xml_content = get_identify_oai(req_url)
+
+    elif verb == "ListMetadataFormats":
+        xml_content = get_metadata_formats_oai(req_url)
+
+    elif verb in ("ListRecords", "ListIdentifiers") and not is_valid_datestamp_range(
+        from_date, until_date
+    ):
+        xml_content = get_bad_arg_error_xml(verb, req_url)
+
+    elif verb in ("ListRecords", "ListIdentifiers"):
+        # Only a few ListRecords responses, the most expensive, are built at once.
+        slot = acquire_oai_list_slot() if verb == "ListRecords" else ""
+        if slot is None:
+            logger.warning(f"OAI ListRecords limit reached; refused {client_ip}")
+            return get_oai_unavailable_response(settings.OAI_LIST_RECORDS_RETRY_AFTER)
+        resumption_token = request.GET.get("resumptionToken")
+        try:
+            xml_chunks = iter_records_oai(
+                verb,
+                req_url=req_url,
+                resumption_token=resumption_token,
+                from_date=from_date,
+                until_date=until_date,
+                set_spec=request.GET.get("set"),
+                metadata_prefix=metadata_prefix,
+            )
+        except ValueError:
+            release_oai_list_slot(slot)
+            xml_content = get_bad_resumption_token_error_xml(verb, req_url)
+        else:
+            if settings.OAI_STREAM_RESPONSES:
+                # Each record is sent as soon as it is built, so memory use
+                # stays flat and harvesters get the first bytes right away.
+                # The slot is released once the response has been sent.
+                return StreamingHttpResponse(
+                    ClosingIterator(xml_chunks, lambda: release_oai_list_slot(slot)),
+                    content_type="text/xml",
+                )
+            try:
+                xml_content = b"".join(xml_chunks)
+            finally:
+                release_oai_list_slot(slot)
+
+    response = HttpResponse(xml_content, content_type="text/xml")
+    if validators:
+        etag, last_modified = validators
+        if not etag and last_modified:
+            # Only looked up again when this request built the MODS record,
+            # which makes its ETag available.
+            etag, last_modified = get_oai_record_validators(ark, metadata_prefix)
+        if etag:
+            response.headers["ETag"] = etag
+        if last_modified:
+            response.headers["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def oai_dump(request: HttpRequest) -> JsonResponse:
+    # Bulk consumers download the latest full-collection dumps from OH_STATIC,
+    # checking them against the size and checksum given here.
+    dumps = get_oai_dumps()
+    return JsonResponse({"dumps": dumps}, status=200 if dumps else 404)
 
 
 def release_notes(request: HttpRequest) -> HttpResponse:
@@ -1,18 +1,52 @@
+import binascii
+import hashlib
+import json
 import logging
-
-from django.db import connection
-from datetime import datetime
+import math
+import os
+import time
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Callable, Iterable, Iterator
+from functools import cache
+from heapq import merge
+from itertools import chain
+from django.db import connection, transaction
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO
 from lxml import etree
 import requests
 import uuid
 from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
 from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
 from django.contrib import messages
+from django.core.cache import caches
 from django.core.management import call_command
-from django.db.models import CharField, Model, Q
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    Min,
+    Model,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest, Lower, Replace, Upper
 from django.contrib.auth.models import User
 from django.forms import BaseFormSet, Form, formset_factory
 from django.http.request import HttpRequest  # for code completion
+from django.http.response import HttpResponse
 from django.utils import timezone
 from oh_staff_ui.forms import (
     AltIdForm,
@@ -31,6 +65,7 @@ from oh_staff_ui.forms import (
     SubjectUsageForm,
 )
 from oh_staff_ui.models import (
+    OAI_PUBLISHED_STATUSES,
     AltId,
     AltTitle,
     Date,
@@ -39,6 +74,8 @@ from oh_staff_ui.models import (
     MediaFile,
     Name,
     ProjectItem,
+    ProjectItemChange,
+    ProjectItemSearchDocument,
     Subject,
     ItemCopyrightUsage,
     ItemLanguageUsage,
@@ -47,10 +84,36 @@ from oh_staff_ui.models import (
     ItemResourceUsage,
     ItemSubjectUsage,
 )
-from oh_staff_ui.classes.OralHistoryMods import OralHistoryMods
+from oh_staff_ui.mods_utils import (
+    MODS_DUMP_FILE_NAME,
+    OAI_DUMP_FILE_NAME,
+    get_checksum_file_path,
+    get_dump_file_dir,
+    iter_mods_xml,
+)
+from oh_staff_ui.search_utils import (
+    get_catalog_generation,
+    get_search_document_query,
+    get_search_index,
+    normalize_search_text,
+)
 
 logger = logging.getLogger(__name__)
 
+# Default and maximum number of items on a page of search results.
+SEARCH_PAGE_SIZE = 100
+MAX_SEARCH_PAGE_SIZE = 1000
+
+# Default and maximum number of typeahead suggestions, and the shortest query
+# they are given for.
+SUGGESTION_LIMIT = 10
+MAX_SUGGESTION_LIMIT = 50
+SUGGESTION_MIN_LENGTH = 3
+
+# Text search configuration for full-text search, which stems English words
+# and ignores English stop words.
+FULL_TEXT_SEARCH_CONFIG = "english"
+
 
 def construct_keyword_query(field: str, query: str) -> Q:
     # Always include the full query, as a single substring.
@@ -68,53 +131,112 @@ def construct_keyword_query(field: str, query: str) -> Q:
     return full_q
 
 
-def get_keyword_results(query: str) -> list:
-    # look for matches in any CharField attached to any of these models
-    search_models = [ProjectItem, AltId, AltTitle, Description, Name, Subject]
-    search_results = []
-    for model in search_models:
-        model_q = Q()
-        fields = [x for x in model._meta.fields if isinstance(x, CharField)]
-        for field in fields:
-            field_q = construct_keyword_query(field.name, query)
-            model_q = model_q | field_q
-        model_results = model.objects.filter(model_q)
-        search_results.append(model_results)
-    return search_results
-
-
-def get_result_items(queryset_list: list) -> list[ProjectItem]:
-    # convert list of querysets to list of ProjectItems for display
-    output_projectitems = []
-    # by order of search_models in get_keyword_results(),
-    # queryset_list[0] contains ProjectItems
-    # these are directly copied to output list
-    for item in queryset_list[0]:
-        output_projectitems.append(item)
-    # queryset_list[1] has AltIds
-    for altid in queryset_list[1]:
-        output_projectitems.append(altid.item)
-    # queryset_list[2] has AltTitles
-    for alttitle in queryset_list[2]:
-        output_projectitems.append(alttitle.item)
-    # queryset_list[3] has Descriptions
-    for description in queryset_list[3]:
-        output_projectitems.append(description.item)
-    # queryset_list[4] has Names
-    for name in queryset_list[4]:
-        name_usages = ItemNameUsage.objects.filter(value=name)
-        for item in name_usages:
-            output_projectitems.append(item.item)
-    # queryset_list[5] has Subjects
-    for subject in queryset_list[5]:
-        subject_usages = ItemSubjectUsage.objects.filter(value=subject)
-        for item in subject_usages:
-            output_projectitems.append(item.item)
-    # remove duplicate items
-    output_projectitems_deduped = list(set(output_projectitems))
-    # sort output list by title
-    output_projectitems_deduped.sort(key=lambda x: x.title.lower())
-    return output_projectitems_deduped
+def get_keyword_results(query: str) -> QuerySet:
+    # Items with a match anywhere in the item's search document: its own text
+    # fields, and those of its alternate ids and titles, dates, descriptions,
+    # formats, names, subjects, publishers, copyrights and resources.
+    # Only the search document table is searched, in a single query.
+    matches = ProjectItemSearchDocument.objects.filter(get_search_document_query(query))
+    return (
+        ProjectItem.objects.filter(pk__in=matches.values("item_id"))
+        .annotate(sort_title=Lower("title"))
+        .order_by("sort_title", "id")
+    )
+
+
+def get_full_text_vector(field: str) -> SearchVector:
+    # This must match the GIN index expressions in migration 0016 exactly,
+    # or PostgreSQL will not use the indexes.
+    return SearchVector(field, config=FULL_TEXT_SEARCH_CONFIG)
+
+
+def get_full_text_results(query: str) -> QuerySet:
+    # Items whose title, alternate titles, descriptions, names or subjects
+    # match the query as words (stemmed, with stop words ignored), ranked by
+    # relevance.  Full-text search needs PostgreSQL; on other databases, this
+    # falls back to keyword search.
+    if connection.vendor != "postgresql":
+        return get_keyword_results(query)
+
+    search_query = SearchQuery(
+        query, config=FULL_TEXT_SEARCH_CONFIG, search_type="websearch"
+    )
+    related_querysets = [
+        (AltTitle.objects, "value"),
+        (Description.objects, "value"),
+        (ItemNameUsage.objects, "value__value"),
+        (ItemSubjectUsage.objects, "value__value"),
+    ]
+    full_text_q = Q(search=search_query)
+    rank = SearchRank(get_full_text_vector("title"), search_query)
+    for related_queryset, field in related_querysets:
+        matches = related_queryset.alias(search=get_full_text_vector(field)).filter(
+            search=search_query
+        )
+        # Uncorrelated, so PostgreSQL can find the matches with the GIN index.
+        full_text_q = full_text_q | Q(pk__in=matches.values("item_id"))
+        # An item's rank adds the rank of its best match in each related model;
+        # this is only computed for the items found.
+        best_match_rank = (
+            matches.filter(item=OuterRef("pk"))
+            .annotate(rank=SearchRank(get_full_text_vector(field), search_query))
+            .order_by("-rank")
+            .values("rank")[:1]
+        )
+        rank = rank + Coalesce(Subquery(best_match_rank), Value(0.0))
+    return (
+        ProjectItem.objects.alias(search=get_full_text_vector("title"))
+        .filter(full_text_q)
+        .annotate(rank=rank, sort_title=Lower("title"))
+        .order_by("-rank", "sort_title", "id")
+    )
+
+
+def get_trigram_expression(field: str) -> Upper:
+    # This must match the GIN trigram index expressions in migration 0017, or
+    # PostgreSQL will not use the indexes.  Trigrams ignore case, so upper-casing
+    # changes no similarity; it lets icontains lookups use the same indexes.
+    return Upper(field)
+
+
+def get_fuzzy_results(query: str) -> QuerySet:
+    # Items whose title, alternate titles, names or subjects are similar to the
+    # query, even if misspelled, ranked by their most similar value.  Fuzzy
+    # search needs PostgreSQL; on other databases, this falls back to keyword
+    # search.
+    if connection.vendor != "postgresql":
+        return get_keyword_results(query)
+
+    related_querysets = [
+        (AltTitle.objects, "value"),
+        (ItemNameUsage.objects, "value__value"),
+        (ItemSubjectUsage.objects, "value__value"),
+    ]
+    fuzzy_q = Q(trigram__trigram_similar=query)
+    similarity = TrigramSimilarity(get_trigram_expression("title"), query)
+    for related_queryset, field in related_querysets:
+        matches = related_queryset.alias(trigram=get_trigram_expression(field)).filter(
+            trigram__trigram_similar=query
+        )
+        # Uncorrelated, so PostgreSQL can find the matches with the GIN index.
+        fuzzy_q = fuzzy_q | Q(pk__in=matches.values("item_id"))
+        best_match_similarity = (
+            matches.filter(item=OuterRef("pk"))
+            .annotate(
+                similarity=TrigramSimilarity(get_trigram_expression(field), query)
+            )
+            .order_by("-similarity")
+            .values("similarity")[:1]
+        )
+        similarity = Greatest(
+            similarity, Coalesce(Subquery(best_match_similarity), Value(0.0))
+        )
+    return (
+        ProjectItem.objects.alias(trigram=get_trigram_expression("title"))
+        .filter(fuzzy_q)
+        .annotate(similarity=similarity, sort_title=Lower("title"))
+        .order_by("-similarity", "sort_title", "id")
+    )
 
 
 def get_search_results(
@@ -123,58 +245,349 @@ def get_search_results(
     item_type_filter: str,
     media_file_type_filter: str,
     status_filter: str,
-) -> list[ProjectItem]:
-    # Return a list of items matching the search.  Different searches have
-    # different return types and sort orders; this unifies them for consistent
-    # use in the view and template.
+    page_size: int = SEARCH_PAGE_SIZE,
+    cursor: str = "",
+) -> dict:
+    # Return one page of the items matching the search, starting after the
+    # item the cursor points to (if any), with the cursor for the next page
+    # and, when it is cheap to get, the total number of matching items.
+    # Raises ValueError if the cursor is not valid for this search.
+
+    # Pages are cached in the shared cache, so all workers can reuse them,
+    # as the ids of their items.  Keys include the catalog generation, which
+    # changes whenever any item or its metadata changes, so cached pages are
+    # never out of date.
+    timeout = settings.SEARCH_RESULTS_CACHE_TIMEOUT
+    if timeout is None:
+        return run_search(
+            search_type,
+            query,
+            item_type_filter,
+            media_file_type_filter,
+            status_filter,
+            page_size,
+            cursor,
+        )
+    shared_cache = caches["shared"]
+    cache_key = get_search_cache_key(
+        search_type,
+        query,
+        item_type_filter,
+        media_file_type_filter,
+        status_filter,
+        page_size,
+        cursor,
+    )
+    cached_page = shared_cache.get(cache_key)
+    if cached_page is not None:
+        return {
+            "results": get_search_result_items(cached_page["item_ids"]),
+            "next_cursor": cached_page["next_cursor"],
+            "total": cached_page["total"],
+        }
+    page = run_search(
+        search_type,
+        query,
+        item_type_filter,
+        media_file_type_filter,
+        status_filter,
+        page_size,
+        cursor,
+    )
+    shared_cache.set(
+        cache_key,
+        {
+            "item_ids": [item.id for item in page["results"]],
+            "next_cursor": page["next_cursor"],
+            "total": page["total"],
+        },
+        timeout,
+    )
+    return page
+
+
+def get_search_cache_key(search_type: str, query: str, *args) -> str:
+    # Searches ignore case and extra whitespace, so the same search typed
+    # differently has the same key.  Hashed, since queries can be any text.
+    search = [search_type, normalize_search_text(query), *args]
+    search_hash = hashlib.sha256(json.dumps(search).encode()).hexdigest()
+    return f"search-results-{get_catalog_generation()}-{search_hash}"
+
+
+def get_search_result_items(item_ids: list[int]) -> list[ProjectItem]:
+    # Load the items with the given ids, in the same order, for the search
+    # results page; ids of items which no longer exist are skipped.
+    items = get_search_result_fields(ProjectItem.objects.filter(pk__in=item_ids))
+    items = items.in_bulk()
+    return [items[item_id] for item_id in item_ids if item_id in items]
+
+
+def run_search(
+    search_type: str,
+    query: str,
+    item_type_filter: str,
+    media_file_type_filter: str,
+    status_filter: str,
+    page_size: int = SEARCH_PAGE_SIZE,
+    cursor: str = "",
+) -> dict:
+    # Run the search for get_search_results(), without the cache.
+    # Different searches have different sort orders; all are filtered and
+    # loaded in one query, with only the fields the search results page displays.
 
     # first, check if this is a wildcard search - if so, return all items
     # no need to check search_type
     if query == "*":
-        qs_results = ProjectItem.objects.all().order_by("title")
-        results_list = [item for item in qs_results]
+        qs_results = ProjectItem.objects.all().order_by("title", "id")
 
     elif search_type == "title":
         full_query = construct_keyword_query("title", query)
-        qs_results = ProjectItem.objects.filter(full_query).order_by("title")
-        results_list = [item for item in qs_results]
+        qs_results = ProjectItem.objects.filter(full_query).order_by("title", "id")
 
     elif search_type == "ark":
-        qs_results = ProjectItem.objects.filter(ark__icontains=query).order_by("ark")
-        results_list = [item for item in qs_results]
+        qs_results = ProjectItem.objects.filter(ark__icontains=query).order_by(
+            "ark", "id"
+        )
 
     elif search_type == "keyword":
-        search_data = get_keyword_results(query)
-        # This is a sorted list of ProjectItems already, so does not need conversion to list below.
-        results_list = get_result_items(search_data)
+        if settings.SEARCH_BACKEND == "memory":
+            return get_search_index_results(
+                query,
+                item_type_filter,
+                media_file_type_filter,
+                status_filter,
+                page_size,
+                cursor,
+            )
+        qs_results = get_keyword_results(query)
+
+    elif search_type == "fulltext":
+        qs_results = get_full_text_results(query)
+
+    elif search_type == "fuzzy":
+        qs_results = get_fuzzy_results(query)
+
+    filtered_results = filter_results(
+        qs_results, item_type_filter, media_file_type_filter, status_filter
+    )
+    # Keyset pagination: every ordering ends with id, so is unique, and the
+    # next page starts after the sort values of the last item on this one.
+    # Unlike an offset, this costs the same for every page.
+    ordering = filtered_results.query.order_by
+    page_results = filtered_results
+    if cursor:
+        values = get_search_cursor_values(
+            ordering, decode_search_cursor(cursor, len(ordering))
+        )
+        page_results = page_results.filter(get_keyset_filter(ordering, values))
+    # Get one item more than the page size, to know if there is a next page.
+    results = list(get_search_result_fields(page_results)[: page_size + 1])
+    next_cursor = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        next_cursor = encode_search_cursor(
+            [getattr(results[-1], key.lstrip("-")) for key in ordering]
+        )
+
+    total = None
+    if not cursor:
+        if next_cursor is None:
+            total = len(results)
+        elif query == "*" or search_type in ["title", "ark"]:
+            # Counting ranked or keyword results would run the search again.
+            total = filtered_results.count()
+    return {"results": results, "next_cursor": next_cursor, "total": total}
 
-    filtered_results = filter_results_list(
-        results_list, item_type_filter, media_file_type_filter, status_filter
+
+def get_search_index_results(
+    query: str,
+    item_type_filter: str,
+    media_file_type_filter: str,
+    status_filter: str,
+    page_size: int,
+    cursor: str = "",
+) -> dict:
+    # Keyword search answered by the in-memory search index, in the same form
+    # as get_search_results().  Only the items on the page are read from the
+    # database; the total is always known, so is always given on the first page.
+    # Raises ValueError if the cursor is not valid.
+    after = decode_search_cursor(cursor, 2) if cursor else None
+    page = get_search_index().get_page(
+        query,
+        item_type_filter,
+        media_file_type_filter,
+        status_filter,
+        page_size,
+        after,
     )
-    return filtered_results
+    next_cursor = None
+    if page["next_values"]:
+        next_cursor = encode_search_cursor(page["next_values"])
+    return {
+        "results": get_search_result_items(page["item_ids"]),
+        "next_cursor": next_cursor,
+        "total": None if cursor else page["total"],
+    }
+
+
+def get_search_page_size(page_size: str | None) -> int:
+    # Page size from a request parameter, limited to a sensible range;
+    # the default if it is missing or not a number.
+    try:
+        return min(max(int(page_size), 1), MAX_SEARCH_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return SEARCH_PAGE_SIZE
 
 
-def filter_results_list(
-    results_list: list[ProjectItem],
+def get_keyset_filter(ordering: list[str], values: list) -> Q:
+    # Items after the given sort values, in the given order_by() ordering:
+    # (a > 1) OR (a = 1 AND b > 2) ..., with < for descending fields.
+    keyset_q = Q()
+    equal_q = Q()
+    for key, value in zip(ordering, values):
+        field = key.lstrip("-")
+        lookup = "lt" if key.startswith("-") else "gt"
+        keyset_q = keyset_q | (equal_q & Q(**{f"{field}__{lookup}": value}))
+        equal_q = equal_q & Q(**{field: value})
+    return keyset_q
+
+
+def encode_search_cursor(values: list) -> str:
+    """Pack the sort values of the last item on a page of search results into
+    an opaque, URL-safe cursor.
+    """
+    return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_search_cursor(cursor: str, value_count: int) -> list:
+    """Unpack a cursor created by encode_search_cursor().
+    Raises ValueError if it does not have value_count sort values.
+    """
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+    except (ValueError, UnicodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid search cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != value_count:
+        raise ValueError(f"Invalid search cursor: {cursor}")
+    return values
+
+
+def get_search_cursor_values(ordering: list[str], values: list) -> list:
+    """Check the sort values from a cursor against the ordering they are for:
+    ids are integers, rank and similarity are numbers, and other sort keys
+    are text.  Raises ValueError if any value is of the wrong type.
+    """
+    checked_values = []
+    for key, value in zip(ordering, values):
+        key = key.lstrip("-")
+        # JSON true and false are ints to Python, but never valid here.
+        if key == "id":
+            valid = isinstance(value, int) and not isinstance(value, bool)
+        elif key in ["rank", "similarity"]:
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+            value = float(value) if valid else value
+        else:
+            valid = isinstance(value, str)
+        if not valid:
+            raise ValueError(f"Invalid search cursor value for {key}: {value!r}")
+        checked_values.append(value)
+    return checked_values
+
+
+def filter_results(
+    queryset: QuerySet,
     item_type_filter: str,
     media_file_type_filter: str,
     status_filter: str,
-) -> list[ProjectItem]:
+) -> QuerySet:
     if item_type_filter != "all":
-        results_list = [
-            item for item in results_list if item.type.type == item_type_filter
-        ]
+        queryset = queryset.filter(type__type=item_type_filter)
     if media_file_type_filter != "all":
-        media_files = MediaFile.objects.filter(
-            file_type__file_type=media_file_type_filter
+        queryset = queryset.filter(
+            Exists(
+                MediaFile.objects.filter(
+                    item=OuterRef("pk"), file_type__file_type=media_file_type_filter
+                )
+            )
         )
-        media_file_items = [media_file.item.id for media_file in media_files]
-        results_list = [item for item in results_list if item.id in media_file_items]
     if status_filter != "all":
-        results_list = [
-            item for item in results_list if item.status.status == status_filter
-        ]
-    return results_list
+        queryset = queryset.filter(status__status=status_filter)
+    return queryset
+
+
+def get_search_result_fields(queryset: QuerySet) -> QuerySet:
+    # Load the related records shown on the search results page in the same
+    # query, and only the fields it displays.
+    return queryset.select_related("type", "status", "parent").only(
+        "ark", "title", "type__type", "status__status", "parent__title"
+    )
+
+
+def get_search_suggestions(query: str, limit: int = SUGGESTION_LIMIT) -> list[dict]:
+    # Up to limit titles, ARKs, names and subjects containing the query, for
+    # typeahead in the search form: those starting with the query first, then
+    # alphabetically.  Cached briefly in this process, since each keystroke
+    # asks again; on PostgreSQL, the trigram indexes from migration 0017 serve
+    # these lookups, which need at least 3 characters to use them.
+    query = " ".join(query.split())
+    if len(query) < SUGGESTION_MIN_LENGTH:
+        return []
+    query_hash = hashlib.sha256(query.casefold().encode()).hexdigest()
+    cache_key = f"search-suggestions-{limit}-{query_hash}"
+    cache_timeout = settings.SEARCH_SUGGESTIONS_CACHE_TIMEOUT
+    if cache_timeout is not None:
+        suggestions = caches["default"].get(cache_key)
+        if suggestions is not None:
+            return suggestions
+
+    # Suggestion type, model, field, and whether it is a field of an item.
+    sources = [
+        ("title", ProjectItem, "title", True),
+        ("ark", ProjectItem, "ark", True),
+        ("name", Name, "value", False),
+        ("subject", Subject, "value", False),
+    ]
+    # Names and subjects can have the same value from different sources;
+    # as a set, each is only suggested once.
+    matches = set()
+    for suggestion_type, model, field, is_item_field in sources:
+        # One query per source, each returning at most limit rows.
+        source_matches = (
+            model.objects.filter(**{f"{field}__icontains": query})
+            .annotate(
+                is_prefix=Case(
+                    When(**{f"{field}__istartswith": query}, then=Value(True)),
+                    default=Value(False),
+                ),
+                sort_value=Lower(field),
+            )
+            .order_by("-is_prefix", "sort_value")
+            .values_list("is_prefix", "sort_value", field, "id")[:limit]
+        )
+        for is_prefix, sort_value, value, item_id in source_matches:
+            if not is_item_field:
+                # The id of a name or subject, not an item.
+                item_id = None
+            matches.add((not is_prefix, sort_value, suggestion_type, value, item_id))
+
+    suggestions = []
+    for _, _, suggestion_type, value, item_id in sorted(matches)[:limit]:
+        suggestion = {"type": suggestion_type, "value": value}
+        if item_id is not None:
+            suggestion["item_id"] = item_id
+        suggestions.append(suggestion)
+    if cache_timeout is not None:
+        caches["default"].set(cache_key, suggestions, cache_timeout)
+    return suggestions
+
+
+def get_suggestion_limit(limit: str | None) -> int:
+    # Number of suggestions from a request parameter, limited to a sensible
+    # range; the default if it is missing or not a number.
+    try:
+        return min(max(int(limit), 1), MAX_SUGGESTION_LIMIT)
+    except (TypeError, ValueError):
+        return SUGGESTION_LIMIT
 
 
 def get_ark() -> str:
@@ -308,8 +721,13 @@ def get_metadata_formset(
     return formset
 
 
+@transaction.atomic
 def save_all_item_data(item_id: int, request: HttpRequest) -> None:
-    """Parse data from request and update database as appropriate."""
+    """Parse data from request and update database as appropriate.
+
+    Runs in one transaction, so the signal handlers deal with all of the
+    changes together once it commits, rather than with each row saved.
+    """
     # Get parent item info needed for ProjectItemForm.
     parent_item = get_parent_item(item_id)
     # Unpack data from all of the forms & formsets.
@@ -494,6 +912,7 @@ def get_sequence_formset(items: list) -> BaseFormSet:
     return formset
 
 
+@transaction.atomic
 def save_sequence_data(request: HttpRequest, items_list: list) -> None:
     factory = formset_factory(
         ItemSequenceForm, extra=0, formset=BaseItemSequenceFormset, validate_min=True
@@ -536,32 +955,642 @@ def run_process_file_command(
     connection.close()
 
 
-def get_records_oai(verb: str, ark: str = None, req_url: str = None) -> str:
+# Metadata formats available for every OAI record, by metadataPrefix.
+OAI_METADATA_FORMATS = {
+    "mods": {
+        "schema": "http://www.loc.gov/standards/mods/v3/mods-3-4.xsd",
+        "metadataNamespace": "http://www.loc.gov/mods/v3",
+    },
+    "oai_dc": {
+        "schema": "http://www.openarchives.org/OAI/2.0/oai_dc.xsd",
+        "metadataNamespace": "http://www.openarchives.org/OAI/2.0/oai_dc/",
+    },
+}
+
+
+@cache
+def get_oai_dc_transform() -> etree.XSLT:
+    """Return the MODS to oai_dc XSLT, compiled on first use and then reused
+    for the life of the process.
+    """
+    xslt_path = Path(__file__).parent / "xslt" / "mods_to_oai_dc.xsl"
+    return etree.XSLT(etree.parse(xslt_path))
+
+
+def get_oai_metadata_element(
+    mods_xml: bytes, metadata_prefix: str = "mods"
+) -> etree.Element:
+    # Other formats are derived from the (cached) MODS record.
+    mods_el = etree.fromstring(mods_xml)
+    if metadata_prefix == "oai_dc":
+        return get_oai_dc_transform()(mods_el).getroot()
+    return mods_el
+
+
+def get_oai_items() -> QuerySet:
     # Only items with these statuses should be published via OAI.
-    pi_set = ProjectItem.objects.filter(
-        status__status__in=["Completed", "Completed with minimal metadata"]
-    ).exclude(type__type__iexact="Series")
+    return (
+        ProjectItem.objects.filter(status__status__in=OAI_PUBLISHED_STATUSES).exclude(
+            type__type__iexact="Series"
+        )
+        # Ark of the Series each item belongs to, for its OAI set.
+        # Items are at most two levels below their Series.
+        .annotate(
+            oai_set_ark=Case(
+                When(parent__type__type="Series", then=F("parent__ark")),
+                When(
+                    parent__parent__type__type="Series", then=F("parent__parent__ark")
+                ),
+                default=None,
+            )
+        )
+    )
+
+
+def get_oai_deleted_changes() -> QuerySet:
+    """Return the journal entry recording when each item left the OAI feed
+    (it was deleted, or its status changed), for items which have not been
+    published again since.  These are reported to harvesters as deleted records;
+    the journal is never pruned, so deletions are persistent.
+    """
+    later_changes = ProjectItemChange.objects.filter(
+        item_id=OuterRef("item_id"), id__gt=OuterRef("id")
+    )
+    return (
+        ProjectItemChange.objects.filter(was_published=True, published=False).exclude(
+            Exists(later_changes.filter(Q(published=True) | Q(was_published=True)))
+        )
+        # Also catches items published again without signals, e.g. by update().
+        .exclude(Exists(get_oai_items().filter(pk=OuterRef("item_id"))))
+    )
+
+
+def get_oai_sets() -> QuerySet:
+    # Each Series is an OAI set, containing its interviews and their files.
+    return ProjectItem.objects.filter(
+        type__type="Series", parent__isnull=True
+    ).order_by("id")
+
+
+def get_set_spec(ark: str) -> str:
+    # setSpecs can't contain "/", which arks do.
+    return ark.replace("/", "-")
+
+
+def get_set_filter(set_spec: str) -> Q:
+    """Return a filter for the items in the OAI set with the given setSpec.
+
+    Membership is resolved with lookups on the indexed parent_id: first the
+    Series' children, then everything whose parent is the Series or one of
+    those children, so the cost depends only on the size of the Series.
+    """
+    series_ids = [
+        series_id
+        for series_id, ark in get_oai_sets().values_list("id", "ark")
+        if get_set_spec(ark) == set_spec
+    ]
+    if not series_ids:
+        # Unknown sets have no items.
+        return Q(pk__in=[])
+    child_ids = ProjectItem.objects.filter(parent_id__in=series_ids).values_list(
+        "id", flat=True
+    )
+    return Q(parent_id__in=[*series_ids, *child_ids])
+
+
+# OAI datestamps are UTC, with seconds granularity; day granularity is also
+# accepted for from / until.
+OAI_DATESTAMP_FORMATS = {
+    "%Y-%m-%dT%H:%M:%SZ": timedelta(seconds=1),
+    "%Y-%m-%d": timedelta(days=1),
+}
+
+
+def format_oai_datestamp(date: datetime) -> str:
+    return date.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_oai_datestamp(datestamp: str) -> tuple[datetime, str]:
+    """Return the UTC datetime for an OAI datestamp, with the format it was in.
+    Raises ValueError if the datestamp is not in a supported format.
+    """
+    for date_format in OAI_DATESTAMP_FORMATS:
+        try:
+            date = datetime.strptime(datestamp, date_format)
+        except ValueError:
+            continue
+        return date.replace(tzinfo=dt_timezone.utc), date_format
+    raise ValueError(f"Invalid datestamp: {datestamp}")
+
+
+def get_datestamp_filter(
+    from_date: str = None, until_date: str = None, field: str = "last_modified_date"
+) -> Q:
+    """Return a filter for items modified within the (inclusive) OAI from / until
+    range, either of which may be omitted, using the given date field.
+    Raises ValueError if the range is invalid, per the OAI spec.
+    """
+    date_filter = Q()
+    if from_date:
+        start, from_format = parse_oai_datestamp(from_date)
+        date_filter &= Q(**{f"{field}__gte": start})
+    if until_date:
+        end, until_format = parse_oai_datestamp(until_date)
+        # until covers the whole day or second given.
+        date_filter &= Q(**{f"{field}__lt": end + OAI_DATESTAMP_FORMATS[until_format]})
+    if from_date and until_date:
+        if from_format != until_format:
+            raise ValueError("from and until must have the same granularity")
+        if start > end:
+            raise ValueError("from must not be later than until")
+    return date_filter
+
+
+def is_valid_datestamp_range(from_date: str = None, until_date: str = None) -> bool:
+    try:
+        get_datestamp_filter(from_date, until_date)
+    except ValueError:
+        return False
+    return True
+
+
+def encode_resumption_token(token_data: dict) -> str:
+    """Pack the state needed to resume a list request into an opaque,
+    URL-safe OAI resumptionToken.
+    """
+    return urlsafe_b64encode(urlencode(token_data).encode()).decode()
+
+
+def decode_resumption_token(token: str) -> dict:
+    """Unpack a resumptionToken created by encode_resumption_token().
+    Raises ValueError if the token was not created by this application.
+    """
+    try:
+        token_data = dict(parse_qsl(urlsafe_b64decode(token.encode()).decode()))
+        # The keyset cursor: id of the last item on the previous page.
+        token_data["after"] = int(token_data["after"])
+        # Selective harvesting arguments from the original request, if any.
+        get_datestamp_filter(token_data.get("from"), token_data.get("until"))
+        # Tokens from before oai_dc was supported have no metadataPrefix.
+        token_data.setdefault("metadataPrefix", "mods")
+        if token_data["metadataPrefix"] not in OAI_METADATA_FORMATS:
+            raise ValueError(f"Unknown metadataPrefix: {token_data['metadataPrefix']}")
+    except (KeyError, ValueError, UnicodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid resumptionToken: {token}") from e
+    return token_data
+
+
+def get_oai_page_records(
+    pi_set: QuerySet,
+    after: int = 0,
+    resumed: bool = False,
+    page_size: int = None,
+    list_args: dict = None,
+    headers_only: bool = False,
+    metadata_prefix: str = "mods",
+    deleted_set: QuerySet = None,
+) -> Iterator[etree.Element]:
+    """Yield OAI record elements for one page of items, followed by a
+    resumptionToken element when one is needed.  Any list_args (like from / until)
+    are carried over to the next page in the token.
+
+    With headers_only (for ListIdentifiers), only header elements are yielded,
+    from just the fields they need; no MODS is built or read.
+
+    Items are selected with a keyset cursor on id instead of OFFSET, so each page
+    costs the same regardless of how deep into the list it is, and are read from
+    the database in chunks so only a chunk of records is held in memory at a time.
+
+    Deleted records (from deleted_set, journal entries as returned by
+    get_oai_deleted_changes()) keep their item's id, so are merged into the
+    same id order.
+    """
+    page_size = page_size or settings.OAI_PAGE_SIZE
+    chunk_size = settings.OAI_QUERY_CHUNK_SIZE
+    if deleted_set is None:
+        deleted_set = ProjectItemChange.objects.none()
+    # Find where this page ends from the ids alone, before building any records.
+    page_ids = sorted(
+        [
+            *pi_set.filter(id__gt=after)
+            .order_by("id")
+            .values_list("id", flat=True)[:page_size],
+            *deleted_set.filter(item_id__gt=after)
+            .order_by("item_id")
+            .values_list("item_id", flat=True)[:page_size],
+        ]
+    )[:page_size]
+    last_id = page_ids[-1] if page_ids else after
+    page = pi_set.filter(id__gt=after, id__lte=last_id).order_by("id")
+    deleted_page = deleted_set.filter(item_id__gt=after, item_id__lte=last_id)
+    deleted_elements = (
+        (change.item_id, get_oai_deleted_record_element(change, headers_only))
+        for change in deleted_page.order_by("item_id")
+    )
+    if headers_only:
+        elements = (
+            (item_id, get_oai_header_element(ark, last_modified_date, set_ark))
+            for item_id, ark, last_modified_date, set_ark in page.values_list(
+                "id", "ark", "last_modified_date", "oai_set_ark"
+            ).iterator(chunk_size)
+        )
+    else:
+        elements = (
+            (pi.id, add_oai_envelope_to_mods(pi, mods_xml, metadata_prefix))
+            for pi, mods_xml in iter_mods_xml(page.iterator(chunk_size), chunk_size)
+        )
+    for _, element in merge(elements, deleted_elements, key=lambda pair: pair[0]):
+        yield element
+
+    # Only a full page can be followed by another one.
+    next_after = None
+    if len(page_ids) == page_size and (
+        pi_set.filter(id__gt=last_id).exists()
+        or deleted_set.filter(item_id__gt=last_id).exists()
+    ):
+        next_after = last_id
+    token_el = get_resumption_token_element(next_after, resumed, list_args)
+    if token_el is not None:
+        yield token_el
+
+
+def get_resumption_token_element(
+    next_after: int | None, resumed: bool, list_args: dict = None
+) -> etree.Element | None:
+    # Complete lists which fit on one page get no resumptionToken at all;
+    # the last page of a multi-page list gets an empty one, per the OAI spec.
+    if next_after is None and not resumed:
+        return None
+    token_el = etree.Element("resumptionToken")
+    if next_after is not None:
+        token_el.text = encode_resumption_token(
+            {**(list_args or {}), "after": next_after}
+        )
+    return token_el
+
+
+def iter_records_oai(
+    verb: str,
+    ark: str = None,
+    req_url: str = None,
+    resumption_token: str = None,
+    from_date: str = None,
+    until_date: str = None,
+    set_spec: str = None,
+    metadata_prefix: str = "mods",
+) -> Iterator[bytes]:
+    """Return the OAI response for GetRecord, ListRecords or ListIdentifiers
+    as an iterator of byte chunks, suitable for StreamingHttpResponse.
+
+    Bad resumption tokens, or from / until dates, raise ValueError when this
+    is called, before anything has been streamed, so the caller can return
+    an OAI error instead.
+    """
+    pi_set = get_oai_items()
 
     if ark:
-        pi_set = pi_set.filter(ark=ark)
+        # At most one of these is found: deleted records are never in get_oai_items().
+        records = chain(
+            (
+                add_oai_envelope_to_mods(pi, mods_xml, metadata_prefix)
+                for pi, mods_xml in iter_mods_xml(pi_set.filter(ark=ark))
+            ),
+            (
+                get_oai_deleted_record_element(change)
+                for change in get_oai_deleted_changes().filter(ark=ark)[:1]
+            ),
+        )
+    else:
+        after = 0
+        if resumption_token:
+            token_data = decode_resumption_token(resumption_token)
+            after = token_data["after"]
+            from_date = token_data.get("from")
+            until_date = token_data.get("until")
+            set_spec = token_data.get("set")
+            metadata_prefix = token_data["metadataPrefix"]
+        list_args = {"metadataPrefix": metadata_prefix}
+        if from_date:
+            list_args["from"] = from_date
+        if until_date:
+            list_args["until"] = until_date
+        pi_set = pi_set.filter(get_datestamp_filter(from_date, until_date))
+        deleted_set = get_oai_deleted_changes().filter(
+            get_datestamp_filter(from_date, until_date, field="change_date")
+        )
+        if set_spec:
+            list_args["set"] = set_spec
+            pi_set = pi_set.filter(get_set_filter(set_spec))
+            # Deleted items keep the Series they had, which may itself be gone.
+            deleted_set = deleted_set.alias(
+                set_spec=Replace("set_ark", Value("/"), Value("-"))
+            ).filter(set_spec=set_spec)
+        if not resumption_token and not (pi_set.exists() or deleted_set.exists()):
+            return iter(
+                [get_no_records_match_error_xml(verb, req_url, metadata_prefix)]
+            )
+        records = get_oai_page_records(
+            pi_set,
+            after,
+            resumed=bool(resumption_token),
+            list_args=list_args,
+            headers_only=verb == "ListIdentifiers",
+            metadata_prefix=metadata_prefix,
+            deleted_set=deleted_set,
+        )
 
-    verb_element = etree.Element(verb)
+    return stream_oai_content(records, verb, ark, req_url, metadata_prefix)
 
-    for pi in pi_set:
-        verb_element.append(add_oai_envelope_to_mods(OralHistoryMods(pi)))
 
-    return wrap_oai_content(verb_element, verb, ark, req_url)
+def iter_all_records_oai(req_url: str = None, chunk_size: int = 100) -> Iterator[bytes]:
+    """Return a single ListRecords response, without paging, containing every
+    OAI record, for the full-collection dump written by create_oai_dump.
+    """
+    pi_set = get_oai_items().order_by("id").iterator(chunk_size=chunk_size)
+    records = (
+        add_oai_envelope_to_mods(pi, mods_xml)
+        for pi, mods_xml in iter_mods_xml(pi_set, chunk_size)
+    )
+    return stream_oai_content(records, "ListRecords", None, req_url, "mods")
 
 
-def wrap_oai_content(
-    xml_element: etree.Element, verb: str, ark: str, req_url: str
-) -> str:
-    oai_tree = get_oai_envelope()
-    oai_tree.append(get_response_date_element())
-    oai_tree.append(get_request_element(verb, ark, req_url))
-    oai_tree.append(xml_element)
+def get_oh_static_url(file_name: str) -> str:
+    # Like MediaFile.file_url, for a file name relative to OH_STATIC.
+    if settings.RUN_ENV == "dev":
+        return f"{settings.MEDIA_URL}{settings.OH_STATIC}/{file_name}"
+    return f"{settings.OH_STATIC_URL_PREFIX}{file_name}"
+
+
+def get_oai_dumps() -> list[dict]:
+    """Return the URL, size, SHA-256 checksum and date of each full-collection
+    dump which has been written, reading only file metadata and checksum files.
+    """
+    dumps = []
+    dump_dir = get_dump_file_dir()
+    for file_name in (OAI_DUMP_FILE_NAME, MODS_DUMP_FILE_NAME):
+        path = dump_dir / file_name
+        checksum_path = get_checksum_file_path(path)
+        if not (path.is_file() and checksum_path.is_file()):
+            continue
+        stat = path.stat()
+        dumps.append(
+            {
+                "file_name": file_name,
+                "url": get_oh_static_url(f"dumps/{file_name}"),
+                "checksum_url": get_oh_static_url(f"dumps/{checksum_path.name}"),
+                "size": stat.st_size,
+                "sha256": checksum_path.read_text().split()[0],
+                "date": format_oai_datestamp(
+                    datetime.fromtimestamp(stat.st_mtime, dt_timezone.utc)
+                ),
+            }
+        )
+    return dumps
+
+
+def get_oai_record_validators(
+    ark: str, metadata_prefix: str = "mods"
+) -> tuple[str | None, int | None]:
+    """Return the ETag and Last-Modified timestamp for an item's OAI record in
+    the given metadata format, for conditional GET, using one indexed lookup
+    and without building MODS.
+
+    The ETag is a hash of everything in the record: the cached ModsRecord hash,
+    which every format is built from, and the header's datestamp and set; the
+    format is added so each has its own.  It is only available once the MODS
+    record has been built.  Either value is None if not available.
+    """
+    item = (
+        get_oai_items()
+        .filter(ark=ark)
+        .values("last_modified_date", "oai_set_ark", "mods_record__content_hash")
+        .first()
+    )
+    if not item:
+        return None, None
+    etag = None
+    content_hash = item["mods_record__content_hash"]
+    if content_hash:
+        record = [
+            content_hash,
+            item["last_modified_date"].isoformat(),
+            item["oai_set_ark"],
+        ]
+        record_hash = hashlib.sha256(json.dumps(record).encode()).hexdigest()
+        etag = f'"{record_hash}-{metadata_prefix}"'
+    return etag, int(item["last_modified_date"].timestamp())
+
+
+def get_records_oai(
+    verb: str,
+    ark: str = None,
+    req_url: str = None,
+    resumption_token: str = None,
+    from_date: str = None,
+    until_date: str = None,
+    set_spec: str = None,
+    metadata_prefix: str = "mods",
+) -> bytes:
+    return b"".join(
+        iter_records_oai(
+            verb,
+            ark,
+            req_url,
+            resumption_token,
+            from_date,
+            until_date,
+            set_spec,
+            metadata_prefix,
+        )
+    )
+
+
+def get_sets_oai(req_url: str = None) -> bytes:
+    """Return the OAI ListSets response: one set per Series."""
+    set_els = []
+    for series in get_oai_sets():
+        set_el = etree.Element("set")
+        etree.SubElement(set_el, "setSpec").text = get_set_spec(series.ark)
+        etree.SubElement(set_el, "setName").text = series.title
+        set_els.append(set_el)
+    return b"".join(stream_oai_content(set_els, "ListSets", None, req_url))
+
+
+def get_identify_oai(req_url: str = None) -> bytes:
+    """Return the OAI Identify response, describing this repository."""
+    earliest_dates = [
+        get_oai_items().aggregate(Min("last_modified_date"))["last_modified_date__min"],
+        get_oai_deleted_changes().aggregate(Min("change_date"))["change_date__min"],
+    ]
+    earliest_date = min(filter(None, earliest_dates), default=timezone.now())
+    identify_els = []
+    for name, value in [
+        ("repositoryName", settings.OAI_REPOSITORY_NAME),
+        ("baseURL", req_url),
+        ("protocolVersion", "2.0"),
+        ("adminEmail", settings.OAI_ADMIN_EMAIL),
+        ("earliestDatestamp", format_oai_datestamp(earliest_date)),
+        # Deletions are kept in the ProjectItemChange journal indefinitely.
+        ("deletedRecord", "persistent"),
+        ("granularity", "YYYY-MM-DDThh:mm:ssZ"),
+    ]:
+        identify_el = etree.Element(name)
+        identify_el.text = value
+        identify_els.append(identify_el)
+    return b"".join(stream_oai_content(identify_els, "Identify", None, req_url))
+
+
+def get_metadata_formats_oai(req_url: str = None) -> bytes:
+    """Return the OAI ListMetadataFormats response; all records are available
+    in every format.
+    """
+    format_els = []
+    for metadata_prefix, metadata_format in OAI_METADATA_FORMATS.items():
+        format_el = etree.Element("metadataFormat")
+        etree.SubElement(format_el, "metadataPrefix").text = metadata_prefix
+        etree.SubElement(format_el, "schema").text = metadata_format["schema"]
+        etree.SubElement(format_el, "metadataNamespace").text = metadata_format[
+            "metadataNamespace"
+        ]
+        format_els.append(format_el)
+    return b"".join(
+        stream_oai_content(format_els, "ListMetadataFormats", None, req_url)
+    )
+
+
+def stream_oai_content(
+    records: Iterable[etree.Element],
+    verb: str,
+    ark: str,
+    req_url: str,
+    metadata_prefix: str = None,
+) -> Iterator[bytes]:
+    """Serialize the OAI envelope header, then each record as it is produced,
+    then the closing tags, yielding the bytes written at each step.
+    """
+    buffer = BytesIO()
+
+    def flush_buffer() -> bytes:
+        xml_chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return xml_chunk
+
+    oai_envelope = get_oai_envelope()
+    with etree.xmlfile(buffer) as xf:
+        with xf.element(
+            oai_envelope.tag, attrib=oai_envelope.attrib, nsmap=oai_envelope.nsmap
+        ):
+            xf.write(get_response_date_element())
+            xf.write(get_request_element(verb, ark, req_url, metadata_prefix))
+            with xf.element(verb):
+                # Send the envelope before doing any database work.
+                xf.flush()
+                yield flush_buffer()
+                for record_el in records:
+                    xf.write(record_el)
+                    xf.flush()
+                    yield flush_buffer()
+    yield flush_buffer()
+
+
+def get_client_ip(request: HttpRequest) -> str:
+    if settings.OAI_CLIENT_IP_FROM_X_FORWARDED_FOR:
+        forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+        if forwarded_for:
+            # Earlier entries come from the client, so can't be trusted;
+            # the last is the address the proxy received the request from.
+            return forwarded_for.split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def get_oai_rate_limit_delay(client_ip: str) -> int:
+    """Take a token from the client's bucket, returning 0 if one was available,
+    or else the number of seconds until one will be.
+
+    Buckets hold up to OAI_RATE_LIMIT_BURST tokens, refilled at
+    OAI_RATE_LIMIT_PER_SECOND, and are kept in the shared cache so the limit
+    applies across all workers.  Reading and updating a bucket is not atomic,
+    so simultaneous requests from one client can occasionally share a token.
+    """
+    burst = settings.OAI_RATE_LIMIT_BURST
+    if burst is None:
+        return 0
+    rate = settings.OAI_RATE_LIMIT_PER_SECOND
+    shared_cache = caches["shared"]
+    key = f"oai-rate-limit-{client_ip}"
+    now = time.time()
+    tokens, updated = shared_cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return math.ceil((1 - tokens) / rate)
+    # Once it would be full again, the bucket can be dropped.
+    shared_cache.set(key, (tokens - 1, now), timeout=math.ceil(burst / rate))
+    return 0
+
+
+def acquire_oai_list_slot() -> str | None:
+    """Claim one of the OAI_MAX_CONCURRENT_LIST_RECORDS slots for building a
+    ListRecords response, returning its key for release_oai_list_slot().
+    Returns None if all slots are in use, or "" if there is no limit.
+
+    Slots are entries in the shared cache; cache.add() only succeeds for one
+    worker at a time.  A slot which is never released (e.g. the worker was
+    killed) expires after OAI_LIST_RECORDS_SLOT_TIMEOUT seconds.
+    """
+    if settings.OAI_MAX_CONCURRENT_LIST_RECORDS is None:
+        return ""
+    for slot in range(settings.OAI_MAX_CONCURRENT_LIST_RECORDS):
+        key = f"oai-list-records-slot-{slot}"
+        if caches["shared"].add(
+            key, os.getpid(), timeout=settings.OAI_LIST_RECORDS_SLOT_TIMEOUT
+        ):
+            return key
+    return None
+
+
+def release_oai_list_slot(key: str) -> None:
+    if key:
+        caches["shared"].delete(key)
+
+
+class ClosingIterator:
+    """Wrap an iterator, calling on_close once when it is exhausted or closed.
+
+    Django closes a StreamingHttpResponse's content once the response has been
+    sent, or the client has gone away, even if iteration never started, which
+    a generator's finally block would miss.
+    """
+
+    def __init__(self, iterable: Iterable, on_close: Callable[[], None]):
+        self._iterator = iter(iterable)
+        self._on_close = on_close
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._on_close:
+            on_close, self._on_close = self._on_close, None
+            on_close()
 
-    return etree.tostring(oai_tree)
+
+def get_oai_unavailable_response(retry_after: int) -> HttpResponse:
+    # OAI-PMH flow control: harvesters wait Retry-After seconds, then try again.
+    response = HttpResponse(
+        "Too many OAI requests; please try again later.\n",
+        status=503,
+        content_type="text/plain",
+    )
+    response.headers["Retry-After"] = str(retry_after)
+    return response
 
 
 def get_oai_envelope() -> etree.Element:
@@ -578,17 +1607,20 @@ def get_oai_envelope() -> etree.Element:
 
 def get_response_date_element() -> etree.Element:
     date_el = etree.Element("responseDate")
-    date_el.text = datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+    date_el.text = format_oai_datestamp(timezone.now())
 
     return date_el
 
 
 def get_request_element(
-    verb: str, ark: str = None, req_url: str = None
+    verb: str, ark: str = None, req_url: str = None, metadata_prefix: str = None
 ) -> etree.Element:
-    req = f"""<request metadataPrefix="mods">{req_url}</request>"""
+    req = f"""<request>{req_url}</request>"""
 
     e_req = etree.fromstring(req)
+    # Only verbs which return metadata have a metadataPrefix.
+    if metadata_prefix:
+        e_req.set("metadataPrefix", metadata_prefix)
     e_req.set("verb", verb)
 
     if ark:
@@ -621,7 +1653,51 @@ def get_bad_verb_error_xml(verb: str, req_url: str = None) -> str:
     return wrap_oai_error(verb, error_elem, req_url)
 
 
-def wrap_oai_error(verb: str, error_elem: etree.Element, req_url: str = None) -> str:
+def get_no_records_match_error_xml(
+    verb: str, req_url: str = None, metadata_prefix: str = None
+) -> str:
+    """If a list request matches no records (e.g., nothing changed within the
+    requested from / until range), OAI requires an error response rather than
+    an empty list.
+
+    http://www.openarchives.org/OAI/openarchivesprotocol.html#ErrorConditions
+
+    """
+    error_elem = etree.fromstring('<error code="noRecordsMatch"/>')
+
+    return wrap_oai_error(verb, error_elem, req_url, metadata_prefix)
+
+
+def get_cannot_disseminate_format_error_xml(verb: str, req_url: str = None) -> str:
+    """If the requested metadataPrefix is not supported, OAI requires
+    an error response.
+
+    http://www.openarchives.org/OAI/openarchivesprotocol.html#ErrorConditions
+
+    """
+    error_elem = etree.fromstring('<error code="cannotDisseminateFormat"/>')
+
+    return wrap_oai_error(verb, error_elem, req_url)
+
+
+def get_bad_resumption_token_error_xml(verb: str, req_url: str = None) -> str:
+    """If a resumptionToken is invalid or expired, OAI best practice is to
+    return an OAI error response rather than returning a HTTP error code.
+
+    http://www.openarchives.org/OAI/openarchivesprotocol.html#ErrorConditions
+
+    """
+    error_elem = etree.fromstring('<error code="badResumptionToken"/>')
+
+    return wrap_oai_error(verb, error_elem, req_url)
+
+
+def wrap_oai_error(
+    verb: str,
+    error_elem: etree.Element,
+    req_url: str = None,
+    metadata_prefix: str = None,
+) -> str:
     """OAI best practice is to return an OAI error response rather than returning a
     HTTP error code in certain cases.
 
@@ -631,33 +1707,71 @@ def wrap_oai_error(verb: str, error_elem: etree.Element, req_url: str = None) ->
     oai_envelope = get_oai_envelope()
 
     oai_envelope.append(get_response_date_element())
-    oai_envelope.append(get_request_element(verb, req_url=req_url))
+    oai_envelope.append(
+        get_request_element(verb, req_url=req_url, metadata_prefix=metadata_prefix)
+    )
     oai_envelope.append(error_elem)
 
     return etree.tostring(oai_envelope)
 
 
-def add_oai_envelope_to_mods(ohmods: OralHistoryMods) -> etree.Element:
-    record_el = etree.Element("record")
+def get_oai_header_element(
+    ark: str, last_modified_date: datetime, set_ark: str = None, deleted: bool = False
+) -> etree.Element:
     header_el = etree.Element("header")
+    if deleted:
+        header_el.set("status", "deleted")
 
     id_el = etree.Element("identifier")
-    id_el.text = ohmods._item.ark
+    id_el.text = ark
 
     date_el = etree.Element("datestamp")
-    date_el.text = ohmods._item.create_date.strftime("%Y-%m-%d")
+    # last_modified_date also reflects changes to the item's metadata,
+    # media files, parent and children; see signals.py.
+    date_el.text = format_oai_datestamp(last_modified_date)
 
     header_el.append(id_el)
     header_el.append(date_el)
-    record_el.append(header_el)
+
+    if set_ark:
+        set_el = etree.Element("setSpec")
+        set_el.text = get_set_spec(set_ark)
+        header_el.append(set_el)
+
+    return header_el
+
+
+def add_oai_envelope_to_mods(
+    item: ProjectItem, mods_xml: bytes, metadata_prefix: str = "mods"
+) -> etree.Element:
+    record_el = etree.Element("record")
+    record_el.append(
+        get_oai_header_element(
+            item.ark, item.last_modified_date, getattr(item, "oai_set_ark", None)
+        )
+    )
 
     metadata_el = etree.Element("metadata")
-    metadata_el.append(ohmods.node)
+    metadata_el.append(get_oai_metadata_element(mods_xml, metadata_prefix))
     record_el.append(metadata_el)
 
     return record_el
 
 
+def get_oai_deleted_record_element(
+    change: ProjectItemChange, headers_only: bool = False
+) -> etree.Element:
+    # Deleted records have only a header, dated when the item left the feed.
+    header_el = get_oai_header_element(
+        change.ark, change.change_date, change.set_ark, deleted=True
+    )
+    if headers_only:
+        return header_el
+    record_el = etree.Element("record")
+    record_el.append(header_el)
+    return record_el
+
+
 def user_in_oh_staff_group(user: User) -> bool:
     return user.groups.filter(name="Oral History Staff").exists()
 
@@ -0,0 +1,77 @@
+<?xml version="1.0" encoding="UTF-8"?>
+<!--
+    Crosswalk from the MODS records built by OralHistoryMods to unqualified
+    Dublin Core, for the OAI oai_dc metadata format.
+    Follows the Library of Congress MODS to Dublin Core mapping
+    (https://www.loc.gov/standards/mods/mods-dcsimple.html), limited to
+    the elements which Oral History records use.
+-->
+<xsl:stylesheet version="1.0"
+    xmlns:xsl="http://www.w3.org/1999/XSL/Transform"
+    xmlns:mods="http://www.loc.gov/mods/v3"
+    xmlns:xlink="http://www.w3.org/1999/xlink"
+    xmlns:dc="http://purl.org/dc/elements/1.1/"
+    xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    exclude-result-prefixes="mods xlink">
+
+    <xsl:output method="xml" encoding="UTF-8" indent="no"/>
+
+    <xsl:template match="/mods:mods">
+        <oai_dc:dc xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/oai_dc/ http://www.openarchives.org/OAI/2.0/oai_dc.xsd">
+            <xsl:for-each select="mods:titleInfo[not(@type)]/mods:title">
+                <dc:title><xsl:value-of select="."/></dc:title>
+            </xsl:for-each>
+            <xsl:for-each select="mods:name">
+                <xsl:call-template name="name"/>
+            </xsl:for-each>
+            <xsl:for-each select="mods:subject/mods:topic">
+                <dc:subject><xsl:value-of select="."/></dc:subject>
+            </xsl:for-each>
+            <xsl:for-each select="mods:abstract | mods:note | mods:relatedItem[@type='constituent']/mods:tableOfContents">
+                <dc:description><xsl:value-of select="."/></dc:description>
+            </xsl:for-each>
+            <xsl:for-each select="mods:originInfo/mods:dateCreated">
+                <dc:date><xsl:value-of select="."/></dc:date>
+            </xsl:for-each>
+            <xsl:for-each select="mods:physicalDescription/mods:extent">
+                <dc:format><xsl:value-of select="."/></dc:format>
+            </xsl:for-each>
+            <xsl:for-each select="mods:identifier | mods:location/mods:url">
+                <dc:identifier><xsl:value-of select="."/></dc:identifier>
+            </xsl:for-each>
+            <xsl:for-each select="mods:language/mods:languageTerm">
+                <dc:language><xsl:value-of select="."/></dc:language>
+            </xsl:for-each>
+            <xsl:for-each select="mods:relatedItem[not(@type='constituent')]/mods:titleInfo/mods:title">
+                <dc:relation><xsl:value-of select="."/></dc:relation>
+            </xsl:for-each>
+            <xsl:for-each select="mods:relatedItem[@type='constituent']/@xlink:href">
+                <dc:relation><xsl:value-of select="."/></dc:relation>
+            </xsl:for-each>
+            <xsl:for-each select="mods:accessCondition">
+                <dc:rights><xsl:value-of select="."/></dc:rights>
+            </xsl:for-each>
+        </oai_dc:dc>
+    </xsl:template>
+
+    <!-- Interviewees are the creators of an oral history; name types are in name-type-data.json. -->
+    <xsl:template name="name">
+        <xsl:variable name="role" select="mods:role/mods:roleTerm"/>
+        <xsl:choose>
+            <xsl:when test="$role = 'interviewee'">
+                <dc:creator><xsl:value-of select="mods:namePart"/></dc:creator>
+            </xsl:when>
+            <xsl:when test="$role = 'publisher' or $role = 'repository'">
+                <dc:publisher><xsl:value-of select="mods:namePart"/></dc:publisher>
+            </xsl:when>
+            <xsl:when test="$role = 'subject'">
+                <dc:subject><xsl:value-of select="mods:namePart"/></dc:subject>
+            </xsl:when>
+            <xsl:otherwise>
+                <dc:contributor><xsl:value-of select="mods:namePart"/></dc:contributor>
+            </xsl:otherwise>
+        </xsl:choose>
+    </xsl:template>
+
+</xsl:stylesheet>
@@ -52,6 +52,8 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    # For trigram lookups, used by fuzzy search on PostgreSQL.
+    "django.contrib.postgres",
     "django_bootstrap5",
     "oh_staff_ui",
 ]
@@ -226,6 +228,69 @@ OH_WOWZA_URL_PREFIX = os.getenv("DJANGO_OH_WOWZA_URL_PREFIX")
 # URL for linking to public interface.
 OH_PUBLIC_SITE = os.getenv("DJANGO_OH_PUBLIC_SITE")
 
+# Repository details for the OAI Identify response.
+OAI_REPOSITORY_NAME = "UCLA Library Oral History"
+OAI_ADMIN_EMAIL = "softwaredev-systems@library.ucla.edu"
+# Number of records returned per OAI ListRecords response;
+# harvesters use the resumptionToken to request the next page.
+OAI_PAGE_SIZE = 100
+# Send OAI ListRecords responses one record at a time, instead of building
+# the whole document in memory first.
+OAI_STREAM_RESPONSES = True
+# Number of rows fetched per database round trip while building OAI responses.
+OAI_QUERY_CHUNK_SIZE = 100
+# Engine used to build MODS records: "lxml" writes elements directly into an lxml tree;
+# "eulxml" uses the original eulxml object mapping (OralHistoryMods).  Output is the same.
+MODS_ENGINE = "lxml"
+
+# Backend for keyword searches: "database" searches the search document table;
+# "memory" searches an inverted index kept in each worker process, built when
+# first used, or loaded from SEARCH_INDEX_SNAPSHOT if that file exists.
+SEARCH_BACKEND = "database"
+# Snapshot of the in-memory search index, written by build_search_index;
+# None to always build the index from the database.
+SEARCH_INDEX_SNAPSHOT = None
+# Seconds between checks for items changed by other workers, for the in-memory index.
+SEARCH_INDEX_SYNC_SECONDS = 10
+# Seconds pages of search results are kept in the "shared" cache, as the ids of their items;
+# changes to any item make all cached pages obsolete.  None disables the cache.
+SEARCH_RESULTS_CACHE_TIMEOUT = 300
+# Seconds typeahead suggestions are kept in each worker's "default" cache; kept short, since
+# they are not made obsolete when items change.  None disables the cache.
+SEARCH_SUGGESTIONS_CACHE_TIMEOUT = 60
+
+# Limits on the public OAI endpoint, so harvesters can't take every worker away from staff.
+# Each client IP may make up to OAI_RATE_LIMIT_BURST requests at once, refilled at
+# OAI_RATE_LIMIT_PER_SECOND; after that, requests get 503 with Retry-After.  None disables this.
+OAI_RATE_LIMIT_BURST = 30
+OAI_RATE_LIMIT_PER_SECOND = 2
+# Number of ListRecords responses built at the same time, across all workers (gunicorn runs 3).
+# None disables this.
+OAI_MAX_CONCURRENT_LIST_RECORDS = 2
+# Seconds after which a ListRecords slot is freed even if not released (e.g. the worker
+# was killed); the same as the gunicorn timeout.
+OAI_LIST_RECORDS_SLOT_TIMEOUT = 600
+# Seconds harvesters are asked to wait when all ListRecords slots are in use.
+OAI_LIST_RECORDS_RETRY_AFTER = 30
+# Whether to take client IPs from the last X-Forwarded-For entry, which the ingress proxy
+# appends.  Only set DJANGO_OAI_CLIENT_IP_FROM_X_FORWARDED_FOR=true behind such a proxy;
+# otherwise clients could pick their own IP, and so their own rate limit.
+OAI_CLIENT_IP_FROM_X_FORWARDED_FOR = os.getenv(
+    "DJANGO_OAI_CLIENT_IP_FROM_X_FORWARDED_FOR", "false"
+).lower() in ["true", "1"]
+
+# "default" is Django's per-process cache.  "shared" is stored in the database,
+# so all gunicorn workers see the same values; its table is created by createcachetable.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "oh_shared_cache",
+    },
+}
+
 # Image conversion settings
 IMAGE_SETTINGS = {
     "submaster_long_dimension": 750,
@@ -84,3 +84,46 @@ function showItemConfirmDeletePopup() {
 function hideItemConfirmDeletePopup() {
   document.getElementById("confirm-delete-popup").style.display = "none";
 }
+
+// Typeahead for the search form query: suggest titles, ARKs, names and subjects
+// from the server as the user types, in a datalist attached to the input.
+let searchQuery = document.querySelector("input.char-query");
+if (searchQuery) {
+  let suggestionList = document.createElement("datalist");
+  suggestionList.id = "search-suggestions";
+  searchQuery.after(suggestionList);
+  searchQuery.setAttribute("list", suggestionList.id);
+  searchQuery.setAttribute("autocomplete", "off");
+
+  let suggestionTimer = null;
+  searchQuery.addEventListener("input", () => {
+    // Wait until typing pauses, rather than asking on every keystroke.
+    clearTimeout(suggestionTimer);
+    suggestionTimer = setTimeout(showSearchSuggestions, 200);
+  });
+
+  function showSearchSuggestions() {
+    let query = searchQuery.value.trim();
+    // The server gives no suggestions for less than 3 characters.
+    if (query.length < 3) {
+      suggestionList.replaceChildren();
+      return;
+    }
+    fetch("/search_suggestions/?" + new URLSearchParams({ q: query }))
+      .then((response) => (response.ok ? response.json() : { suggestions: [] }))
+      .then((data) => {
+        // Ignore responses to queries the user has since changed.
+        if (searchQuery.value.trim() != query) {
+          return;
+        }
+        suggestionList.replaceChildren(
+          ...data.suggestions.map((suggestion) => {
+            let option = document.createElement("option");
+            option.value = suggestion.value;
+            option.label = suggestion.type;
+            return option;
+          })
+        );
+      });
+  }
+}